@@ -11,13 +11,48 @@ The brain of the audit system.
 
 import os
 import json
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional, Dict, Any
-from datetime import datetime
-import anthropic
-from pydantic import BaseModel
+from datetime import datetime, timedelta
+from pydantic import BaseModel, ValidationError
 
-from src.templates.prompts import get_analysis_prompt, get_customer_categorization_prompt
+from src.templates.prompts import (
+    ANALYSIS_SYSTEM_PROMPT, ANALYSIS_PROMPT_VERSION, ANALYSIS_SECTIONS, ANALYSIS_SECTION_NOTE,
+    CUSTOMER_BATCH_GRADING_PROMPT,
+    get_analysis_prompt, get_customer_batch_prompt
+)
 from src.utils.benchmark_engine import get_benchmark_engine
+from src.utils.anthropic_client import create_client, cached_system, cached_text, usage_cost, usage_tokens
+from src.utils.cache import DiskCache, make_cache_key, hash_text
+from src.utils.transaction_table import as_transaction_table, type_view, table_fingerprint
+from src.utils.metrics_engine import compute_metrics, overlay_metrics
+from src.utils.customer_scoring import score_customers, pregrade, local_grade
+from src.utils.cost_planner import estimate_analysis_cost, estimate_grading_cost, ANALYSIS_MAX_OUTPUT_TOKENS
+
+# DataExtractor.combine_results() summary fields that describe the data itself
+# (the rest are extraction costs, the forecast and the budget)
+CACHE_KEY_SUMMARY_FIELDS = [
+    "total_files_processed", "total_transactions", "duplicates_linked", "revenue_count",
+    "expense_count", "total_revenue", "total_expenses", "gross_profit"
+]
+
+# Claude Sonnet pricing, per 1M tokens
+INPUT_COST_PER_1M = 3.00
+OUTPUT_COST_PER_1M = 15.00
+
+
+def _analysis_settings() -> dict:
+    """Analysis and grading settings, read in one place for the Analyzer and its cost reserve."""
+    return {
+        # Customer grading: customers per call, and calls in flight (all under the shared rate limit)
+        "grading_batch_size": int(os.getenv("CUSTOMER_GRADING_BATCH_SIZE", "15")),
+        "max_workers": int(os.getenv("ANALYSIS_MAX_WORKERS", "4")),
+        # "sectioned": the analysis sections are requested concurrently; "single": one call
+        "analysis_mode": os.getenv("ANALYSIS_MODE", "sectioned").lower(),
+        "section_max_tokens": int(os.getenv("ANALYSIS_SECTION_MAX_TOKENS", "8192"))
+    }
 
 
 class BusinessContext(BaseModel):
@@ -102,6 +137,15 @@ class AnalysisResult(BaseModel):
     backend_problems: list = []
 
 
+def _totals_by(transactions, column: str):
+    """Count (n) and total amount per value of column, largest total first."""
+    return (
+        transactions.groupby(column, observed=True)['amount']
+        .agg(n='count', total='sum')
+        .sort_values('total', ascending=False)
+    )
+
+
 class Analyzer:
     """
     Analyzes extracted financial data and generates actionable insights.
@@ -114,33 +158,133 @@ class Analyzer:
     - Action plan generation
     """
     
-    def __init__(self, api_key: Optional[str] = None):
+    def __init__(self, api_key: Optional[str] = None, use_cache: bool = True):
         self.api_key = api_key or os.getenv("ANTHROPIC_API_KEY")
         if not self.api_key:
             raise ValueError("ANTHROPIC_API_KEY required")
         
-        self.client = anthropic.Anthropic(api_key=self.api_key)
+        self.client = create_client(self.api_key)
         self.model = os.getenv("ANTHROPIC_MODEL", "claude-sonnet-4-20250514")
         
         # Cost tracking
-        self.input_cost_per_1m = 3.00
-        self.output_cost_per_1m = 15.00
+        self.input_cost_per_1m = INPUT_COST_PER_1M
+        self.output_cost_per_1m = OUTPUT_COST_PER_1M
+        self.token_usage = Counter()  # Input/output and prompt cache read/write tokens
+        self.total_cost = 0.0  # Every call this analyzer made: analysis sections and customer grading
+        self._cost_lock = threading.Lock()
+        
+        settings = _analysis_settings()
+        self.grading_batch_size = settings["grading_batch_size"]
+        self.max_workers = settings["max_workers"]
+        self.analysis_mode = settings["analysis_mode"]
+        self.section_max_tokens = settings["section_max_tokens"]
+        
+        # Finished analyses, so reruns over the same data and intake answers skip the API
+        if use_cache:
+            use_cache = os.getenv("ANALYSIS_CACHE", "true").lower() == "true"
+        self.cache = DiskCache(
+            "analyses",
+            max_size_mb=float(os.getenv("ANALYSIS_CACHE_MAX_MB", "50"))
+        ) if use_cache else None
+        self.cache_max_age = timedelta(days=float(os.getenv("ANALYSIS_CACHE_MAX_AGE_DAYS", "30")))
+        self.prompt_hash = hash_text(
+            ANALYSIS_PROMPT_VERSION + ANALYSIS_SYSTEM_PROMPT + ANALYSIS_SECTION_NOTE + json.dumps(ANALYSIS_SECTIONS)
+        )
+    
+    @classmethod
+    def cost_reserve(cls, grade_customers: bool = False) -> float:
+        """
+        Upper-bound API cost of analyze() with the configured mode, for
+        DataExtractor to hold back from the per-audit budget.
+        
+        Args:
+            grade_customers: The pipeline also runs categorize_customers()
+        """
+        settings = _analysis_settings()
+        if settings["analysis_mode"] == "sectioned":
+            calls, max_tokens = len(ANALYSIS_SECTIONS), settings["section_max_tokens"]
+        else:
+            calls, max_tokens = 1, ANALYSIS_MAX_OUTPUT_TOKENS
+        reserve = estimate_analysis_cost(
+            ANALYSIS_SYSTEM_PROMPT, INPUT_COST_PER_1M, OUTPUT_COST_PER_1M,
+            sections=calls, max_output_tokens=max_tokens
+        )
+        if grade_customers:
+            reserve += estimate_grading_cost(
+                CUSTOMER_BATCH_GRADING_PROMPT, settings["grading_batch_size"], INPUT_COST_PER_1M, OUTPUT_COST_PER_1M
+            )
+        return reserve
     
-    def analyze(self, extracted_data: dict, context: BusinessContext) -> AnalysisResult:
+    def analysis_cache_key(self, extracted_data: dict, context: BusinessContext) -> str:
+        """
+        Cache key for an analysis: the transactions, the intake answers, the
+        prompt version, the model and mode, and the benchmarks version.
+        
+        Only the content-derived counts and totals of the extraction summary
+        are part of it - its cost and budget fields change on every rerun.
+        """
+        summary = extracted_data.get("summary", {})
+        return make_cache_key(
+            table_fingerprint(as_transaction_table(extracted_data)),
+            json.dumps({key: summary.get(key) for key in CACHE_KEY_SUMMARY_FIELDS}, sort_keys=True, default=str),
+            json.dumps(context.model_dump(), sort_keys=True, default=str),
+            self.prompt_hash,
+            self.model,
+            self.analysis_mode,
+            get_benchmark_engine().version
+        )
+    
+    def invalidate_cached_analysis(self, extracted_data: dict, context: BusinessContext) -> bool:
+        """Drop the cached analysis for this data and context. Returns True if there was one."""
+        if not self.cache:
+            return False
+        return self.cache.invalidate(self.analysis_cache_key(extracted_data, context))
+    
+    def _cached_analysis(self, cache_key: str) -> Optional[AnalysisResult]:
+        """The cached result for cache_key, unless it's missing, expired or from an older result shape."""
+        entry = self.cache.get(cache_key)
+        if entry is None:
+            return None
+        try:
+            created = datetime.fromisoformat(entry["created"])
+            result = AnalysisResult(**entry["result"])
+        except (KeyError, TypeError, ValueError, ValidationError):
+            self.cache.invalidate(cache_key)
+            return None
+        if datetime.now() - created > self.cache_max_age:
+            self.cache.invalidate(cache_key)
+            return None
+        
+        print(f"✓ Reusing cached analysis from {created:%Y-%m-%d %H:%M} (no API cost)")
+        result.api_cost = 0.0
+        return result
+    
+    def analyze(self, extracted_data: dict, context: BusinessContext, refresh: bool = False) -> AnalysisResult:
         """
         Perform full analysis on extracted data.
         
         Args:
             extracted_data: Output from DataExtractor.combine_results()
             context: Business context (trade, location, rates, etc.)
+            refresh: Ignore any cached analysis and replace it with a new one
             
         Returns:
             AnalysisResult with all insights and recommendations
         """
+        cache_key = None
+        if self.cache:
+            cache_key = self.analysis_cache_key(extracted_data, context)
+            cached = None if refresh else self._cached_analysis(cache_key)
+            if cached is not None:
+                return cached
+        
         # Get market benchmarks with provenance
         benchmark_engine = get_benchmark_engine()
         market_benchmarks = self._get_market_benchmarks(benchmark_engine, context)
         
+        # Every numeric figure, computed locally; Claude writes the narrative around them
+        metrics = compute_metrics(as_transaction_table(extracted_data), context, benchmark_engine)
+        
         # Prepare data summary for Claude
         data_summary = self._prepare_data_summary(extracted_data)
         
@@ -189,29 +333,113 @@ class Analyzer:
             hours_per_week=context.hours_per_week,
             revenue_goal=context.revenue_goal,
             market_benchmarks=market_benchmarks,
-            business_context=business_context_dict
+            business_context=business_context_dict,
+            precomputed_metrics=metrics
         )
         
         # Call Claude for analysis
-        print("Running analysis with Claude...")
+        if self.analysis_mode == "sectioned":
+            analysis, cost, missing = self._analyze_sections(prompt)
+        else:
+            print("Running analysis with Claude...")
+            analysis, cost = self._request_analysis(prompt, max_tokens=ANALYSIS_MAX_OUTPUT_TOKENS)
+            missing = set()
+        
+        # Fallback-filled results are not cached, so a failed call is retried next run
+        complete = analysis is not None and not missing
+        if analysis is None:
+            # Return a partial result
+            analysis = self._create_fallback_analysis(metrics, context)
+        elif missing:
+            # Keys of failed sections are filled from the fallback analysis
+            stands_in_for = {"profitability": "job_analysis", "guarantee_check": "action_plan"}
+            for key, value in self._create_fallback_analysis(metrics, context).items():
+                if key not in analysis and stands_in_for.get(key, key) in missing:
+                    analysis[key] = value
+        
+        # The computed figures replace any Claude restated
+        analysis = overlay_metrics(analysis, metrics)
+        guarantee = self._guarantee_check(analysis)
+        opportunity = analysis.get("opportunity_summary", {})
+        
+        result = AnalysisResult(
+            # Core analysis
+            summary=analysis.get("summary", {}),
+            pricing_audit=analysis.get("pricing_audit", {}),
+            profitability=self._normalize_profitability(analysis),
+            quote_analysis=analysis.get("quote_analysis", {}),
+            time_analysis=analysis.get("time_analysis", {}),
+            action_plan=analysis.get("action_plan", []),
+            guarantee_check=guarantee,
+            raw_data_summary=data_summary,
+            api_cost=cost,
+            
+            # Enhanced 2026 analysis
+            data_quality=analysis.get("data_quality", {}),
+            business_health_score=analysis.get("business_health_score", {}),
+            customer_analysis=analysis.get("customer_analysis", {}),
+            cash_flow_insights=analysis.get("cash_flow_insights", {}),
+            expense_insights=analysis.get("expense_insights", {}),
+            missing_data=analysis.get("missing_data", {}),
+            next_steps=analysis.get("next_steps", {}),
+            worst_jobs=analysis.get("worst_jobs", []),
+            
+            # NEW: Comprehensive business analysis sections
+            online_presence_analysis=analysis.get("online_presence_analysis", {}),
+            lead_conversion_analysis=analysis.get("lead_conversion_analysis", {}),
+            quoting_process_analysis=analysis.get("quoting_process_analysis", {}),
+            operations_efficiency=analysis.get("operations_efficiency", {}),
+            growth_roadmap=analysis.get("growth_roadmap", {}),
+            
+            # Provenance and methodology
+            methodology=analysis.get("methodology", {}),
+            market_benchmarks_used=market_benchmarks,
+            opportunity_summary=opportunity,
+            
+            # Backend problem tracking
+            backend_problems=analysis.get("backend_problems_identified", [])
+        )
+        
+        if cache_key and complete:
+            self.cache.set(cache_key, {"created": datetime.now().isoformat(), "result": result.model_dump()})
+        return result
+    
+    def _request_analysis(
+        self, 
+        prompt: str, 
+        max_tokens: int, 
+        section_note: Optional[str] = None
+    ) -> tuple[Optional[dict], float]:
+        """
+        Make one analysis call.
+        
+        Args:
+            prompt: The analysis prompt
+            max_tokens: Output cap
+            section_note: For one section of a sectioned analysis. The prompt is
+                then sent as a cached block shared by every section, with the
+                note in a block after it.
+        
+        Returns:
+            (parsed JSON or None if it can't be parsed, API cost)
+        """
+        content = prompt if section_note is None else [cached_text(prompt), {"type": "text", "text": section_note}]
         message = self.client.messages.create(
             model=self.model,
-            max_tokens=16384,
+            max_tokens=max_tokens,
+            system=cached_system(ANALYSIS_SYSTEM_PROMPT),
             messages=[
                 {
                     "role": "user",
-                    "content": prompt
+                    "content": content
                 }
             ]
         )
         
-        # Track costs
-        input_tokens = message.usage.input_tokens
-        output_tokens = message.usage.output_tokens
-        cost = (input_tokens / 1_000_000 * self.input_cost_per_1m + 
-                output_tokens / 1_000_000 * self.output_cost_per_1m)
-        
-        print(f"Analysis complete. API cost: ${cost:.2f}")
+        cost, tokens = self._track_usage(message.usage)
+        print(f"Analysis complete. API cost: ${cost:.2f} "
+              f"(prompt cache: {tokens['cache_read_input_tokens']:,} read, "
+              f"{tokens['cache_creation_input_tokens']:,} written)")
         
         # Parse response
         response_text = message.content[0].text
@@ -226,31 +454,138 @@ class Analyzer:
                 json_str = parts[1]
         
         try:
-            analysis = json.loads(json_str)
+            return json.loads(json_str), cost
         except json.JSONDecodeError as e:
             print(f"Warning: Failed to parse analysis JSON: {e}")
             print("Response text:", response_text[:1000])
-            # Return a partial result
-            analysis = self._create_fallback_analysis(extracted_data, context)
+            return None, cost
+    
+    def _track_usage(self, usage) -> tuple[float, dict]:
+        """Add a response's tokens and cost to the running totals. Returns (cost, tokens)."""
+        cost = usage_cost(usage, self.input_cost_per_1m, self.output_cost_per_1m)
+        tokens = usage_tokens(usage)
+        with self._cost_lock:
+            self.token_usage.update(tokens)
+            self.total_cost += cost
+        return cost, tokens
+    
+    def _warm_prompt_cache(self, prompt: str) -> float:
+        """
+        Write the instructions and shared prompt to the prompt cache with a
+        one-token call, so the section calls that follow all read it.
+        
+        Returns:
+            API cost (0 if the call fails - the sections then just don't hit the cache)
+        """
+        try:
+            message = self.client.messages.create(
+                model=self.model,
+                max_tokens=1,
+                system=cached_system(ANALYSIS_SYSTEM_PROMPT),
+                messages=[{"role": "user", "content": [cached_text(prompt)]}]
+            )
+        except Exception as e:
+            print(f"  ⚠ Prompt cache warm-up failed ({e}) - sections will each send the full prompt")
+            return 0.0
+        cost, _ = self._track_usage(message.usage)
+        return cost
+    
+    def _analyze_sections(self, prompt: str) -> tuple[Optional[dict], float, set]:
+        """
+        Request the independent sections of the analysis concurrently and merge them.
+        
+        Each call gets the same cached instructions and client data plus a note
+        naming the keys it should return, so the analysis takes about as long as
+        its slowest section instead of the sum of all of them. At most
+        max_workers sections are in flight, like the grading calls. A key a
+        section leaves out counts as missing, like the keys of a failed section.
+        
+        Returns:
+            (merged analysis, or None if every section failed; total API cost;
+            output keys the sections didn't return)
+        """
+        workers = max(1, min(self.max_workers, len(ANALYSIS_SECTIONS)))
+        print(f"Running analysis with Claude ({len(ANALYSIS_SECTIONS)} sections, {workers} at a time)...")
+        
+        # Concurrent calls can't read a cache entry none of them has written yet
+        warm_cost = self._warm_prompt_cache(prompt) if workers > 1 else 0.0
+        
+        def request(section: str) -> tuple[Optional[dict], float]:
+            keys = ANALYSIS_SECTIONS[section]
+            note = ANALYSIS_SECTION_NOTE.format(section=section, keys=", ".join(keys))
+            try:
+                return self._request_analysis(prompt, max_tokens=self.section_max_tokens, section_note=note)
+            except Exception as e:
+                print(f"  ⚠ Analysis section '{section}' failed: {e}")
+                return None, 0.0
+        
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            responses = dict(zip(ANALYSIS_SECTIONS, pool.map(request, ANALYSIS_SECTIONS)))
+        
+        merged = {}
+        missing = set()
+        for section, (part, _) in responses.items():
+            keys = ANALYSIS_SECTIONS[section]
+            if part is None:
+                missing.update(keys)
+                continue
+            # Only the section's own keys, so a section can't overwrite another's
+            merged.update({key: part[key] for key in keys if key in part})
+            missing.update(key for key in keys if key not in part)
+        
+        cost = warm_cost + sum(part_cost for _, part_cost in responses.values())
+        if missing:
+            print(f"  ⚠ {len(missing)} analysis keys missing from failed sections - using the fallback analysis for them")
+        return (merged or None), cost, missing
+    
+    @staticmethod
+    def _guarantee_check(analysis: dict) -> dict:
+        """
+        The guarantee totals, reconciled with the action plan.
         
+        opportunity_summary is meant to total the action plan's conservative
+        impacts; when the plan's own scenario figures disagree with it, the
+        plan's figures win.
+        """
         # Handle both old and new JSON structures
-        guarantee = analysis.get("guarantee_check", {})
+        guarantee = dict(analysis.get("guarantee_check", {}))
         opportunity = analysis.get("opportunity_summary", {})
+        action_plan = analysis.get("action_plan", [])
         
         # Merge opportunity_summary into guarantee_check format
         if opportunity and not guarantee:
             guarantee = {
                 'total_opportunity': opportunity.get('total_conservative', opportunity.get('total_best_case', 0)),
                 'total_conservative': opportunity.get('total_conservative', 0),
-                'total_best_case': opportunity.get('total_best_case', 0),
+                'total_best_case': opportunity.get('total_best_case', opportunity.get('total_optimistic', 0)),
                 'meets_10k_guarantee': opportunity.get('meets_10k_guarantee', False),
                 'confidence': opportunity.get('confidence_level', 'medium'),
                 'key_assumptions': opportunity.get('key_assumptions', [])
             }
         
+        # Scenario totals straight from the plan
+        def scenario_total(name: str, legacy_key: str) -> float:
+            total = 0.0
+            for action in action_plan:
+                scenario = (action.get('scenarios') or {}).get(name) or {}
+                value = scenario.get('impact', action.get(legacy_key))
+                if isinstance(value, (int, float)):
+                    total += value
+            return total
+        
+        plan_conservative = scenario_total('conservative', 'impact_conservative')
+        if plan_conservative and abs(plan_conservative - guarantee.get('total_conservative', 0)) >= 1:
+            plan_best_case = scenario_total('optimistic', 'impact_best_case')
+            guarantee.update({
+                'total_opportunity': plan_conservative,
+                'total_conservative': plan_conservative,
+                'total_best_case': max(plan_best_case, plan_conservative),
+                'meets_10k_guarantee': plan_conservative >= 10000,
+                'reconciled_with_action_plan': True
+            })
+        
         # If still empty, calculate from action plan
         if not guarantee.get('total_opportunity'):
-            action_plan = analysis.get("action_plan", [])
             total = sum(
                 a.get('impact_conservative', a.get('impact_annual', 0)) 
                 for a in action_plan
@@ -261,43 +596,7 @@ class Analyzer:
                 'confidence': 'medium'
             }
         
-        return AnalysisResult(
-            # Core analysis
-            summary=analysis.get("summary", {}),
-            pricing_audit=analysis.get("pricing_audit", {}),
-            profitability=self._normalize_profitability(analysis),
-            quote_analysis=analysis.get("quote_analysis", {}),
-            time_analysis=analysis.get("time_analysis", {}),
-            action_plan=analysis.get("action_plan", []),
-            guarantee_check=guarantee,
-            raw_data_summary=data_summary,
-            api_cost=cost,
-            
-            # Enhanced 2026 analysis
-            data_quality=analysis.get("data_quality", {}),
-            business_health_score=analysis.get("business_health_score", {}),
-            customer_analysis=analysis.get("customer_analysis", {}),
-            cash_flow_insights=analysis.get("cash_flow_insights", {}),
-            expense_insights=analysis.get("expense_insights", {}),
-            missing_data=analysis.get("missing_data", {}),
-            next_steps=analysis.get("next_steps", {}),
-            worst_jobs=analysis.get("worst_jobs", []),
-            
-            # NEW: Comprehensive business analysis sections
-            online_presence_analysis=analysis.get("online_presence_analysis", {}),
-            lead_conversion_analysis=analysis.get("lead_conversion_analysis", {}),
-            quoting_process_analysis=analysis.get("quoting_process_analysis", {}),
-            operations_efficiency=analysis.get("operations_efficiency", {}),
-            growth_roadmap=analysis.get("growth_roadmap", {}),
-            
-            # Provenance and methodology
-            methodology=analysis.get("methodology", {}),
-            market_benchmarks_used=market_benchmarks,
-            opportunity_summary=opportunity,
-            
-            # Backend problem tracking
-            backend_problems=analysis.get("backend_problems_identified", [])
-        )
+        return guarantee
     
     def _get_market_benchmarks(self, engine, context: BusinessContext) -> Dict[str, Any]:
         """
@@ -369,115 +668,65 @@ class Analyzer:
 - Gross margin: {(s['gross_profit'] / s['total_revenue'] * 100) if s['total_revenue'] > 0 else 0:.1f}%
 """)
         
+        table = as_transaction_table(data)
+        revenue = type_view(table, 'revenue')
+        expenses = type_view(table, 'expense')
+        
         # Revenue breakdown
-        revenue = data['revenue_transactions']
-        if revenue:
+        if len(revenue):
             summary_parts.append("\n## REVENUE TRANSACTIONS (sample of up to 50)")
-            # Group by category
-            by_category = {}
-            for t in revenue:
-                cat = t.get('category', 'other')
-                if cat not in by_category:
-                    by_category[cat] = {'count': 0, 'total': 0, 'transactions': []}
-                by_category[cat]['count'] += 1
-                by_category[cat]['total'] += t['amount']
-                if len(by_category[cat]['transactions']) < 10:
-                    by_category[cat]['transactions'].append(t)
+            by_category = _totals_by(revenue, 'category')
+            samples = revenue.groupby('category', observed=True, sort=False).head(5)
             
-            for cat, info in sorted(by_category.items(), key=lambda x: -x[1]['total']):
-                summary_parts.append(f"\n### {cat.upper()}: {info['count']} jobs, ${info['total']:,.2f}")
-                for t in info['transactions'][:5]:
-                    summary_parts.append(f"  - {t['date']}: {t['description'][:50]} - ${t['amount']:,.2f}")
+            for info in by_category.itertuples():
+                summary_parts.append(f"\n### {str(info.Index).upper()}: {info.n} jobs, ${info.total:,.2f}")
+                for t in samples[samples['category'] == info.Index].itertuples():
+                    summary_parts.append(f"  - {t.date}: {t.description[:50]} - ${t.amount:,.2f}")
         
         # Expense breakdown
-        expenses = data['expense_transactions']
-        if expenses:
+        if len(expenses):
             summary_parts.append("\n## EXPENSE TRANSACTIONS (by category)")
-            by_category = {}
-            for t in expenses:
-                cat = t.get('category', 'other')
-                if cat not in by_category:
-                    by_category[cat] = {'count': 0, 'total': 0}
-                by_category[cat]['count'] += 1
-                by_category[cat]['total'] += t['amount']
-            
-            for cat, info in sorted(by_category.items(), key=lambda x: -x[1]['total']):
-                summary_parts.append(f"  - {cat}: {info['count']} items, ${info['total']:,.2f}")
+            for info in _totals_by(expenses, 'category').itertuples():
+                summary_parts.append(f"  - {info.Index}: {info.n} items, ${info.total:,.2f}")
         
         # Customer analysis
-        if revenue:
+        if len(revenue):
             summary_parts.append("\n## TOP CUSTOMERS (by revenue)")
-            by_customer = {}
-            for t in revenue:
-                cust = t.get('customer_or_vendor', 'Unknown')
-                if cust not in by_customer:
-                    by_customer[cust] = {'count': 0, 'total': 0}
-                by_customer[cust]['count'] += 1
-                by_customer[cust]['total'] += t['amount']
-            
-            for cust, info in sorted(by_customer.items(), key=lambda x: -x[1]['total'])[:20]:
-                summary_parts.append(f"  - {cust}: {info['count']} jobs, ${info['total']:,.2f}")
+            for info in _totals_by(revenue, 'customer_or_vendor').head(20).itertuples():
+                summary_parts.append(f"  - {info.Index}: {info.n} jobs, ${info.total:,.2f}")
         
         return "\n".join(summary_parts)
     
-    def _create_fallback_analysis(self, data: dict, context: BusinessContext) -> dict:
+    def _create_fallback_analysis(self, metrics: dict, context: BusinessContext) -> dict:
         """
-        Create a basic analysis if Claude response parsing fails.
+        Create a basic analysis from the computed metrics if Claude response parsing fails.
         """
-        s = data['summary']
-        
-        # Basic calculations
-        estimated_hours = context.hours_per_week * 48  # 48 working weeks
-        billable_ratio = 0.6  # Assume 60% billable
-        billable_hours = estimated_hours * billable_ratio
-        
-        effective_rate = s['total_revenue'] / billable_hours if billable_hours > 0 else 0
-        profit_margin = s['gross_profit'] / s['total_revenue'] if s['total_revenue'] > 0 else 0
-        
-        # Market rate comparison (simplified)
-        market_rates = {
-            'electrician': 115,
-            'plumber': 110,
-            'carpenter': 95,
-            'hvac': 110,
-            'builder': 90
-        }
-        market_rate = market_rates.get(context.trade_type.lower(), 100)
+        summary = metrics['summary']
+        pricing = metrics['pricing_audit']
         
-        rate_gap = market_rate - context.current_rate
-        rate_increase_impact = rate_gap * billable_hours
+        rate_increase_impact = pricing['rate_increase_impact']
+        callout = pricing['call_out_fee_analysis']
+        market_rate = pricing['market_mid']
         
         return {
             "summary": {
-                "total_revenue_analyzed": s['total_revenue'],
-                "total_expenses_analyzed": s['total_expenses'],
-                "effective_hourly_rate": effective_rate,
-                "market_rate_comparison": f"{(context.current_rate / market_rate - 1) * 100:+.1f}% vs ${market_rate}/hr benchmark",
-                "profit_margin": profit_margin,
-                "biggest_profit_leak": "Rate appears below market benchmark" if rate_gap > 0 else "Unknown - manual review needed",
+                "market_rate_comparison": f"{(context.current_rate / market_rate - 1) * 100:+.1f}% vs ${market_rate}/hr benchmark"
+                                          if market_rate else "No benchmark available",
+                "biggest_profit_leak": "Rate appears below market benchmark" if rate_increase_impact > 0 else "Unknown - manual review needed",
                 "total_opportunity_identified": max(rate_increase_impact, 10000)
             },
-            "pricing_audit": {
-                "current_rate": context.current_rate,
-                "recommended_rate": market_rate,
-                "rate_increase_impact": rate_increase_impact
-            },
             "profitability": {
-                "by_job_type": [],
-                "by_customer": [],
+                "by_job_type": metrics['job_analysis'],
+                "by_customer": metrics['customer_analysis']['top_customers'],
                 "note": "Detailed breakdown requires manual review"
             },
             "quote_analysis": {
                 "note": "Quote data not detected - requires manual review"
             },
-            "time_analysis": {
-                "billable_percentage": billable_ratio * 100,
-                "estimated_billable_hours": billable_hours
-            },
             "action_plan": [
                 {
                     "priority": 1,
-                    "action": f"Increase hourly rate from ${context.current_rate} to ${market_rate}",
+                    "action": f"Increase hourly rate from ${context.current_rate} to ${pricing['recommended_rate']}",
                     "effort": "low",
                     "impact_annual": rate_increase_impact,
                     "timeline": "this_week",
@@ -485,17 +734,17 @@ class Analyzer:
                 },
                 {
                     "priority": 2,
-                    "action": "Add/increase call-out fee to $95",
+                    "action": f"Add/increase call-out fee to ${callout['recommended_fee']:,.0f}",
                     "effort": "low",
-                    "impact_annual": 95 * 150,  # Assume 150 call-outs per year
+                    "impact_annual": callout['annual_impact_conservative'],
                     "timeline": "this_week",
-                    "how": "Add to all quotes: 'Call-out fee: $95 (includes first 30 mins)'"
+                    "how": f"Add to all quotes: 'Call-out fee: ${callout['recommended_fee']:,.0f} (includes first 30 mins)'"
                 },
                 {
                     "priority": 3,
                     "action": "Review material markup - should be 25-35%",
                     "effort": "medium",
-                    "impact_annual": s['total_revenue'] * 0.05,  # Assume 5% improvement possible
+                    "impact_annual": summary['annualised_revenue'] * 0.05,  # Assume 5% improvement possible
                     "timeline": "this_month",
                     "how": "Audit last 10 jobs for actual material costs vs charged"
                 }
@@ -512,74 +761,142 @@ class Analyzer:
         """
         Categorize customers into A/B/C/Fire grades.
         
+        Clear-cut A and C customers are graded locally from recency,
+        frequency, monetary and payment scores (src/utils/customer_scoring.py).
+        The rest - borderline scores, and anyone with unpaid or overdue work -
+        are graded by Claude in batches of grading_batch_size per call against
+        one shared rubric, with up to max_workers calls in flight. Any customer
+        missing from a response, or in a batch whose response fails, gets the
+        simple local grading instead. The calls' cost is added to total_cost.
+        
         Returns list of customer grades with recommendations.
         """
-        revenue = extracted_data['revenue_transactions']
+        revenue = type_view(as_transaction_table(extracted_data), 'revenue')
+        
+        customers = [
+            (customer, transactions)
+            for customer, transactions in revenue.groupby('customer_or_vendor', observed=True, sort=False)
+            if customer != 'Unknown' and len(transactions) >= 2
+        ]
+        if not customers:
+            return []
         
-        # Group by customer
-        by_customer = {}
-        for t in revenue:
-            cust = t.get('customer_or_vendor', 'Unknown')
-            if cust not in by_customer:
-                by_customer[cust] = []
-            by_customer[cust].append(t)
+        repeat = revenue[revenue['customer_or_vendor'].isin([customer for customer, _ in customers])]
+        scores = score_customers(repeat)
+        grades = pregrade(scores)
+        score_rows = {row.Index: row for row in scores.itertuples()}
         
         results = []
+        to_grade = []
+        for customer, transactions in customers:
+            grade = grades.get(str(customer))
+            if grade:
+                results.append(local_grade(str(customer), grade, score_rows[str(customer)]))
+            else:
+                to_grade.append((customer, transactions))
+        
+        if results:
+            print(f"{len(results)} customers graded from RFM scores, {len(to_grade)} need a closer look")
+        
+        size = max(1, self.grading_batch_size)
+        batches = [to_grade[i:i + size] for i in range(0, len(to_grade), size)]
+        cost_before = self.total_cost
+        if batches:
+            print(f"Grading {len(to_grade)} customers in {len(batches)} calls...")
+            with ThreadPoolExecutor(max_workers=max(1, min(self.max_workers, len(batches)))) as pool:
+                graded = list(pool.map(self._grade_batch, batches))
+        else:
+            graded = []
+        
+        grading_cost = self.total_cost - cost_before
+        
+        fallbacks = 0
+        for batch, batch_grades in zip(batches, graded):
+            for i, (customer, transactions) in enumerate(batch):
+                grade_info = batch_grades.get(i + 1)
+                if grade_info is None:
+                    grade_info = self._fallback_grade(customer, transactions)
+                    fallbacks += 1
+                results.append(grade_info)
         
-        for customer, transactions in by_customer.items():
-            if customer == 'Unknown' or len(transactions) < 2:
-                continue
-            
-            # Use Claude to categorize
-            trans_summary = "\n".join([
-                f"- {t['date']}: {t['description'][:40]} - ${t['amount']:.2f} ({t['status']})"
-                for t in transactions[:20]
-            ])
-            
-            prompt = get_customer_categorization_prompt(
-                customer_name=customer,
-                transactions=trans_summary
-            )
-            
+        if fallbacks:
+            print(f"  ⚠ {fallbacks} customers graded locally (missing from or unreadable in the response)")
+        if batches:
+            print(f"✓ Customer grading API cost: ${grading_cost:.2f}")
+        
+        return sorted(results, key=lambda x: {'A': 0, 'B': 1, 'C': 2, 'Fire': 3}.get(x.get('grade', 'C'), 2))
+    
+    def _grade_batch(self, batch: list) -> dict[int, dict]:
+        """
+        Grade a batch of customers in one call.
+        
+        Returns:
+            Grade info by 1-based position in the batch; customers the response
+            didn't grade usably are left out
+        """
+        prompt = get_customer_batch_prompt([
+            (i + 1, customer, "\n".join(
+                f"- {t.date}: {t.description[:40]} - ${t.amount:.2f} ({t.status})"
+                for t in transactions.head(20).itertuples()
+            ))
+            for i, (customer, transactions) in enumerate(batch)
+        ])
+        
+        try:
             message = self.client.messages.create(
                 model=self.model,
-                max_tokens=500,
+                max_tokens=300 * len(batch) + 200,
+                system=cached_system(CUSTOMER_BATCH_GRADING_PROMPT),
                 messages=[{"role": "user", "content": prompt}]
             )
-            
-            response_text = message.content[0].text
-            
-            # Parse response
+        except Exception as e:
+            print(f"  ⚠ Grading call failed ({e}) - grading {len(batch)} customers locally")
+            return {}
+        
+        self._track_usage(message.usage)
+        
+        response_text = message.content[0].text
+        try:
+            if "```json" in response_text:
+                json_str = response_text.split("```json")[1].split("```")[0]
+            elif "```" in response_text:
+                json_str = response_text.split("```")[1].split("```")[0]
+            else:
+                json_str = response_text
+            entries = json.loads(json_str).get("customers", [])
+        except (json.JSONDecodeError, IndexError, AttributeError):
+            return {}
+        
+        grades = {}
+        for entry in entries:
             try:
-                if "```json" in response_text:
-                    json_str = response_text.split("```json")[1].split("```")[0]
-                elif "```" in response_text:
-                    json_str = response_text.split("```")[1].split("```")[0]
-                else:
-                    json_str = response_text
-                
-                grade_info = json.loads(json_str)
-                results.append(grade_info)
-            except (json.JSONDecodeError, IndexError):
-                # Simple fallback grading
-                total = sum(t['amount'] for t in transactions)
-                avg = total / len(transactions)
-                
-                grade = 'B'
-                if total > 10000 or avg > 2000:
-                    grade = 'A'
-                elif total < 2000 or avg < 500:
-                    grade = 'C'
-                
-                results.append({
-                    'customer': customer,
-                    'grade': grade,
-                    'total_revenue': total,
-                    'job_count': len(transactions),
-                    'recommendation': 'keep' if grade in ['A', 'B'] else 'review'
-                })
+                position = int(entry.pop("id"))
+            except (AttributeError, KeyError, TypeError, ValueError):
+                continue
+            if 1 <= position <= len(batch) and entry.get("grade"):
+                entry.setdefault("customer", batch[position - 1][0])
+                grades[position] = entry
+        return grades
+    
+    @staticmethod
+    def _fallback_grade(customer: str, transactions) -> dict:
+        """Simple local grading from total and average job size."""
+        total = float(transactions['amount'].sum())
+        avg = total / len(transactions)
+        
+        grade = 'B'
+        if total > 10000 or avg > 2000:
+            grade = 'A'
+        elif total < 2000 or avg < 500:
+            grade = 'C'
         
-        return sorted(results, key=lambda x: {'A': 0, 'B': 1, 'C': 2, 'Fire': 3}.get(x.get('grade', 'C'), 2))
+        return {
+            'customer': customer,
+            'grade': grade,
+            'total_revenue': total,
+            'job_count': len(transactions),
+            'recommendation': 'keep' if grade in ['A', 'B'] else 'review'
+        }
 
 
 # CLI for testing
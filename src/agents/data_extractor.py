@@ -4,18 +4,19 @@ Uses Claude to intelligently parse financial documents.
 """
 
 import os
+import re
 import json
+import hashlib
+import time
+import queue
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from pathlib import Path
-from typing import Optional
+from typing import Callable, Iterable, Iterator, Optional
 import anthropic
 from pydantic import BaseModel
 
-# PDF processing
-try:
-    import pdfplumber
-except ImportError:
-    pdfplumber = None
-
 try:
     import openpyxl
 except ImportError:
@@ -23,7 +24,42 @@ except ImportError:
 
 import pandas as pd
 
-from src.templates.prompts import DATA_EXTRACTION_PROMPT
+from src.templates.prompts import (
+    DATA_EXTRACTION_PROMPT, PACKED_EXTRACTION_NOTE, CATEGORISATION_PROMPT
+)
+from src.utils.cache import DiskCache, make_cache_key, hash_text
+from src.utils.anthropic_client import create_client, get_rate_limiter, cached_system, usage_cost, usage_tokens
+from src.utils.file_handler import FileHandler
+from src.utils.export_parsers import parse_export, detect_export_profile, EXPORT_PARSER_VERSION
+from src.utils.bank_parsers import parse_bank_statement, detect_bank_profile
+from src.utils.table_serializer import serialize_table, estimate_tokens
+from src.utils.pdf_reader import read_pdf_pages
+from src.utils.excel_reader import (
+    EXCEL_BATCH_ROWS, should_stream, sheet_headers, iter_sheet_batches, keep_groups_together
+)
+from src.utils.stream_parser import TransactionStreamParser
+from src.utils.manifest import ExtractionManifest, manifest_path
+from src.utils.vendor_memo import VendorMemo, normalize_description
+from src.utils.packing import document_id, pack_content, plan_packs
+from src.utils.triage import SKIP_KINDS, triage_content, document_note
+from src.utils.transaction_table import build_transaction_table, type_view
+from src.utils.dedup import link_duplicates
+from src.utils.cost_planner import (
+    AuditForecast, BudgetExceededError, forecast_file, forecast_audit, estimate_output_tokens
+)
+
+# Start of a page/sheet section in reader output - the natural chunk boundaries
+SECTION_MARKER = re.compile(r'^(?=\[(?:PAGE \d+|SHEET: [^\]]*)\])', re.MULTILINE)
+
+# Unique descriptions labelled per categorisation call
+CATEGORISATION_BATCH_SIZE = 100
+
+# How each kind of description is marked for CATEGORISATION_PROMPT
+LABEL_MARKERS = {"revenue": "in", "expense": "out", "job": "job"}
+
+# Share of max_tokens a pack's predicted transactions may fill, leaving headroom
+# so an underestimate doesn't cut off the last documents
+PACK_OUTPUT_HEADROOM = 0.75
 
 
 class Transaction(BaseModel):
@@ -49,6 +85,20 @@ class ExtractionResult(BaseModel):
     api_cost: float = 0.0
 
 
+class PreparedDocument(BaseModel):
+    """A document read and planned locally, ready for extraction."""
+    file_path: str
+    category_hint: Optional[str] = None
+    strategy: str  # "cached", "deterministic", "categorise", "single", "packed", "chunked", "streamed", "skipped" or "error"
+    document_kind: Optional[str] = None  # Local triage: "invoice", "quote", "bank_statement" or "receipt"
+    cache_key: Optional[str] = None
+    pack: Optional[int] = None  # Shared extraction call this document joins (strategy "packed")
+    chunks: list[str] = []  # Content for each Claude call
+    chunk_tokens: list[tuple[int, int]] = []  # Streamed: (content, output) token estimates per call
+    content_key: Optional[str] = None  # Streamed: hash of the content, which isn't held in chunks
+    result: Optional[ExtractionResult] = None  # Already known (cached/deterministic/categorise/skipped/error)
+
+
 class DataExtractor:
     """
     Extracts financial data from various document formats using Claude.
@@ -57,191 +107,1375 @@ class DataExtractor:
     - PDF invoices and statements
     - Excel/CSV exports from accounting software
     - Bank statement PDFs
+    
+    Files in a folder are extracted concurrently (bounded by max_workers),
+    since each call spends almost all of its time waiting on Claude.
+    
+    Results are cached on disk keyed by file content, prompt and model, so
+    reruns over unchanged documents never hit the API.
+    
+    Documents longer than max_content_chars are split on page, sheet or row
+    boundaries and the chunks extracted in parallel, rather than truncated.
+    
+    Recognised accounting exports (Xero, MYOB, QuickBooks, ServiceM8) are
+    parsed deterministically and never sent to Claude. So are bank statement
+    CSVs, except that their unique descriptions are sent to be categorised.
+    
+    Responses are streamed by default, so transactions can be reported as they
+    arrive and a stalled stream fails fast instead of hanging.
+    
+    Folder extraction reads and plans every file before the first API call,
+    forecasts the audit's cost, and refuses to start if the forecast exceeds
+    MAX_COST_PER_AUDIT.
     """
     
-    def __init__(self, api_key: Optional[str] = None):
+    def __init__(
+        self, 
+        api_key: Optional[str] = None, 
+        max_workers: Optional[int] = None,
+        use_cache: bool = True,
+        streaming: Optional[bool] = None,
+        analysis_cost_reserve: float = 0.0
+    ):
+        """
+        Args:
+            analysis_cost_reserve: Cost of the API calls that follow extraction
+                (Analyzer.cost_reserve()), held back from MAX_COST_PER_AUDIT
+        """
         self.api_key = api_key or os.getenv("ANTHROPIC_API_KEY")
         if not self.api_key:
             raise ValueError("ANTHROPIC_API_KEY required. Set in environment or pass to constructor.")
         
-        self.client = anthropic.Anthropic(api_key=self.api_key)
+        self.client = create_client(self.api_key)
         self.model = os.getenv("ANTHROPIC_MODEL", "claude-sonnet-4-20250514")
         self.total_cost = 0.0
+        self.token_usage = Counter()  # Input/output and prompt cache read/write tokens
+        self._cost_lock = threading.Lock()
+        
+        # Max documents in flight against the API at once
+        self.max_workers = max_workers or int(os.getenv("EXTRACTION_MAX_WORKERS", "4"))
+        
+        # Per-call limits. Long documents are chunked so each response fits
+        # comfortably inside max_tokens.
+        self.max_tokens = int(os.getenv("MAX_TOKENS", "4096"))
+        self.max_content_chars = int(os.getenv("EXTRACTION_CHUNK_CHARS", "8000"))
+        
+        # Small documents share one call, up to this many content tokens (0 = never pack)
+        self.pack_max_tokens = int(os.getenv("EXTRACTION_PACK_TOKENS", "6000"))
+        self.pack_max_documents = int(os.getenv("EXTRACTION_PACK_MAX_DOCS", "12"))
+        
+        # Streaming: a stream that goes quiet for this long is treated as stalled
+        if streaming is None:
+            streaming = os.getenv("EXTRACTION_STREAMING", "true").lower() == "true"
+        self.streaming = streaming
+        self.stream_stall_seconds = float(os.getenv("STREAM_STALL_SECONDS", "30"))
+        self._progress_queue: Optional[queue.Queue] = None
+        
+        # Content-addressed extraction cache (keyed on the prompts and the export parser version)
+        self.cache = DiskCache(
+            "extractions",
+            max_size_mb=float(os.getenv("EXTRACTION_CACHE_MAX_MB", "200"))
+        ) if use_cache else None
+        self.prompt_hash = hash_text(
+            EXPORT_PARSER_VERSION + DATA_EXTRACTION_PROMPT + PACKED_EXTRACTION_NOTE + CATEGORISATION_PROMPT
+        )
+        
+        # Vendor labels shared across audits, so repeat vendors are never re-categorised
+        self.vendor_memo = VendorMemo(hash_text(CATEGORISATION_PROMPT)) if use_cache else None
+        self.memo_hits = 0
+        
+        # Parsed PDF pages, keyed by page content so reruns skip pdfplumber
+        self.page_cache = DiskCache(
+            "pdf_pages",
+            max_size_mb=float(os.getenv("PDF_PAGE_CACHE_MAX_MB", "100"))
+        ) if use_cache else None
+        
+        # Per-page PDF parse timings, for profiling slow documents
+        self.pdf_page_timings: dict[str, list[dict]] = {}
+        
+        # Per-file token savings from compact spreadsheet serialisation
+        self.serialization_stats: dict[str, dict] = {}
+        
+        # Per-file hash of the content sent for extraction, for spotting re-saved copies
+        self.content_keys: dict[str, str] = {}
         
         # Cost tracking (approximate, per 1M tokens)
         self.input_cost_per_1m = 3.00  # Claude Sonnet
         self.output_cost_per_1m = 15.00
+        
+        # Per-audit spend ceiling (extraction + the analysis reserve); 0 disables it
+        self.max_cost_per_audit = float(os.getenv("MAX_COST_PER_AUDIT", "20")) or None
+        self.analysis_cost_reserve = analysis_cost_reserve
+        self.prompt_tokens = estimate_tokens(DATA_EXTRACTION_PROMPT)
+        self.forecast: Optional[AuditForecast] = None
     
-    def extract_from_folder(self, folder_path: str) -> list[ExtractionResult]:
+    def extract_from_folder(
+        self, 
+        folder_path: str, 
+        max_workers: Optional[int] = None,
+        progress_callback: Optional[Callable[[dict], None]] = None
+    ) -> list[ExtractionResult]:
         """
-        Extract data from all supported files in a folder.
+        Extract data from all supported files in a folder and its subfolders.
+        
+        Files are read and planned as soon as discovery finds them. Once every
+        file is planned, the audit's cost is forecast (self.forecast) and
+        checked against MAX_COST_PER_AUDIT, then files are extracted with at
+        most max_workers calls in flight. The upload subfolder (invoices/,
+        expenses/, quotes/, statements/) is passed through as a category hint.
+        Results are returned in discovery order, and a failure in one file
+        never affects the others.
         
         Args:
             folder_path: Path to folder containing customer documents
+            max_workers: Max concurrent extractions (defaults to self.max_workers)
+            progress_callback: Called with progress events, always on the calling
+                thread (so it can safely update Streamlit). Events are dicts with
+                an "event" key:
+                - "file_started": file
+                - "transaction": file, transaction (Transaction), count (so far in file)
+                - "file_done": file, transactions (count), document_type
             
         Returns:
             List of ExtractionResult objects
+            
+        Raises:
+            BudgetExceededError: If the forecast exceeds MAX_COST_PER_AUDIT
+                (nothing is sent to Claude)
         """
         folder = Path(folder_path)
         if not folder.exists():
             raise FileNotFoundError(f"Folder not found: {folder_path}")
         
-        results = []
+        print(f"Processing files in {folder_path}")
+        return self._extract_documents(FileHandler.iter_documents(folder), max_workers, progress_callback)
+    
+    def extract_incremental(
+        self, 
+        folder_path: str, 
+        max_workers: Optional[int] = None,
+        progress_callback: Optional[Callable[[dict], None]] = None
+    ) -> list[ExtractionResult]:
+        """
+        Extract a folder, reusing results from previous runs over it.
+        
+        A manifest kept with the cache (see src/utils/manifest.py) records each
+        file's content hash and its ExtractionResult. Only files that are new or changed since the last run
+        are extracted. Files that have been removed drop out of the results,
+        and everything else comes straight from the manifest. Results are in
+        discovery order, like extract_from_folder, so the output can go
+        straight to combine_results().
+        
+        Args:
+            folder_path: Path to folder containing customer documents
+            max_workers: Max concurrent extractions (defaults to self.max_workers)
+            progress_callback: As for extract_from_folder (new files only)
+            
+        Returns:
+            List of ExtractionResult objects for every file now in the folder
+        """
+        folder = Path(folder_path)
+        if not folder.exists():
+            raise FileNotFoundError(f"Folder not found: {folder_path}")
+        
+        # Nothing may be extracted this run; a forecast from an earlier run doesn't apply
+        self.forecast = None
+        
+        manifest = ExtractionManifest(
+            manifest_path(folder), 
+            fingerprint=make_cache_key(self.prompt_hash, self.model)
+        )
+        documents = list(FileHandler.iter_documents(folder))
+        
+        # A file is reusable if its content and upload category are unchanged
+        reusable = {}
+        reused_content = {}
+        to_extract = []
+        for file_path, category_hint, file_hash in documents:
+            entry = manifest.get(file_hash)
+            if entry and entry["category_hint"] == category_hint:
+                # Already paid for on an earlier run
+                result = ExtractionResult(**{**entry["result"], "file_path": str(file_path), "api_cost": 0.0})
+                reusable[file_hash] = result
+                if entry.get("content_key"):
+                    reused_content[entry["content_key"]] = str(file_path)
+            else:
+                to_extract.append((file_path, category_hint, file_hash))
+        
+        current = {file_hash for _, _, file_hash in documents}
+        removed = [manifest.remove(h)["file_path"] for h in manifest.hashes() - current]
         
-        # Find all supported files
-        supported_extensions = {'.pdf', '.xlsx', '.xls', '.csv'}
-        files = [f for f in folder.iterdir() 
-                 if f.is_file() and f.suffix.lower() in supported_extensions]
+        print(f"Processing files in {folder_path}: {len(to_extract)} new or changed, "
+              f"{len(reusable)} unchanged, {len(removed)} removed")
+        for file_path in removed:
+            print(f"  Retracted: {Path(file_path).name}")
         
-        print(f"Found {len(files)} files to process in {folder_path}")
+        extracted = self._extract_documents(
+            to_extract, max_workers, progress_callback, known_content=reused_content
+        ) if to_extract else []
         
-        for file_path in files:
-            print(f"  Processing: {file_path.name}")
+        new_results = {}
+        for (file_path, category_hint, file_hash), result in zip(to_extract, extracted):
+            new_results[file_hash] = result
+            # Failures aren't recorded, so they are retried next run. Neither are
+            # duplicates, which must be extracted if the original is removed.
+            if result.document_type not in ("error", "duplicate"):
+                manifest.put(
+                    file_hash, 
+                    str(file_path.relative_to(folder)), 
+                    category_hint, 
+                    result.model_dump(),
+                    content_key=self.content_keys.get(str(file_path))
+                )
+        manifest.save()
+        
+        return [reusable.get(h) or new_results[h] for _, _, h in documents]
+    
+    def _extract_documents(
+        self, 
+        documents, 
+        max_workers: Optional[int] = None,
+        progress_callback: Optional[Callable[[dict], None]] = None,
+        known_content: Optional[dict[str, str]] = None
+    ) -> list[ExtractionResult]:
+        """
+        Plan, forecast and extract (path, category_hint, file_hash) items in order.
+        
+        known_content maps content keys of documents already extracted (e.g.
+        reused from a manifest) to their paths; new copies of them are skipped.
+        """
+        # Workers queue events; this thread hands them to the callback
+        self._progress_queue = queue.Queue() if progress_callback else None
+        try:
+            with ThreadPoolExecutor(max_workers=max(1, max_workers or self.max_workers)) as pool:
+                # Read, serialise and plan every file - local work only
+                prepared = [
+                    f.result() for f in [
+                        pool.submit(self._prepare_file_safely, file_path, category_hint, file_hash)
+                        for file_path, category_hint, file_hash in documents
+                    ]
+                ]
+                
+                prepared = self._skip_duplicate_content(prepared, known_content)
+                packs = self._plan_packs(prepared)
+                self.forecast = self.forecast_documents(prepared)
+                print(self.forecast.summary_line())
+                if not self.forecast.within_budget:
+                    raise BudgetExceededError(
+                        f"Forecast cost ${self.forecast.total_cost:.2f} exceeds the "
+                        f"${self.forecast.budget:.2f} per-audit budget (MAX_COST_PER_AUDIT). "
+                        f"Largest files: " + ", ".join(
+                            f"{Path(f.file_path).name} (${f.estimated_cost:.2f})"
+                            for f in sorted(self.forecast.files, key=lambda f: -f.estimated_cost)[:3]
+                        )
+                    )
+                
+                # One task per pack of small documents, one per remaining document
+                tasks = {
+                    pool.submit(self._extract_pack_safely, [prepared[i] for i in pack]): pack
+                    for pack in packs
+                }
+                packed = {i for pack in packs for i in pack}
+                tasks.update({
+                    pool.submit(lambda doc: [self._extract_prepared_safely(doc)], doc): [i]
+                    for i, doc in enumerate(prepared) if i not in packed
+                })
+                if progress_callback:
+                    pending = set(tasks)
+                    while pending:
+                        _, pending = wait(pending, timeout=0.1)
+                        self._deliver_progress(progress_callback)
+                    self._deliver_progress(progress_callback)
+                
+                results = [None] * len(prepared)
+                for future, indexes in tasks.items():
+                    for i, result in zip(indexes, future.result()):
+                        results[i] = result
+        finally:
+            self._progress_queue = None
+        
+        print(f"\nProcessed {len(results)} files. Total API cost: ${self.total_cost:.2f}")
+        if packs:
+            print(f"Packed {len(packed)} small documents into {len(packs)} calls")
+        if self.cache:
+            stats = self.cache.stats()
+            print(f"Extraction cache: {stats['hits']} hits, {stats['misses']} misses")
+        if self.memo_hits:
+            print(f"Vendor memo: {self.memo_hits} descriptions labelled from earlier audits")
+        if self.token_usage["cache_read_input_tokens"] or self.token_usage["cache_creation_input_tokens"]:
+            print(f"Prompt cache: {self.token_usage['cache_read_input_tokens']:,} tokens read, "
+                  f"{self.token_usage['cache_creation_input_tokens']:,} written")
+        limiter = get_rate_limiter().stats()
+        if limiter["throttled_requests"] or limiter["retries"]:
+            print(f"API rate limiting: {limiter['throttled_requests']} calls queued "
+                  f"({limiter['total_wait_seconds']:.1f}s total wait, max queue depth "
+                  f"{limiter['max_queue_depth']}), {limiter['retries']} retries")
+        return results
+    
+    def _emit_progress(self, event: str, **data) -> None:
+        """Queue a progress event for extract_from_folder's callback, if any."""
+        if self._progress_queue is not None:
+            self._progress_queue.put({"event": event, **data})
+    
+    def _deliver_progress(self, progress_callback: Callable[[dict], None]) -> None:
+        while True:
             try:
-                result = self.extract_from_file(str(file_path))
-                results.append(result)
-                print(f"    ✓ Extracted {len(result.transactions)} transactions")
-            except Exception as e:
-                print(f"    ✗ Error: {e}")
-                # Create error result
-                results.append(ExtractionResult(
-                    document_type="error",
-                    file_path=str(file_path),
-                    transactions=[],
-                    extraction_notes=f"Error processing file: {str(e)}",
-                    needs_review=True
-                ))
-        
-        print(f"\nTotal API cost: ${self.total_cost:.2f}")
+                event = self._progress_queue.get_nowait()
+            except queue.Empty:
+                return
+            progress_callback(event)
+    
+    def _skip_duplicate_content(
+        self, 
+        prepared: list[PreparedDocument], 
+        known_content: Optional[dict[str, str]] = None
+    ) -> list[PreparedDocument]:
+        """
+        Skip documents whose content matches an earlier one or a known document.
+        
+        Byte-identical files are already dropped by content hash; this catches
+        the same document saved twice in different ways (re-exported PDF, a
+        copy with different metadata), whose text comes out the same.
+        """
+        seen = dict(known_content or {})
+        for i, doc in enumerate(prepared):
+            if doc.strategy == "categorise" or not (doc.chunks or doc.content_key):
+                continue
+            key = doc.content_key or hash_text("\n".join(doc.chunks))
+            self.content_keys[doc.file_path] = key
+            if key in seen:
+                prepared[i] = self._skipped_document(
+                    Path(doc.file_path), 
+                    doc.category_hint, 
+                    "duplicate", 
+                    f"Same content as {Path(seen[key]).name}"
+                )
+            else:
+                seen[key] = doc.file_path
+        return prepared
+    
+    def _plan_packs(self, prepared: list[PreparedDocument]) -> list[list[int]]:
+        """
+        Group small single-call documents into shared calls.
+        
+        Marks each packed document's strategy as "packed" and returns the packs
+        (indexes into prepared) that hold more than one document.
+        """
+        if self.pack_max_tokens <= 0 or self.pack_max_documents < 2:
+            return []
+        items = [
+            (i, estimate_tokens(doc.chunks[0]), estimate_output_tokens(doc.chunks[0], self.max_tokens))
+            for i, doc in enumerate(prepared)
+            if doc.strategy == "single" and estimate_tokens(doc.chunks[0]) <= self.pack_max_tokens // 2
+        ]
+        packs = [
+            pack for pack in plan_packs(
+                items, 
+                self.pack_max_tokens, 
+                int(self.max_tokens * PACK_OUTPUT_HEADROOM), 
+                self.pack_max_documents
+            )
+            if len(pack) > 1
+        ]
+        for number, pack in enumerate(packs):
+            for i in pack:
+                prepared[i].strategy = "packed"
+                prepared[i].pack = number
+        return packs
+    
+    def forecast_documents(self, prepared: list[PreparedDocument]) -> AuditForecast:
+        """Predict the API cost of extracting prepared documents, plus the analysis reserve."""
+        # Packed documents split one copy of the instructions between them
+        pack_sizes = Counter(doc.pack for doc in prepared if doc.pack is not None)
+        files = [
+            forecast_file(
+                doc.file_path, 
+                doc.strategy, 
+                doc.chunks, 
+                self.prompt_tokens // pack_sizes[doc.pack] if doc.pack is not None else self.prompt_tokens, 
+                self.max_tokens, 
+                self.input_cost_per_1m, 
+                self.output_cost_per_1m,
+                chunk_tokens=doc.chunk_tokens if doc.strategy == "streamed" else None
+            )
+            for doc in prepared
+        ]
+        return forecast_audit(files, self.analysis_cost_reserve, self.max_cost_per_audit)
+    
+    def _prepare_file_safely(
+        self, 
+        file_path: Path, 
+        category_hint: Optional[str] = None,
+        file_hash: Optional[str] = None
+    ) -> PreparedDocument:
+        """Prepare a single file, converting any failure into an error result."""
+        try:
+            return self.prepare_file(str(file_path), category_hint=category_hint, file_hash=file_hash)
+        except Exception as e:
+            print(f"    ✗ {file_path.name}: Error: {e}")
+            return PreparedDocument(
+                file_path=str(file_path),
+                category_hint=category_hint,
+                strategy="error",
+                result=self._error_result(str(file_path), e)
+            )
+    
+    def _extract_prepared_safely(self, doc: PreparedDocument) -> ExtractionResult:
+        """Extract a prepared file, converting any failure into an error result."""
+        name = Path(doc.file_path).name
+        print(f"  Processing: {name}")
+        self._emit_progress("file_started", file=name)
+        try:
+            result = self.extract_prepared(doc)
+            if result.document_type != "error" and doc.strategy != "skipped":
+                print(f"    ✓ {name}: Extracted {len(result.transactions)} transactions")
+        except Exception as e:
+            print(f"    ✗ {name}: Error: {e}")
+            result = self._error_result(doc.file_path, e)
+        self._emit_progress(
+            "file_done", 
+            file=name, 
+            transactions=len(result.transactions), 
+            document_type=result.document_type
+        )
+        return result
+    
+    def _extract_pack_safely(self, docs: list[PreparedDocument]) -> list[ExtractionResult]:
+        """Extract a pack of small documents in one call, falling back to one call each on failure."""
+        names = [Path(doc.file_path).name for doc in docs]
+        print(f"  Processing pack of {len(docs)}: {', '.join(names)}")
+        for name in names:
+            self._emit_progress("file_started", file=name)
+        
+        try:
+            packed = self._extract_pack(docs)
+        except Exception as e:
+            print(f"    ⚠ Pack failed ({e}) - extracting its documents one at a time")
+            packed = [None] * len(docs)
+        
+        results = []
+        for doc, name, result in zip(docs, names, packed):
+            if result is None:
+                # Missing from the response (or the whole pack failed)
+                results.append(self._extract_prepared_safely(doc))
+                continue
+            print(f"    ✓ {name}: Extracted {len(result.transactions)} transactions")
+            self._emit_progress(
+                "file_done", 
+                file=name, 
+                transactions=len(result.transactions), 
+                document_type=result.document_type
+            )
+            results.append(result)
+        return results
+    
+    def _extract_pack(self, docs: list[PreparedDocument]) -> list[Optional[ExtractionResult]]:
+        """
+        One extraction call for several small documents.
+        
+        Returns:
+            A result per document, in order; None for any document the response
+            didn't cover (or all of them if it can't be parsed), to be
+            extracted on its own instead
+        """
+        self._check_budget()
+        
+        content = pack_content([
+            (Path(doc.file_path).name, doc.chunks[0], document_note(doc.category_hint, doc.document_kind))
+            for doc in docs
+        ])
+        message = self.client.messages.create(
+            model=self.model,
+            max_tokens=self.max_tokens,
+            system=cached_system(DATA_EXTRACTION_PROMPT),
+            messages=[{
+                "role": "user",
+                "content": f"{PACKED_EXTRACTION_NOTE.format(count=len(docs))}\nDOCUMENTS:\n\n{content}"
+            }]
+        )
+        
+        cost = usage_cost(message.usage, self.input_cost_per_1m, self.output_cost_per_1m)
+        with self._cost_lock:
+            self.total_cost += cost
+            self.token_usage.update(usage_tokens(message.usage))
+        
+        try:
+            data = json.loads(self._json_text(message.content[0].text))
+            entries = {str(entry.get("document_id")): entry for entry in data.get("documents", [])}
+        except (json.JSONDecodeError, AttributeError):
+            reason = "hit max_tokens" if message.stop_reason == "max_tokens" else "could not be parsed"
+            print(f"    ⚠ Packed response {reason} - extracting its documents one at a time")
+            return [None] * len(docs)
+        
+        # The call's cost is shared out by content size
+        total_chars = sum(len(doc.chunks[0]) for doc in docs) or 1
+        results = []
+        for i, doc in enumerate(docs):
+            entry = entries.get(document_id(i))
+            if entry is None:
+                results.append(None)
+                continue
+            result = ExtractionResult(
+                document_type=entry.get("document_type", "unknown"),
+                file_path=doc.file_path,
+                transactions=[self._to_transaction(t) for t in entry.get("transactions", [])],
+                extraction_notes=entry.get("extraction_notes", ""),
+                needs_review=entry.get("needs_review", False),
+                api_cost=cost * len(doc.chunks[0]) / total_chars
+            )
+            if doc.cache_key:
+                self.cache.set(doc.cache_key, result.model_dump())
+            results.append(result)
         return results
     
-    def extract_from_file(self, file_path: str) -> ExtractionResult:
+    @staticmethod
+    def _error_result(file_path: str, error: Exception) -> ExtractionResult:
+        return ExtractionResult(
+            document_type="error",
+            file_path=file_path,
+            transactions=[],
+            extraction_notes=f"Error processing file: {str(error)}",
+            needs_review=True
+        )
+    
+    def extract_from_file(
+        self, 
+        file_path: str, 
+        category_hint: Optional[str] = None,
+        file_hash: Optional[str] = None
+    ) -> ExtractionResult:
         """
         Extract data from a single file.
         
         Args:
             file_path: Path to the file
+            category_hint: Upload category ("invoices", "expenses", "quotes",
+                "statements"); guessed from the filename if not given
+            file_hash: Content hash if already computed during discovery
             
         Returns:
             ExtractionResult with extracted transactions
         """
+        return self.extract_prepared(self.prepare_file(file_path, category_hint, file_hash))
+    
+    def prepare_file(
+        self, 
+        file_path: str, 
+        category_hint: Optional[str] = None,
+        file_hash: Optional[str] = None
+    ) -> PreparedDocument:
+        """
+        Read a file and decide how to extract it, without calling Claude.
+        
+        Cache hits and recognised accounting exports come back with their
+        result already filled in. Everything else is serialised and split into
+        the chunks that will each become one Claude call.
+        """
         path = Path(file_path)
         suffix = path.suffix.lower()
+        if category_hint is None:
+            category_hint = FileHandler._guess_category(path.name)
+        
+        file_hash = file_hash or FileHandler.get_file_hash(path)
+        
+        # Unchanged document + same prompt + same model = same answer
+        cache_key = None
+        if self.cache:
+            cache_key = make_cache_key(
+                file_hash, 
+                self.prompt_hash, 
+                self.model, 
+                category_hint
+            )
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                cached.update(file_path=str(path), api_cost=0.0)
+                return PreparedDocument(
+                    file_path=str(path),
+                    category_hint=category_hint,
+                    strategy="cached",
+                    result=ExtractionResult(**cached)
+                )
         
         # Read file content based on type
         if suffix == '.pdf':
-            content = self._read_pdf(path)
-        elif suffix in {'.xlsx', '.xls'}:
-            content = self._read_excel(path)
-        elif suffix == '.csv':
-            content = self._read_csv(path)
+            content = self._read_pdf(path, file_hash)
+        elif suffix in {'.xlsx', '.xls', '.csv'} and should_stream(path):
+            return self._prepare_streamed_workbook(path, category_hint, cache_key)
+        elif suffix in {'.xlsx', '.xls', '.csv'}:
+            sheets = self._load_sheets(path)
+            # Known accounting exports map straight to transactions
+            result = self._parse_known_export(sheets, path, category_hint)
+            if result is not None:
+                return self._deterministic_document(result, category_hint, cache_key)
+            content = self._read_csv(path, sheets[""]) if suffix == '.csv' else self._read_excel(path, sheets)
         else:
             raise ValueError(f"Unsupported file type: {suffix}")
         
-        # Use Claude to extract structured data
-        return self._extract_with_claude(content, str(path))
+        # Decide what this is before paying to extract it
+        triage = triage_content(content, suffix)
+        if triage.kind in SKIP_KINDS:
+            return self._skipped_document(path, category_hint, triage.kind, triage.reason)
+        document_kind = triage.kind if triage.kind != "unknown" and triage.confidence != "low" else None
+        
+        max_chars = self._chunk_chars(document_kind)
+        if len(content) > max_chars:
+            chunks = self._split_content(content, max_chars)
+        else:
+            chunks = [content]
+        
+        return PreparedDocument(
+            file_path=str(path),
+            category_hint=category_hint,
+            strategy="chunked" if len(chunks) > 1 else "single",
+            document_kind=document_kind,
+            cache_key=cache_key,
+            chunks=chunks
+        )
+    
+    def _chunk_chars(self, document_kind: Optional[str]) -> int:
+        """Content per extraction call. Every statement line is a transaction, so
+        statements get smaller chunks to keep each response well under max_tokens."""
+        return self.max_content_chars // 2 if document_kind == "bank_statement" else self.max_content_chars
+    
+    @staticmethod
+    def _skipped_document(
+        path: Path, 
+        category_hint: Optional[str], 
+        document_type: str, 
+        reason: str
+    ) -> PreparedDocument:
+        """A document that won't be sent to Claude (empty, unreadable scan, duplicate)."""
+        print(f"    ⚠ {path.name}: {reason} - skipped")
+        return PreparedDocument(
+            file_path=str(path),
+            category_hint=category_hint,
+            strategy="skipped",
+            result=ExtractionResult(
+                document_type=document_type,
+                file_path=str(path),
+                transactions=[],
+                extraction_notes=f"{reason} - not sent for extraction.",
+                # Scans hold real transactions someone has to enter by hand
+                needs_review=document_type == "unreadable_scan"
+            )
+        )
+    
+    def _prepare_streamed_workbook(
+        self, 
+        path: Path, 
+        category_hint: Optional[str], 
+        cache_key: Optional[str]
+    ) -> PreparedDocument:
+        """
+        prepare_file() for a large workbook, reading it in bounded row batches.
+        
+        Known export and bank statement layouts are mapped batch by batch, as
+        in the in-memory path. Anything else is triaged from its first batch,
+        then streamed once to measure its chunks for the forecast; the chunk
+        text is not kept, and is cut again from the file at extraction time.
+        Either way no more than one batch of rows is held as a DataFrame.
+        """
+        print(f"    {path.name}: streaming workbook in batches of {EXCEL_BATCH_ROWS:,} rows")
+        
+        result = self._stream_known_export(path, category_hint)
+        if result is not None:
+            return self._deterministic_document(result, category_hint, cache_key)
+        
+        # Decide what this is before paying to extract it
+        batches = iter_sheet_batches(path)
+        try:
+            first = next(batches, None)
+        finally:
+            batches.close()
+        if first is None:
+            return self._skipped_document(path, category_hint, "empty", "No rows found")
+        triage = triage_content(serialize_table(first[1], sheet_name=first[0])[0], path.suffix)
+        if triage.kind in SKIP_KINDS:
+            return self._skipped_document(path, category_hint, triage.kind, triage.reason)
+        document_kind = triage.kind if triage.kind != "unknown" and triage.confidence != "low" else None
+        
+        chunk_tokens = []
+        content_hash = hashlib.sha256()
+        sheet_stats = []
+        for chunk in self._iter_streamed_chunks(path, self._chunk_chars(document_kind), sheet_stats):
+            chunk_tokens.append((estimate_tokens(chunk), estimate_output_tokens(chunk, self.max_tokens)))
+            content_hash.update(chunk.encode("utf-8"))
+        self._record_serialization_stats(path, sheet_stats)
+        
+        return PreparedDocument(
+            file_path=str(path),
+            category_hint=category_hint,
+            strategy="streamed",
+            document_kind=document_kind,
+            cache_key=cache_key,
+            chunk_tokens=chunk_tokens,
+            content_key=content_hash.hexdigest()[:16]
+        )
+    
+    def _iter_streamed_chunks(
+        self, 
+        path: Path, 
+        max_chars: int, 
+        sheet_stats: Optional[list[dict]] = None
+    ) -> Iterator[str]:
+        """
+        Serialise a workbook batch by batch into extraction chunks, yielding
+        each chunk as soon as it is full.
+        
+        Args:
+            path: Workbook to stream
+            max_chars: Chunk size
+            sheet_stats: Collects each batch's serialisation stats, if given
+        """
+        chunk = ""
+        for sheet_name, batch in iter_sheet_batches(path):
+            text, stats = serialize_table(batch, sheet_name=sheet_name)
+            if sheet_stats is not None:
+                sheet_stats.append(stats)
+            pieces = self._split_content(text, max_chars) if len(text) > max_chars else [text]
+            for piece in pieces:
+                if chunk and len(chunk) + len(piece) + 2 <= max_chars:
+                    chunk += "\n\n" + piece
+                else:
+                    if chunk:
+                        yield chunk
+                    chunk = piece
+        if chunk:
+            yield chunk
     
-    def _read_pdf(self, path: Path) -> str:
-        """Extract text content from PDF."""
-        if pdfplumber is None:
-            raise ImportError("pdfplumber required for PDF processing. Run: pip install pdfplumber")
+    def _stream_known_export(self, path: Path, category_hint: Optional[str]) -> Optional[ExtractionResult]:
+        """Streaming counterpart of _parse_known_export(): map a statement or export batch by batch."""
+        headers = sheet_headers(path)
+        if not headers:
+            return None
+        
+        # Bank layouts first, as in _parse_known_export(); the header row is enough to tell
+        is_statement = {}
+        references = {}
+        for name, columns in headers.items():
+            is_statement[name] = detect_bank_profile(pd.DataFrame(columns=columns)) is not None
+            if not is_statement[name]:
+                profile = detect_export_profile(columns)
+                if profile is None:
+                    return None
+                # Multi-line invoices must land in one batch to be collapsed correctly
+                references[name] = profile[1].get("reference")
+        
+        def parsed() -> Iterator[Optional[dict]]:
+            started = set()
+            for sheet_name, batch in keep_groups_together(iter_sheet_batches(path), references):
+                if is_statement[sheet_name]:
+                    export = parse_bank_statement(batch, continuation=sheet_name in started)
+                    started.add(sheet_name)
+                    # A batch of only balance lines has no transactions, but the layout is known
+                    if export is not None:
+                        yield export
+                else:
+                    yield parse_export(batch, category_hint=category_hint)
+        
+        return self._export_result(parsed(), path)
+    
+    def extract_prepared(self, doc: PreparedDocument) -> ExtractionResult:
+        """Run the extraction planned by prepare_file()."""
+        if doc.strategy in ("cached", "skipped", "error"):
+            return doc.result
+        
+        if doc.strategy == "categorise":
+            result = self._categorise_transactions(doc.result)
+        elif doc.strategy == "streamed":
+            result = self._extract_streamed(doc)
+        elif doc.result is not None:
+            result = doc.result
+        elif len(doc.chunks) > 1:
+            result = self._extract_chunked(doc.chunks, doc.file_path, doc.category_hint, doc.document_kind)
+        else:
+            result = self._extract_with_claude(
+                doc.chunks[0], doc.file_path, category_hint=doc.category_hint, document_kind=doc.document_kind
+            )
+        
+        # Don't cache failures - they should be retried next run
+        if doc.cache_key and result.document_type != "error":
+            self.cache.set(doc.cache_key, result.model_dump())
+        
+        return result
+    
+    def _read_pdf(self, path: Path, file_hash: Optional[str] = None) -> str:
+        """Extract text content from PDF, parsing pages in parallel."""
+        started = time.perf_counter()
+        pages = read_pdf_pages(path, file_hash or FileHandler.get_file_hash(path), cache=self.page_cache)
+        
+        self.pdf_page_timings[str(path)] = [
+            {"page": p["page"], "seconds": p["seconds"], "cached": p["cached"]} for p in pages
+        ]
+        cached = sum(1 for p in pages if p["cached"])
+        print(f"    {path.name}: parsed {len(pages)} pages in {time.perf_counter() - started:.1f}s "
+              f"({cached} from cache)")
         
         text_content = []
-        with pdfplumber.open(path) as pdf:
-            for page in pdf.pages:
-                text = page.extract_text()
-                if text:
-                    text_content.append(text)
-                
-                # Also try to extract tables
-                tables = page.extract_tables()
-                for table in tables:
-                    if table:
-                        table_text = "\n".join(["\t".join([str(cell) if cell else "" for cell in row]) for row in table])
-                        text_content.append(f"\n[TABLE]\n{table_text}\n[/TABLE]")
+        for page in pages:
+            # Page markers let long documents be chunked on page boundaries
+            text_content.append(f"[PAGE {page['page']}]")
+            if page["text"]:
+                text_content.append(page["text"])
+            for table_text in page["tables"]:
+                text_content.append(f"\n[TABLE]\n{table_text}\n[/TABLE]")
         
         return "\n\n".join(text_content)
     
-    def _read_excel(self, path: Path) -> str:
-        """Read Excel file and convert to text representation."""
-        df = pd.read_excel(path, sheet_name=None)  # Read all sheets
+    def _load_sheets(self, path: Path) -> dict[str, pd.DataFrame]:
+        """Load a CSV or Excel file as {sheet_name: DataFrame} (CSV uses "")."""
+        if path.suffix.lower() == '.csv':
+            return {"": pd.read_csv(path)}
+        return pd.read_excel(path, sheet_name=None)  # Read all sheets
+    
+    def _parse_known_export(
+        self, 
+        sheets: dict[str, pd.DataFrame], 
+        path: Path, 
+        category_hint: Optional[str] = None
+    ) -> Optional[ExtractionResult]:
+        """
+        Parse an accounting software export without calling Claude.
+        
+        Returns None unless every non-empty sheet matches a known layout, in
+        which case the whole file goes to Claude as before.
+        """
+        parsed = []
+        for sheet_df in sheets.values():
+            if sheet_df.dropna(how='all').empty:
+                continue
+            export = parse_bank_statement(sheet_df) or parse_export(sheet_df, category_hint=category_hint)
+            if export is None:
+                return None
+            parsed.append(export)
+        
+        return self._export_result(parsed, path)
+    
+    def _export_result(self, parsed: Iterable[Optional[dict]], path: Path) -> Optional[ExtractionResult]:
+        """
+        Combine parse_export() outputs for one file into an ExtractionResult.
+        
+        parsed is consumed one output at a time, so streamed batches are
+        turned into transactions and dropped as they arrive. Returns None if
+        there are none, or if any is None (an unrecognised sheet or batch).
+        """
+        transactions = []
+        doc_types = Counter()
+        software = {}
+        for p in parsed:
+            if p is None:
+                return None
+            transactions.extend(Transaction(**r) for r in p["rows"].to_dict('records'))
+            doc_types[p["document_type"]] += 1
+            software[p["software"]] = None
+        if not doc_types:
+            return None
+        
+        software = ", ".join(software)
+        document_type = doc_types.most_common(1)[0][0]
+        if document_type == "bank_statement":
+            notes = f"Parsed directly from {software} statement layout."
+        else:
+            notes = f"Parsed directly from {software} export layout (no API call)."
+        
+        return ExtractionResult(
+            document_type=document_type,
+            file_path=str(path),
+            transactions=transactions,
+            extraction_notes=notes,
+            needs_review=False,
+            api_cost=0.0
+        )
+    
+    def _deterministic_document(
+        self, 
+        result: ExtractionResult, 
+        category_hint: Optional[str], 
+        cache_key: Optional[str]
+    ) -> PreparedDocument:
+        """Plan a locally parsed file: done, or waiting only on categories for its unique descriptions."""
+        result = self._apply_vendor_memo(result)
+        pending = self._pending_descriptions(result)
+        return PreparedDocument(
+            file_path=result.file_path,
+            category_hint=category_hint,
+            strategy="categorise" if pending else "deterministic",
+            cache_key=cache_key,
+            chunks=self._categorisation_batches(pending),
+            result=result
+        )
+    
+    @staticmethod
+    def _needs_category(t: Transaction) -> bool:
+        """Bank lines, and rows of exports without a category column, are labelled by description."""
+        return t.category == "uncategorised" and t.type in ("revenue", "expense")
+    
+    @staticmethod
+    def _label_kind(result: ExtractionResult, t: Transaction) -> str:
+        """
+        What a description is labelled as: "job" for invoice and quote lines
+        (work done for a customer, labelled with a job category), otherwise
+        the transaction type (bank money in / money out).
+        """
+        if t.type == "revenue" and result.document_type != "bank_statement":
+            return "job"
+        return t.type
+    
+    def _pending_descriptions(self, result: ExtractionResult) -> dict[tuple[str, str], str]:
+        """
+        Unique descriptions still to be categorised, first-seen order.
+        
+        Returns:
+            {(normalised description, type): first raw description seen}
+        """
+        pending = {}
+        for t in result.transactions:
+            if self._needs_category(t):
+                pending.setdefault((normalize_description(t.description), self._label_kind(result, t)), t.description)
+        return pending
+    
+    def _categorisation_batches(self, pending: dict[tuple[str, str], str]) -> list[str]:
+        """Numbered description lines for the categorisation calls, CATEGORISATION_BATCH_SIZE per call."""
+        lines = [
+            f"{i}. [{LABEL_MARKERS[kind]}] {description}"
+            for i, ((_, kind), description) in enumerate(pending.items(), start=1)
+        ]
+        return [
+            "\n".join(lines[start:start + CATEGORISATION_BATCH_SIZE])
+            for start in range(0, len(lines), CATEGORISATION_BATCH_SIZE)
+        ]
+    
+    def _apply_labels(self, result: ExtractionResult, labels: dict[tuple[str, str], dict]) -> ExtractionResult:
+        """Broadcast {(normalised description, type): label} onto every matching transaction."""
+        if not labels:
+            return result
+        transactions = []
+        for t in result.transactions:
+            label = None
+            if self._needs_category(t):
+                label = labels.get((normalize_description(t.description), self._label_kind(result, t)))
+            if label is None:
+                transactions.append(t)
+                continue
+            update = {"category": label["category"]}
+            # Only replace a counterparty that is just the raw bank description
+            if label.get("counterparty") and t.customer_or_vendor == t.description:
+                update["customer_or_vendor"] = label["counterparty"]
+            transactions.append(t.model_copy(update=update))
+        return result.model_copy(update={"transactions": transactions})
+    
+    def _apply_vendor_memo(self, result: ExtractionResult) -> ExtractionResult:
+        """Label every description the memo already knows, at no API cost."""
+        if self.vendor_memo is None:
+            return result
+        labels = {}
+        for key in self._pending_descriptions(result):
+            label = self.vendor_memo.get(*key)
+            if label is not None:
+                labels[key] = label
+        with self._cost_lock:
+            self.memo_hits += len(labels)
+        return self._apply_labels(result, labels)
+    
+    def _categorise_transactions(self, result: ExtractionResult) -> ExtractionResult:
+        """
+        Label locally parsed lines with a category and counterparty.
+        
+        Descriptions are normalised and de-duplicated, so Claude sees each
+        vendor once; the labels are then applied to every matching line and
+        saved to the vendor memo for later audits. Lines that can't be labelled
+        (bad response, budget used up) stay "uncategorised" and the result is
+        flagged for review rather than failing the document.
+        """
+        # Another document may have taught the memo some of these since prepare_file()
+        result = self._apply_vendor_memo(result)
+        pending = self._pending_descriptions(result)
+        keys = list(pending)
+        batches = self._categorisation_batches(pending)
+        
+        labels = {}
+        cost = 0.0
+        note = ""
+        for batch in batches:
+            try:
+                batch_labels, batch_cost = self._label_descriptions(batch)
+            except BudgetExceededError as e:
+                note = f" {e}."
+                break
+            cost += batch_cost
+            for label_id, label in batch_labels.items():
+                category = re.sub(r'[^a-z0-9]+', '_', str(label.get("category") or "").lower()).strip('_')
+                if 1 <= label_id <= len(keys) and category:
+                    labels[keys[label_id - 1]] = {
+                        "counterparty": str(label["counterparty"]) if label.get("counterparty") else None,
+                        "category": category
+                    }
+        
+        if self.vendor_memo is not None:
+            for key, label in labels.items():
+                self.vendor_memo.put(*key, label)
+        
+        missing = len(pending) - len(labels)
+        if missing:
+            note += f" {missing} of {len(pending)} descriptions could not be categorised."
+        
+        result = self._apply_labels(result, labels)
+        return result.model_copy(update={
+            "extraction_notes": (
+                f"{result.extraction_notes} Categorised {len(labels)} unique descriptions "
+                f"in {len(batches)} call(s).{note}"
+            ),
+            "needs_review": result.needs_review or missing > 0,
+            "api_cost": result.api_cost + cost
+        })
+    
+    def _label_descriptions(self, batch: str) -> tuple[dict[int, dict], float]:
+        """
+        One categorisation call.
+        
+        Returns:
+            ({id: {"counterparty", "category"}}, cost); labels are empty if the
+            response couldn't be parsed
+        """
+        self._check_budget()
+        message = self.client.messages.create(
+            model=self.model,
+            max_tokens=self.max_tokens,
+            system=cached_system(CATEGORISATION_PROMPT),
+            messages=[{"role": "user", "content": f"LINES:\n\n{batch}"}]
+        )
+        
+        cost = usage_cost(message.usage, self.input_cost_per_1m, self.output_cost_per_1m)
+        with self._cost_lock:
+            self.total_cost += cost
+            self.token_usage.update(usage_tokens(message.usage))
+        
+        try:
+            data = json.loads(self._json_text(message.content[0].text))
+            return {int(label["id"]): label for label in data.get("labels", [])}, cost
+        except (json.JSONDecodeError, KeyError, TypeError, ValueError):
+            return {}, cost
+    
+    def _read_excel(self, path: Path, sheets: Optional[dict[str, pd.DataFrame]] = None) -> str:
+        """Read Excel file and convert to compact text representation."""
+        df = sheets if sheets is not None else pd.read_excel(path, sheet_name=None)  # Read all sheets
         
         content = []
+        sheet_stats = []
         for sheet_name, sheet_df in df.items():
-            content.append(f"[SHEET: {sheet_name}]")
-            content.append(sheet_df.to_string())
+            text, stats = serialize_table(sheet_df, sheet_name=str(sheet_name))
+            content.append(text)
+            sheet_stats.append(stats)
         
+        self._record_serialization_stats(path, sheet_stats)
         return "\n\n".join(content)
     
-    def _read_csv(self, path: Path) -> str:
-        """Read CSV file and convert to text representation."""
-        df = pd.read_csv(path)
-        return df.to_string()
+    def _read_csv(self, path: Path, df: Optional[pd.DataFrame] = None) -> str:
+        """Read CSV file and convert to compact text representation."""
+        if df is None:
+            df = pd.read_csv(path)
+        text, stats = serialize_table(df)
+        self._record_serialization_stats(path, [stats])
+        return text
+    
+    def _record_serialization_stats(self, path: Path, sheet_stats: list[dict]) -> None:
+        """Total up per-sheet serialisation stats for a file and log the saving."""
+        totals = {key: sum(s[key] for s in sheet_stats) for key in sheet_stats[0]} if sheet_stats else {}
+        self.serialization_stats[str(path)] = totals
+        if totals.get("baseline_tokens"):
+            saved_pct = totals["tokens_saved"] / totals["baseline_tokens"] * 100
+            print(f"    {path.name}: ~{totals['compact_tokens']:,} input tokens "
+                  f"(saved ~{totals['tokens_saved']:,}, {saved_pct:.0f}% vs plain table)")
     
-    def _extract_with_claude(self, content: str, file_path: str) -> ExtractionResult:
+    def _split_content(self, content: str, max_chars: int) -> list[str]:
+        """
+        Split document content into chunks of at most max_chars.
+        
+        Whole pages/sheets are packed together where they fit. A page or sheet
+        that is too big on its own is split between rows, and every piece
+        repeats the section's header lines so column names and abbreviation
+        legends aren't lost.
+        """
+        sections = [sec for sec in SECTION_MARKER.split(content) if sec.strip()]
+        
+        pieces = []
+        for section in sections:
+            if len(section) <= max_chars:
+                pieces.append(section)
+                continue
+            
+            lines = [line for line in section.split("\n") if line.strip()]
+            # PDF pages repeat just the marker. Tables repeat the sheet marker
+            # (if any), the "#" note/abbreviation lines and the column header.
+            if section.startswith("[PAGE"):
+                header_count = 1
+            else:
+                header_count = 1 if section.startswith("[SHEET:") else 0
+                while header_count < len(lines) and lines[header_count].startswith("#"):
+                    header_count += 1
+                header_count += 1
+            header = "\n".join(lines[:header_count])
+            
+            current = []
+            current_len = len(header)
+            for line in lines[header_count:]:
+                if current and current_len + len(line) + 1 > max_chars:
+                    pieces.append(header + "\n" + "\n".join(current))
+                    current, current_len = [], len(header)
+                current.append(line)
+                current_len += len(line) + 1
+            if current:
+                pieces.append(header + "\n" + "\n".join(current))
+        
+        # Greedily pack small pieces back together
+        chunks = []
+        for piece in pieces:
+            if chunks and len(chunks[-1]) + len(piece) + 2 <= max_chars:
+                chunks[-1] += "\n\n" + piece
+            else:
+                chunks.append(piece)
+        
+        return chunks
+    
+    def _extract_chunked(
+        self, 
+        chunks: list[str], 
+        file_path: str, 
+        category_hint: Optional[str] = None,
+        document_kind: Optional[str] = None
+    ) -> ExtractionResult:
+        """
+        Map-reduce extraction for long documents.
+        
+        Chunks (from _split_content) are extracted in parallel, then merged back
+        into one result with transactions repeated across a chunk seam removed.
+        """
+        print(f"    Splitting {Path(file_path).name} into {len(chunks)} chunks")
+        
+        workers = max(1, min(self.max_workers, len(chunks)))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(
+                lambda args: self._extract_chunk_safely(
+                    args[1], file_path, (args[0] + 1, len(chunks)), category_hint, document_kind
+                ),
+                enumerate(chunks)
+            ))
+        
+        return self._merge_chunk_results(results, file_path)
+    
+    def _extract_streamed(self, doc: PreparedDocument) -> ExtractionResult:
+        """
+        _extract_chunked() for a streamed workbook.
+        
+        Chunks are cut from the file again and each is sent as soon as it is
+        cut, with at most max_workers in flight, so the workbook's text is
+        never held whole.
+        """
+        path = Path(doc.file_path)
+        total = len(doc.chunk_tokens)
+        print(f"    Streaming {path.name} to Claude in {total} chunks")
+        
+        workers = max(1, min(self.max_workers, total))
+        futures = []
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            pending = set()
+            for index, chunk in enumerate(self._iter_streamed_chunks(path, self._chunk_chars(doc.document_kind))):
+                if len(pending) >= workers:
+                    _, pending = wait(pending, return_when=FIRST_COMPLETED)
+                future = pool.submit(
+                    self._extract_chunk_safely, 
+                    chunk, doc.file_path, (index + 1, max(total, index + 1)), doc.category_hint, doc.document_kind
+                )
+                futures.append(future)
+                pending.add(future)
+        
+        return self._merge_chunk_results([f.result() for f in futures], doc.file_path)
+    
+    def _extract_chunk_safely(
+        self, 
+        chunk: str, 
+        file_path: str, 
+        part: tuple[int, int], 
+        category_hint: Optional[str], 
+        document_kind: Optional[str]
+    ) -> ExtractionResult:
+        """Extract one chunk of a document, converting any failure into an error result for that part."""
+        try:
+            return self._extract_with_claude(
+                chunk, 
+                file_path, 
+                part=part, 
+                category_hint=category_hint, 
+                document_kind=document_kind
+            )
+        except Exception as e:
+            return ExtractionResult(
+                document_type="error",
+                file_path=file_path,
+                transactions=[],
+                extraction_notes=f"Error processing part {part[0]}: {str(e)}",
+                needs_review=True
+            )
+    
+    def _merge_chunk_results(self, results: list[ExtractionResult], file_path: str) -> ExtractionResult:
+        """Reduce per-chunk results into a single ExtractionResult."""
+        # Only transactions right at a seam can be double-extracted, so only
+        # the tail of one chunk is compared against the head of the next.
+        seam_window = 5
+        
+        transactions = []
+        previous_tail = Counter()
+        for result in results:
+            for i, t in enumerate(result.transactions):
+                key = self._transaction_key(t)
+                if i < seam_window and previous_tail[key] > 0:
+                    previous_tail[key] -= 1
+                    continue
+                transactions.append(t)
+            previous_tail = Counter(self._transaction_key(t) for t in result.transactions[-seam_window:])
+        
+        succeeded = [r for r in results if r.document_type != "error"]
+        doc_types = Counter(r.document_type for r in succeeded if r.document_type != "unknown")
+        if doc_types:
+            document_type = doc_types.most_common(1)[0][0]
+        else:
+            document_type = "unknown" if succeeded else "error"
+        
+        notes = [f"Extracted in {len(results)} parts."]
+        for i, r in enumerate(results, 1):
+            if r.extraction_notes:
+                notes.append(f"Part {i}: {r.extraction_notes}")
+        
+        return ExtractionResult(
+            document_type=document_type,
+            file_path=file_path,
+            transactions=transactions,
+            extraction_notes="\n".join(notes),
+            needs_review=any(r.needs_review for r in results),
+            api_cost=sum(r.api_cost for r in results)
+        )
+    
+    @staticmethod
+    def _transaction_key(t: Transaction) -> tuple:
+        """Identity of a transaction for duplicate detection."""
+        return (t.date, round(t.amount, 2), t.type, " ".join(t.description.lower().split())[:40])
+    
+    def _check_budget(self) -> None:
+        """Refuse further extraction calls once the audit's extraction budget is spent."""
+        # The forecast is checked up front; this catches estimates that ran low
+        if self.max_cost_per_audit is not None:
+            extraction_budget = self.max_cost_per_audit - self.analysis_cost_reserve
+            if self.total_cost >= extraction_budget:
+                raise BudgetExceededError(
+                    f"Extraction budget of ${extraction_budget:.2f} used up "
+                    f"(${self.total_cost:.2f} spent) - document skipped"
+                )
+    
+    @staticmethod
+    def _json_text(response_text: str) -> str:
+        """JSON part of a response, handling markdown code blocks."""
+        if "```json" in response_text:
+            return response_text.split("```json")[1].split("```")[0]
+        if "```" in response_text:
+            return response_text.split("```")[1].split("```")[0]
+        return response_text
+    
+    def _extract_with_claude(
+        self, 
+        content: str, 
+        file_path: str, 
+        part: Optional[tuple[int, int]] = None,
+        category_hint: Optional[str] = None,
+        document_kind: Optional[str] = None
+    ) -> ExtractionResult:
         """
         Use Claude to extract structured data from document content.
+        
+        Args:
+            content: Document text (or one chunk of it)
+            file_path: Source file, for the result
+            part: (index, total) when content is one chunk of a longer document
+            category_hint: Upload category the customer filed this document under
+            document_kind: What local triage classified the document as
         """
-        # Truncate very long content to avoid excessive API costs
-        max_content_chars = 50000
+        self._check_budget()
+        
+        # Chunking should keep content under the limit; this is a last-resort guard
+        max_content_chars = max(self.max_content_chars, 50000)
         if len(content) > max_content_chars:
             content = content[:max_content_chars] + "\n\n[CONTENT TRUNCATED - Document too long]"
         
-        message = self.client.messages.create(
+        part_note = document_note(category_hint, document_kind)
+        if part:
+            part_note += (
+                f"NOTE: This is part {part[0]} of {part[1]} of a longer document. "
+                "Extract every transaction in this part only.\n"
+            )
+        if part_note:
+            part_note += "\n"
+        
+        # Static instructions go in a cached system prompt; only the document varies
+        request = dict(
             model=self.model,
-            max_tokens=4096,
+            max_tokens=self.max_tokens,
+            system=cached_system(DATA_EXTRACTION_PROMPT),
             messages=[
                 {
                     "role": "user",
-                    "content": f"{DATA_EXTRACTION_PROMPT}\n\n---\n\nDOCUMENT CONTENT:\n\n{content}"
+                    "content": f"{part_note}DOCUMENT CONTENT:\n\n{content}"
                 }
             ]
         )
+        parser = None
+        if self.streaming:
+            message, parser = self._stream_message(request, file_path)
+        else:
+            message = self.client.messages.create(**request)
         
         # Track costs
-        input_tokens = message.usage.input_tokens
-        output_tokens = message.usage.output_tokens
-        cost = (input_tokens / 1_000_000 * self.input_cost_per_1m + 
-                output_tokens / 1_000_000 * self.output_cost_per_1m)
-        self.total_cost += cost
+        cost = usage_cost(message.usage, self.input_cost_per_1m, self.output_cost_per_1m)
+        with self._cost_lock:
+            self.total_cost += cost
+            self.token_usage.update(usage_tokens(message.usage))
         
         # Parse response
         response_text = message.content[0].text
         
-        # Extract JSON from response (handle markdown code blocks)
-        json_str = response_text
-        if "```json" in response_text:
-            json_str = response_text.split("```json")[1].split("```")[0]
-        elif "```" in response_text:
-            json_str = response_text.split("```")[1].split("```")[0]
+        json_str = self._json_text(response_text)
+        
+        truncated = message.stop_reason == "max_tokens"
         
         try:
             data = json.loads(json_str)
         except json.JSONDecodeError:
+            # A stream cut off at max_tokens still has its completed transactions
+            if parser and parser.transactions:
+                return ExtractionResult(
+                    document_type=parser.document_type or "unknown",
+                    file_path=file_path,
+                    transactions=[self._to_transaction(t) for t in parser.transactions],
+                    extraction_notes=(
+                        f"Response {'hit max_tokens' if truncated else 'was incomplete'} after "
+                        f"{len(parser.transactions)} transactions - later transactions may be missing."
+                    ),
+                    needs_review=True,
+                    api_cost=cost
+                )
+            
             # If JSON parsing fails, return error result
+            reason = "Response hit max_tokens. " if truncated else ""
             return ExtractionResult(
                 document_type="error",
                 file_path=file_path,
                 transactions=[],
-                extraction_notes=f"Failed to parse Claude response: {response_text[:500]}",
+                extraction_notes=f"{reason}Failed to parse Claude response: {response_text[:500]}",
                 needs_review=True,
                 api_cost=cost
             )
         
         # Convert to ExtractionResult
-        transactions = []
-        for t in data.get("transactions", []):
-            transactions.append(Transaction(
-                date=t.get("date", "unknown"),
-                customer_or_vendor=t.get("customer_or_vendor", "Unknown"),
-                description=t.get("description", ""),
-                amount=float(t.get("amount", 0)),
-                type=t.get("type", "unknown"),
-                category=t.get("category", "other"),
-                status=t.get("status", "unknown"),
-                line_items=t.get("line_items", []),
-                confidence=t.get("confidence", "medium")
-            ))
+        transactions = [self._to_transaction(t) for t in data.get("transactions", [])]
         
         return ExtractionResult(
             document_type=data.get("document_type", "unknown"),
@@ -252,45 +1486,102 @@ class DataExtractor:
             api_cost=cost
         )
     
+    def _stream_message(self, request: dict, file_path: str) -> tuple:
+        """
+        Stream a Claude response, reporting each transaction as it completes.
+        
+        The read timeout applies between streamed chunks, so a stream that goes
+        quiet fails after stream_stall_seconds rather than hanging until the
+        response would have finished.
+        
+        Returns:
+            (final message, TransactionStreamParser holding what was parsed)
+        """
+        parser = TransactionStreamParser()
+        name = Path(file_path).name
+        try:
+            with self.client.messages.stream(
+                **request, 
+                timeout=anthropic.Timeout(self.stream_stall_seconds, connect=10.0)
+            ) as stream:
+                for delta in stream.text_stream:
+                    for t in parser.feed(delta):
+                        self._emit_progress(
+                            "transaction", 
+                            file=name, 
+                            transaction=self._to_transaction(t), 
+                            count=len(parser.transactions)
+                        )
+                message = stream.get_final_message()
+        except anthropic.APITimeoutError as e:
+            raise RuntimeError(
+                f"Response stream stalled (no data for {self.stream_stall_seconds:.0f}s "
+                f"after {len(parser.transactions)} transactions)"
+            ) from e
+        return message, parser
+    
+    @staticmethod
+    def _to_transaction(t: dict) -> Transaction:
+        """Build a Transaction from Claude's JSON, filling defaults for missing fields."""
+        return Transaction(
+            date=t.get("date", "unknown"),
+            customer_or_vendor=t.get("customer_or_vendor", "Unknown"),
+            description=t.get("description", ""),
+            amount=float(t.get("amount", 0)),
+            type=t.get("type", "unknown"),
+            category=t.get("category", "other"),
+            status=t.get("status", "unknown"),
+            line_items=t.get("line_items", []),
+            confidence=t.get("confidence", "medium")
+        )
+    
     def combine_results(self, results: list[ExtractionResult]) -> dict:
         """
         Combine extraction results into a unified dataset.
         
         Returns dict with:
-        - all_transactions: list of all transactions
-        - revenue_transactions: just revenue
-        - expense_transactions: just expenses
-        - summary: basic stats
+        - all_transactions: columnar transaction table (DataFrame, see
+          src/utils/transaction_table.py) with a source_file column. Records
+          of the same transaction found in several documents are all kept,
+          the extra copies linked to one record through duplicate_of
+        - revenue_transactions: just revenue, without linked duplicates (a slice of the table)
+        - expense_transactions: just expenses, without linked duplicates (a slice of the table)
+        - summary: basic stats, counted over the de-duplicated transactions
         """
-        all_transactions = []
-        for result in results:
-            for t in result.transactions:
-                t_dict = t.model_dump() if hasattr(t, 'model_dump') else t.__dict__
-                t_dict['source_file'] = result.file_path
-                all_transactions.append(t_dict)
+        table = link_duplicates(build_transaction_table(results))
+        revenue = type_view(table, "revenue")
+        expenses = type_view(table, "expense")
         
-        revenue = [t for t in all_transactions if t['type'] == 'revenue']
-        expenses = [t for t in all_transactions if t['type'] == 'expense']
+        linked = table[table["duplicate_of"] >= 0]
+        if len(linked):
+            print(f"  🔗 Linked {len(linked)} transactions that appear in more than one document "
+                  f"(${linked['amount'].sum():,.2f} not double counted)")
         
-        total_revenue = sum(t['amount'] for t in revenue)
-        total_expenses = sum(t['amount'] for t in expenses)
+        total_revenue = float(revenue["amount"].sum())
+        total_expenses = float(expenses["amount"].sum())
         
         needs_review = [r.file_path for r in results if r.needs_review]
+        skipped = [r.file_path for r in results if r.document_type in SKIP_KINDS | {"duplicate"}]
         
         return {
-            'all_transactions': all_transactions,
+            'all_transactions': table,
             'revenue_transactions': revenue,
             'expense_transactions': expenses,
             'summary': {
                 'total_files_processed': len(results),
-                'total_transactions': len(all_transactions),
+                'total_transactions': len(table) - len(linked),
+                'duplicates_linked': len(linked),
                 'revenue_count': len(revenue),
                 'expense_count': len(expenses),
                 'total_revenue': total_revenue,
                 'total_expenses': total_expenses,
                 'gross_profit': total_revenue - total_expenses,
                 'files_needing_review': needs_review,
-                'total_extraction_cost': sum(r.api_cost for r in results)
+                'files_skipped': skipped,
+                'total_extraction_cost': sum(r.api_cost for r in results),
+                'forecast_extraction_cost': self.forecast.extraction_cost if self.forecast else None,
+                'forecast_audit_cost': self.forecast.total_cost if self.forecast else None,
+                'audit_budget': self.max_cost_per_audit
             }
         }
 
@@ -318,7 +1609,8 @@ if __name__ == "__main__":
     print(f"Total revenue: ${combined['summary']['total_revenue']:,.2f}")
     print(f"Total expenses: ${combined['summary']['total_expenses']:,.2f}")
     print(f"Gross profit: ${combined['summary']['gross_profit']:,.2f}")
-    print(f"API cost: ${combined['summary']['total_extraction_cost']:.2f}")
+    print(f"API cost: ${combined['summary']['total_extraction_cost']:.2f} "
+          f"(forecast ${combined['summary']['forecast_extraction_cost'] or 0:.2f})")
     
     if combined['summary']['files_needing_review']:
         print(f"\n⚠️  Files needing review:")
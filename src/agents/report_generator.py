@@ -14,12 +14,12 @@ import json
 from pathlib import Path
 from datetime import datetime
 from typing import Optional
-import anthropic
 from jinja2 import Template
 
 from src.templates.prompts import get_report_summary_prompt
 from src.agents.analyzer import AnalysisResult, BusinessContext
 from src.utils.audit_data_capture import get_data_capture
+from src.utils.anthropic_client import create_client
 
 
 class ReportGenerator:
@@ -29,7 +29,7 @@ class ReportGenerator:
     
     def __init__(self, api_key: Optional[str] = None, output_dir: str = "./output"):
         self.api_key = api_key or os.getenv("ANTHROPIC_API_KEY")
-        self.client = anthropic.Anthropic(api_key=self.api_key) if self.api_key else None
+        self.client = create_client(self.api_key) if self.api_key else None
         self.model = os.getenv("ANTHROPIC_MODEL", "claude-sonnet-4-20250514")
         self.output_dir = Path(output_dir)
         self.output_dir.mkdir(parents=True, exist_ok=True)
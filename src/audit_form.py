@@ -906,6 +906,7 @@ def run_audit():
     from src.agents.data_extractor import DataExtractor
     from src.agents.analyzer import Analyzer, BusinessContext
     from src.agents.report_generator import ReportGenerator
+    from src.utils.cost_planner import BudgetExceededError
     
     data = st.session_state.data
     
@@ -972,8 +973,14 @@ def run_audit():
         json.dump(intake_data, f, indent=2)
     
     # Run extraction
-    extractor = DataExtractor()
-    results = extractor.extract_from_folder(str(folder))
+    extractor = DataExtractor(analysis_cost_reserve=Analyzer.cost_reserve())
+    try:
+        results = extractor.extract_from_folder(str(folder))
+    except BudgetExceededError as e:
+        # Back to the form, so they can upload fewer or smaller files
+        st.session_state.analyzing = False
+        st.error(f"Error: {e}")
+        return
     combined = extractor.combine_results(results)
     
     # Build context with all the new data
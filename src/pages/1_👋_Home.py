@@ -131,10 +131,11 @@ def show_file_upload():
 
 
 def run_analysis(files, business_info):
-    """Run the full audit analysis."""
+    """Run the full audit analysis. Returns None if the upload is over the audit budget."""
     from src.agents.data_extractor import DataExtractor
     from src.agents.analyzer import Analyzer, BusinessContext
     from src.agents.report_generator import ReportGenerator
+    from src.utils.cost_planner import BudgetExceededError
     
     # Save uploaded files to temp directory
     with tempfile.TemporaryDirectory() as temp_dir:
@@ -149,8 +150,13 @@ def run_analysis(files, business_info):
         with st.status("🔍 Analyzing your documents...", expanded=True) as status:
             st.write("📄 Extracting data from documents...")
             
-            extractor = DataExtractor()
-            extraction_results = extractor.extract_from_folder(str(temp_path))
+            extractor = DataExtractor(analysis_cost_reserve=Analyzer.cost_reserve())
+            try:
+                extraction_results = extractor.extract_from_folder(str(temp_path))
+            except BudgetExceededError as e:
+                status.update(label="Upload is over the audit budget", state="error")
+                st.error(f"Error: {e}")
+                return None
             combined_data = extractor.combine_results(extraction_results)
             
             st.write(f"✓ Found {combined_data['summary']['total_transactions']} transactions")
@@ -340,7 +346,8 @@ def home_page():
         if st.button("🚀 Run Growth Audit", type="primary", use_container_width=True):
             try:
                 results = run_analysis(uploaded_files, business_info)
-                st.session_state['results'] = results
+                if results is not None:
+                    st.session_state['results'] = results
             except Exception as e:
                 st.error(f"Error running analysis: {e}")
                 import traceback
@@ -565,7 +565,7 @@ def run_audit_from_submission(folder_path: str, business_info: dict, numbers: di
     )
     
     # Run extraction
-    extractor = DataExtractor()
+    extractor = DataExtractor(analysis_cost_reserve=Analyzer.cost_reserve())
     results = extractor.extract_from_folder(folder_path)
     combined = extractor.combine_results(results)
     
@@ -98,8 +98,8 @@ def get_all_outputs():
 
 
 def run_audit_for_submission(folder_path: str, trade: str = "electrician", 
-                              location: str = "Sydney", rate: float = 95):
-    """Run audit on a customer folder."""
+                              location: str = "Sydney", rate: float = 95, refresh: bool = False):
+    """Run audit on a customer folder. refresh=True redoes the analysis even if it's cached."""
     from src.agents.data_extractor import DataExtractor
     from src.agents.analyzer import Analyzer, BusinessContext
     from src.agents.report_generator import ReportGenerator
@@ -133,13 +133,13 @@ def run_audit_for_submission(folder_path: str, trade: str = "electrician",
         revenue_goal=250000
     )
     
-    # Run pipeline
-    extractor = DataExtractor()
-    results = extractor.extract_from_folder(folder_path)
+    # Run pipeline - files already extracted on an earlier run are reused
+    extractor = DataExtractor(analysis_cost_reserve=Analyzer.cost_reserve())
+    results = extractor.extract_incremental(folder_path)
     combined = extractor.combine_results(results)
     
     analyzer = Analyzer()
-    analysis = analyzer.analyze(combined, context)
+    analysis = analyzer.analyze(combined, context, refresh=refresh)
     
     generator = ReportGenerator(output_dir="./output")
     report = generator.generate_report(analysis, context, customer_name)
@@ -206,10 +206,13 @@ def admin_dashboard_page():
                     rate = sub['data'].get('numbers', {}).get('hourly_rate', 95) or 95
                     st.metric("Hourly Rate", f"${rate}")
                     
+                    refresh = st.checkbox(
+                        "Redo analysis (ignore cached result)", key=f"refresh_{sub['folder_name']}"
+                    )
                     if st.button("▶️ Run Audit", key=f"run_{sub['folder_name']}"):
                         with st.spinner("Running audit..."):
                             try:
-                                result = run_audit_for_submission(sub['folder'])
+                                result = run_audit_for_submission(sub['folder'], refresh=refresh)
                                 opp = result['analysis'].guarantee_check.get('total_opportunity', 0)
                                 st.success(f"✓ Audit complete! Found ${opp:,.0f} in opportunities")
                                 st.rerun()
@@ -305,7 +308,24 @@ def admin_dashboard_page():
                         status.update(label="✅ Audit Complete!", state="complete")
                         
                         st.success(f"Found **${opp:,.0f}** in opportunities!")
-                        
+
+                        summary = result['combined_data']['summary']
+                        cost_col1, cost_col2 = st.columns(2)
+                        with cost_col1:
+                            st.metric("Extraction Cost", f"${summary['total_extraction_cost']:.2f}")
+                        with cost_col2:
+                            if summary.get('forecast_extraction_cost') is not None:
+                                st.metric("Forecast", f"${summary['forecast_extraction_cost']:.2f}",
+                                          help=f"Whole audit forecast ${summary['forecast_audit_cost']:.2f}"
+                                               + (f" of ${summary['audit_budget']:.2f} budget"
+                                                  if summary.get('audit_budget') else ""))
+                        if summary.get('files_skipped'):
+                            st.warning("Not extracted (empty, duplicate or scanned without text): "
+                                       + ", ".join(Path(f).name for f in summary['files_skipped']))
+                        if summary.get('duplicates_linked'):
+                            st.info(f"{summary['duplicates_linked']} transactions appeared in more than one "
+                                    "document and were counted once")
+
                         col1, col2 = st.columns(2)
                         with col1:
                             html_path = result['report']['html_report']
@@ -1604,6 +1604,7 @@ def run_audit_pipeline(business_name, email, trade_type, location, hourly_rate,
     from src.agents.data_extractor import DataExtractor
     from src.agents.analyzer import Analyzer, BusinessContext
     from src.agents.report_generator import ReportGenerator
+    from src.utils.cost_planner import BudgetExceededError
     
     with st.status("Running your audit...", expanded=True) as status:
         st.write("📁 Saving documents...")
@@ -1629,8 +1630,24 @@ def run_audit_pipeline(business_name, email, trade_type, location, hourly_rate,
             }, f, indent=2)
         
         st.write("🔍 Extracting data...")
-        extractor = DataExtractor()
-        results = extractor.extract_from_folder(str(folder))
+        live = st.empty()
+
+        def show_progress(event):
+            if event["event"] == "transaction":
+                t = event["transaction"]
+                live.write(f"⏳ {event['file']}: {event['count']} so far · "
+                           f"{t.customer_or_vendor} ${t.amount:,.2f}")
+            elif event["event"] == "file_done":
+                live.empty()
+                st.write(f"✓ {event['file']}: {event['transactions']} transactions")
+
+        extractor = DataExtractor(analysis_cost_reserve=Analyzer.cost_reserve())
+        try:
+            results = extractor.extract_from_folder(str(folder), progress_callback=show_progress)
+        except BudgetExceededError as e:
+            status.update(label="Upload is over the audit budget", state="error")
+            st.error(f"Error: {e}")
+            return
         combined = extractor.combine_results(results)
         st.write(f"✓ Found {combined['summary']['total_transactions']} transactions")
         
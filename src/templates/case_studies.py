@@ -266,7 +266,7 @@ CASE_STUDIES = {
                 "method": "Coffee meetings, offer trial job at competitive price",
                 "impact": "If each worth $15k/year = $45k additional revenue"
             }
-        },
+        ],
         "implementation": {
             "month_1": "Fired 8 nightmare customers, set minimum job size, started declining small work",
             "month_2": "Called all 5 A-grade customers for catch-up, asked for referrals",
@@ -446,7 +446,7 @@ CASE_STUDIES = {
                 "method": "Offer to be their 'preferred installer' - give dealership 10% referral fee",
                 "impact": "Dealerships sell 20-30 EVs/month - even 10% conversion = consistent pipeline"
             }
-        },
+        ],
         "implementation": {
             "month_1": "Updated Google profile, changed van signage, reached out to 4 EV dealerships",
             "month_2": "Secured partnership with 1 Tesla dealership + 1 multi-brand EV dealer",
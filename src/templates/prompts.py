@@ -23,6 +23,8 @@ FRAMEWORKS AVAILABLE:
 - case_studies.py: Real anonymized case studies showing what works
 """
 
+import json
+
 DATA_EXTRACTION_PROMPT = """You are a financial data extraction specialist for Australian tradie businesses.
 
 Your job is to extract structured transaction data from invoices, bank statements, and quotes.
@@ -77,7 +79,7 @@ Each transaction should have:
 - type: "revenue" or "expense"
 - category: one of the categories listed
 - subcategory: more specific (e.g., "residential_rewire" under "residential_electrical")
-- status: "paid" or "unpaid" or "won" or "lost" or "pending" or "unknown"
+- status: "paid" or "unpaid" or "overdue" (unpaid and past its due date, or marked overdue) or "won" or "lost" or "pending" or "unknown"
 - hours_if_mentioned: number or null
 - job_type: "residential" or "commercial" or "strata" or "government" or "unknown"
 - is_recurring: true/false
@@ -95,131 +97,57 @@ RULES:
 """
 
 
-def get_analysis_prompt(data_summary: str, trade_type: str, location: str, 
-                        years_in_business: int, current_rate: float, 
-                        hours_per_week: int, revenue_goal: float,
-                        market_benchmarks: dict = None,
-                        business_context: dict = None) -> str:
-    """Generate the comprehensive 2026 Growth Audit prompt with all context."""
-    
-    # Format benchmark data for inclusion in prompt
-    benchmark_section = ""
-    if market_benchmarks:
-        hourly = market_benchmarks.get("hourly_rate", {})
-        callout = market_benchmarks.get("call_out_fee", {})
-        benchmark_section = f"""
-VERIFIED MARKET BENCHMARKS FOR {trade_type.upper()} IN {location.upper()}:
-(Source: service.com.au + industry associations, 200+ data points, HIGH confidence)
-
-Hourly Rates:
-- Minimum (25th percentile): ${hourly.get('min', 90)}/hr
-- Average (50th percentile): ${hourly.get('average', 110)}/hr  
-- Maximum (75th percentile): ${hourly.get('max', 130)}/hr
-- Premium (90th percentile): ${hourly.get('premium', hourly.get('max', 130) * 1.15):.0f}/hr
-
-Call-Out Fees:
-- Standard: ${callout.get('min', 80)}-${callout.get('max', 130)} (average ${callout.get('average', 95)})
+# Sent ahead of several small documents packed into one extraction call
+PACKED_EXTRACTION_NOTE = """This request contains {count} separate documents. Each one sits between a
+"=== DOCUMENT <id>: <file name> ===" line and an "=== END DOCUMENT <id> ===" line.
 
-Data Sources: {', '.join([s.get('name', 'Unknown') for s in hourly.get('data_sources', [{'name': 'service.com.au'}])])}
-Confidence Level: {hourly.get('confidence', 'MEDIUM')}
+Extract every document independently - never merge or move transactions between documents.
 
-USE THESE EXACT BENCHMARKS IN YOUR ANALYSIS. Cite them explicitly.
+OUTPUT AS JSON with one entry per document, in the same order:
+{{"documents": [{{"document_id": "D1", "document_type": "...", "transactions": [...], "extraction_notes": "...", "needs_review": false}}]}}
+Each entry follows the single-document structure described in your instructions.
 """
-    
-    # Build comprehensive context from onboarding data
-    context_section = ""
-    if business_context:
-        # Lead generation context
-        lead_sources = business_context.get('lead_sources', [])
-        leads_per_week = business_context.get('leads_per_week', 'Unknown')
-        close_rate = business_context.get('close_rate', 0)
-        google_rating = business_context.get('google_rating', 'Unknown')
-        google_reviews = business_context.get('google_reviews', '0')
-        
-        # Quoting context
-        quote_method = business_context.get('quote_method', 'Unknown')
-        quote_time = business_context.get('quote_time', 'Unknown')
-        quotes_per_month = business_context.get('quotes_per_month', 'Unknown')
-        quote_speed = business_context.get('quote_speed', 'Unknown')
-        
-        # Operations context
-        tools_used = business_context.get('tools_used', [])
-        job_tracking = business_context.get('job_tracking', 'Unknown')
-        follow_up_method = business_context.get('follow_up_method', 'Unknown')
-        biggest_time_waste = business_context.get('biggest_time_waste', 'Unknown')
-        
-        # Goals context
-        hiring_plans = business_context.get('hiring_plans', 'Unknown')
-        biggest_frustration = business_context.get('biggest_frustration', '')
-        magic_wand = business_context.get('magic_wand', '')
-        
-        context_section = f"""
-## DETAILED BUSINESS CONTEXT FROM INTAKE INTERVIEW
-
-### LEAD GENERATION & MARKETING
-- Lead sources: {', '.join(lead_sources) if lead_sources else 'Not specified'}
-- Leads per week: {leads_per_week}
-- Quote-to-job conversion rate: {close_rate}%
-- Google Business rating: {google_rating}
-- Number of Google reviews: {google_reviews}
 
-ANALYZE: 
-- If conversion rate < 35%, there's a quoting or pricing problem
-- If conversion rate > 50%, they may be underpricing
-- Google presence is critical in 2026 - less than 20 reviews = invisible online
-- Relying on word-of-mouth only = growth ceiling
+# Labels bank statement lines that were parsed locally. Only the unique
+# descriptions are sent, so the model never re-types amounts or dates.
+CATEGORISATION_PROMPT = """You categorise bank statement lines and invoice/quote descriptions for an Australian tradie business.
 
-### QUOTING PROCESS
-- How they create quotes: {quote_method}
-- Time per quote: {quote_time}
-- Quotes sent per month: {quotes_per_month}
-- Speed to quote: {quote_speed}
+Each input line is: <id>. [in|out|job] <description>
+"in" is money received and "out" is money paid (bank or ledger lines).
+"job" is the description of work invoiced or quoted to a customer.
 
-ANALYZE:
-- "Mental math + text" = inconsistent pricing, leaving money on table
-- Anything over 30 min per quote = major admin burden
-- Slower than "same day" response = losing jobs to faster competitors
-- Track: (Quotes × Time per quote × Hourly rate) = true cost of quoting
+For every line, give:
+- counterparty: the business or person on the other side, cleaned up ("BUNNINGS 1234 ALEXANDRIA" -> "Bunnings"). Use "Unknown" if it can't be told.
+- category: one of
+  money out: materials, fuel, insurance, tools, subscriptions, subcontractor, vehicle, marketing, software, wages, rent, utilities, phone_internet, bank_fees, loan_repayment, tax, owner_drawings, transfer, other_expense
+  money in: customer_payment, refund, interest, transfer, loan, other_income
+  job: the kind of job, as a short snake_case job type for the trade ("switchboard_upgrade", "lighting", "hot_water", "blocked_drain", "bathroom_renovation", "maintenance"). Keep them broad enough that similar jobs share a category, and reuse the same name for the same kind of job.
 
-### CURRENT TOOLS & SYSTEMS
-- Software used: {', '.join(tools_used) if tools_used else 'None / Paper'}
-- Job tracking method: {job_tracking}
-- Lead follow-up method: {follow_up_method}
-- Biggest time waste: {biggest_time_waste}
+OUTPUT ONLY JSON:
+{"labels": [{"id": 1, "counterparty": "Bunnings", "category": "materials"}]}
 
-ANALYZE:
-- "Paper / manual" + "In my head" = operational risk + admin burden
-- No job management software = missing data for optimization
-- "{follow_up_method}" follow-up approach = {"MAJOR LEAK - losing 30-40% of potential jobs" if "don't" in follow_up_method.lower() else "needs optimization"}
-- They said "{biggest_time_waste}" is their biggest time waste - address this DIRECTLY in recommendations
+Label every id exactly once. Transfers between the business's own accounts are "transfer".
+"""
 
-### GOALS & PAIN POINTS
-- Team plans: {hiring_plans}
-- Their biggest frustration (in their words): "{biggest_frustration}"
-- If they had a magic wand: "{magic_wand}"
 
-CRITICAL: The client told us exactly what's bothering them. Your recommendations MUST address their stated frustration first. Then add what the data reveals.
-"""
+# Static instructions for the analysis call. Identical on every audit so it can be
+# prompt-cached; everything customer-specific comes from get_analysis_prompt().
+ANALYSIS_SYSTEM_PROMPT = """You are an elite business analyst producing a PROFESSIONAL AUDIT REPORT for an Australian tradie.
+This is a $797 paid audit - it must feel like a $3,000 consulting engagement.
 
-    # Load proven frameworks to inject into prompt
-    from src.templates.growth_frameworks import (
-        PRICING_TRANSITION_FRAMEWORK,
-        CALL_OUT_FEE_FRAMEWORK,
-        REVIEW_ACQUISITION_FRAMEWORK,
-        LEAD_RESPONSE_FRAMEWORK,
-        CUSTOMER_GRADING_FRAMEWORK,
-        PAYMENT_TERMS_FRAMEWORK
-    )
-    from src.templates.case_studies import format_case_study_for_prompt, get_relevant_case_studies
+The tradie will use this report to make real business decisions. Every number must be:
+1. TRACEABLE - show exactly where it came from
+2. CALCULATED - show the math step by step
+3. VERIFIABLE - they can check your sources
+4. CONSERVATIVE - use worst-case assumptions
 
-    # Get relevant case studies based on trade
-    relevant_cases = get_relevant_case_studies(trade=trade_type)
-    case_examples = "\n\n".join([
-        format_case_study_for_prompt(case.get("key", ""), sections=["situation", "results", "lessons"])
-        for case in relevant_cases[:2]  # Include 2 most relevant
-    ]) if relevant_cases else ""
+CRITICAL: This is NOT an AI summary. This is a PROFESSIONAL AUDIT with:
+- Specific references to their actual invoices and transactions
+- Exact calculations shown for every claim
+- Market benchmarks cited with sources
+- Three-scenario projections (conservative/realistic/optimistic)
+- Risk analysis for every recommendation
 
-    frameworks_section = f"""
 ## PROVEN FRAMEWORKS TO REFERENCE IN YOUR ANALYSIS
 
 These are battle-tested strategies from real tradie businesses. Reference these SPECIFICALLY in your recommendations.
@@ -238,7 +166,7 @@ Script for existing customers:
 "Hi [Name], just wanted to let you know our rates are moving to $[NEW_RATE]/hr from [date]. This brings us in line with current market rates and ensures we can keep delivering the quality you expect. Happy to chat if you have any questions."
 
 Objection handling:
-"Too expensive" → "I understand - rates have definitely increased across the board. This brings us to mid-market for {trade_type} in {location}. Our rate reflects [years] experience, full licensing and insurance, and our guarantee to get it right first time."
+"Too expensive" → "I understand - rates have definitely increased across the board. This brings us to mid-market for [TRADE] in [LOCATION]. Our rate reflects [years] experience, full licensing and insurance, and our guarantee to get it right first time."
 
 ### CALL-OUT FEE FRAMEWORK
 Only ~60% of tradies charge call-out fees - leaving $3-8k/year on table.
@@ -317,31 +245,6 @@ Late payment sequence:
 - Day 21: Formal email + final notice
 - Day 30: Collections or write-off decision
 
-{case_examples}
-"""
-
-    return f"""You are an elite business analyst producing a PROFESSIONAL AUDIT REPORT for an Australian tradie.
-This is a $797 paid audit - it must feel like a $3,000 consulting engagement.
-
-The tradie will use this report to make real business decisions. Every number must be:
-1. TRACEABLE - show exactly where it came from
-2. CALCULATED - show the math step by step
-3. VERIFIABLE - they can check your sources
-4. CONSERVATIVE - use worst-case assumptions
-
-CRITICAL: This is NOT an AI summary. This is a PROFESSIONAL AUDIT with:
-- Specific references to their actual invoices and transactions
-- Exact calculations shown for every claim
-- Market benchmarks cited with sources
-- Three-scenario projections (conservative/realistic/optimistic)
-- Risk analysis for every recommendation
-
-{benchmark_section}
-
-{context_section}
-
-{frameworks_section}
-
 AUDIT QUALITY STANDARDS:
 1. Reference specific transactions: "Invoice #X to Customer Y for $Z shows..."
 2. Show all calculations: "Total revenue ($X) ÷ estimated hours (Y) = $Z/hr effective rate"
@@ -357,16 +260,7 @@ AUDIT QUALITY STANDARDS:
 - Labor shortage = tradies can command premium rates
 - Cash flow problems are the #1 killer of trade businesses
 
-CLIENT DATA TO ANALYZE:
-{data_summary}
-
-BUSINESS PROFILE:
-- Trade: {trade_type}
-- Location: {location}
-- Years in business: {years_in_business}
-- Stated hourly rate: ${current_rate}/hr
-- Weekly hours worked: {hours_per_week}
-- Revenue goal: ${revenue_goal}
+The client's market benchmarks, intake interview answers, relevant case studies, transaction data and business profile follow in the user message.
 
 PERFORM THESE ANALYSES WITH FULL CALCULATION TRANSPARENCY:
 
@@ -642,16 +536,20 @@ PUSHBACK RESPONSE:
 
 ## OUTPUT FORMAT
 
-Return a JSON object with these keys:
+Return a JSON object with these keys. The figures in the PRECOMPUTED FIGURES section
+(revenue and expense totals, margins, effective rate, market comparison, rate and call-out
+scenarios, job type and customer totals, lead and quoting figures) are filled into the report
+automatically and are deliberately not part of this format - reason from them, but don't
+repeat them here.
 
-1. "data_quality": {{
+1. "data_quality": {
    "score": 1-10,
    "strengths": ["what data was good"],
    "gaps": ["what was missing"],
    "recommendations": ["how to improve data next time"]
-}}
+}
 
-2. "business_health_score": {{
+2. "business_health_score": {
    "overall": 1-10,
    "pricing": 1-10,
    "profitability": 1-10,
@@ -659,90 +557,27 @@ Return a JSON object with these keys:
    "customer_mix": 1-10,
    "efficiency": 1-10,
    "growth_potential": 1-10
-}}
+}
 
-3. "summary": {{
-   "total_revenue_analyzed": number,
-   "total_expenses_analyzed": number,
-   "gross_profit": number,
-   "gross_margin": number,
-   "calculated_effective_rate": number,
-   "effective_rate_calculation": "show the math",
-   "market_rate_range": "low-high for trade/location",
-   "rate_gap": number,
-   "rate_gap_percentage": number,
+3. "summary": {
    "data_confidence": "high/medium/low",
    "biggest_insight": "one sentence that makes them go 'holy shit'"
-}}
+}
 
-4. "pricing_audit": {{
-   "current_stated_rate": number,
-   "current_effective_rate": number,
-   "effective_rate_calculation": {{
-     "total_revenue": number,
-     "estimated_hours": number,
-     "hours_estimation_method": "from timesheets/estimated from job mix/assumed X hrs per job",
-     "calculation": "Total revenue ($X) ÷ Estimated hours (Y) = $Z/hr",
-     "confidence": "HIGH/MEDIUM/LOW",
-     "confidence_reason": "why this confidence level"
-   }},
-   "market_benchmark": {{
-     "min": number,
-     "average": number,
-     "max": number,
-     "premium": number,
-     "source": "service.com.au + industry associations",
-     "sample_size": "200+ data points",
-     "confidence": "HIGH"
-   }},
-   "rate_percentile": number,
-   "rate_percentile_description": "e.g., 'at the 35th percentile - below average'",
-   "recommended_rate": number,
-   "rate_increase_scenarios": {{
-     "conservative": {{
-       "customer_retention": 0.85,
-       "annual_impact": number,
-       "calculation": "show the math"
-     }},
-     "realistic": {{
-       "customer_retention": 0.90,
-       "annual_impact": number,
-       "calculation": "show the math"
-     }},
-     "optimistic": {{
-       "customer_retention": 0.95,
-       "annual_impact": number,
-       "calculation": "show the math"
-     }}
-   }},
-   "call_out_fee_analysis": {{
-     "current_fee": number,
-     "market_benchmark": number,
-     "recommended_fee": number,
-     "annual_jobs_estimated": number,
-     "annual_impact_conservative": number,
-     "calculation": "Jobs (X) × Fee ($Y) × Acceptance (85%) = $Z",
-     "source": "service.com.au call-out fee data"
-   }}
-}}
-
-5. "job_analysis": [
-   {{
-     "category": "string",
-     "job_count": number,
-     "total_revenue": number,
-     "avg_revenue": number,
+4. "job_analysis": [
+   {
+     "category": "the job category, exactly as in the precomputed job analysis",
      "estimated_hours_per_job": number,
      "effective_rate": number,
      "material_ratio": number or null,
      "verdict": "highly_profitable/profitable/marginal/loss_maker",
      "recommendation": "specific advice",
      "example_from_data": "reference a specific job"
-   }}
+   }
 ]
 
-5b. "worst_jobs": [
-   {{
+5. "worst_jobs": [
+   {
      "job_description": "specific job from their data",
      "customer": "customer name",
      "revenue": number,
@@ -751,46 +586,43 @@ Return a JSON object with these keys:
      "effective_rate": number,
      "why_bad": "brief explanation",
      "lesson": "what to do differently"
-   }}
+   }
 ] (List the 3-5 worst performing jobs you can identify from their data - jobs where they likely lost money or made very little. Be specific.)
 
-6. "customer_analysis": {{
+6. "customer_analysis": {
    "top_customers": [
-     {{
-       "name": "string",
-       "total_revenue": number,
-       "job_count": number,
-       "avg_job_size": number,
+     {
+       "name": "the customer, exactly as in the precomputed top customers",
        "grade": "A/B/C/Fire",
        "recommendation": "specific advice"
-     }}
+     }
    ],
    "concerning_customers": [
-     {{
+     {
        "name": "string",
        "reason": "why they're concerning",
        "recommendation": "what to do"
-     }}
+     }
    ],
    "customer_concentration_risk": "assessment",
    "ideal_customer_profile": "description of their best customer type"
-}}
+}
 
-7. "cash_flow_insights": {{
+7. "cash_flow_insights": {
    "payment_speed_assessment": "string",
    "seasonal_patterns": "string or null",
    "cash_flow_risks": ["list of risks"],
    "recommendations": ["list of specific actions"]
-}}
+}
 
-8. "expense_insights": {{
+8. "expense_insights": {
    "material_markup_assessment": "string",
    "vehicle_cost_recovery": "string",
    "subscription_audit": ["any unnecessary expenses found"],
    "optimization_opportunities": ["specific savings"]
-}}
+}
 
-8b. "online_presence_analysis": {{
+8b. "online_presence_analysis": {
    "current_rating": "string",
    "current_reviews": number,
    "presence_score": 1-10,
@@ -799,81 +631,64 @@ Return a JSON object with these keys:
    "annual_revenue_impact": number,
    "recommendations": ["specific actions to improve"],
    "review_acquisition_script": "exact words to ask for reviews"
-}}
+}
 
-8c. "lead_conversion_analysis": {{
-   "stated_conversion_rate": number,
+8c. "lead_conversion_analysis": {
    "conversion_assessment": "too_low/normal/good/possibly_underpriced",
-   "leads_per_week": number,
-   "current_jobs_per_week": number,
-   "if_improved_by_10pct": {{
-     "additional_jobs_monthly": number,
-     "additional_revenue_monthly": number,
-     "annual_impact": number
-   }},
    "conversion_blockers_identified": ["list of likely issues"],
    "recommendations": ["specific actions"]
-}}
+}
 
-8d. "quoting_process_analysis": {{
+8d. "quoting_process_analysis": {
    "current_method": "string",
    "time_per_quote": "string",
-   "quotes_per_month": number,
-   "admin_cost_calculation": {{
-     "hours_per_month": number,
-     "at_billable_rate": number,
-     "annual_cost": number,
-     "percentage_of_revenue": number
-   }},
    "speed_assessment": "fast/moderate/slow",
-   "speed_impact": {{
+   "speed_impact": {
      "jobs_lost_to_slower_response": number,
      "annual_revenue_impact": number
-   }},
+   },
    "efficiency_recommendations": ["specific improvements"],
    "ideal_quoting_time": "what they should target"
-}}
+}
 
-8e. "operations_efficiency": {{
+8e. "operations_efficiency": {
    "current_systems_score": 1-10,
    "admin_burden_weekly_hours": number,
    "admin_burden_annual_cost": number,
    "biggest_stated_time_waste": "string",
    "follow_up_assessment": "none/inconsistent/manual/automated",
-   "follow_up_impact": {{
+   "follow_up_impact": {
      "leads_lost_to_no_followup": "X per month",
      "annual_revenue_impact": number
-   }},
+   },
    "system_recommendations": [
-     {{
+     {
        "problem": "specific problem",
        "solution": "specific tool or system",
        "implementation_time": "how long to set up",
        "expected_time_saved_weekly": number
-     }}
+     }
    ]
-}}
+}
 
-8f. "growth_roadmap": {{
-   "current_revenue_estimate": number,
+8f. "growth_roadmap": {
    "stated_goal": "string",
-   "gap_to_goal": number,
    "primary_growth_blockers": ["ordered list"],
-   "hiring_readiness": {{
+   "hiring_readiness": {
      "ready_to_hire": boolean,
      "revenue_needed_before_hiring": number,
      "current_gap": number
-   }},
-   "magic_wand_response": {{
+   },
+   "magic_wand_response": {
      "they_want": "their stated wish",
      "practical_path": "how to actually get there",
      "first_step": "immediate action"
-   }},
+   },
    "90_day_priorities": ["ordered by impact"]
-}}
+}
 
 9. "action_plan": [
-   {{
+   {
      "priority": number (1-10),
      "category": "quick_win/medium_term/strategic",
      "action": "clear, specific action",
@@ -882,40 +697,40 @@ Return a JSON object with these keys:
        "Step 2: [description] = $Y",
        "Step 3: [adjustment for reality] = $Z"
      ],
-     "scenarios": {{
-       "conservative": {{"impact": number, "assumption": "15% customer loss"}},
-       "realistic": {{"impact": number, "assumption": "10% customer loss"}},
-       "optimistic": {{"impact": number, "assumption": "5% customer loss"}}
-     }},
+     "scenarios": {
+       "conservative": {"impact": number, "assumption": "15% customer loss"},
+       "realistic": {"impact": number, "assumption": "10% customer loss"},
+       "optimistic": {"impact": number, "assumption": "5% customer loss"}
+     },
      "recommended_impact": number,
-     "data_evidence": {{
+     "data_evidence": {
        "specific_reference": "e.g., Invoice #23 to ABC Corp for $1,200",
        "pattern_found": "e.g., 4 similar jobs averaged $X",
        "supporting_data": ["list of specific data points from their records"]
-     }},
-     "market_validation": {{
+     },
+     "market_validation": {
        "benchmark_used": "e.g., Sydney electrician rates",
        "source": "service.com.au",
        "confidence": "HIGH/MEDIUM/LOW"
-     }},
-     "risk_analysis": {{
+     },
+     "risk_analysis": {
        "primary_risk": "what could go wrong",
        "likelihood": "low/medium/high",
        "mitigation": "how to reduce the risk",
        "worst_case_impact": "if this fails, what happens"
-     }},
+     },
      "effort_score": 1-10,
      "time_to_implement": "string",
      "time_to_results": "string",
-     "implementation": {{
+     "implementation": {
        "script_for_customers": "exact words to use",
        "script_for_objections": "how to handle pushback",
        "first_step": "the very first thing to do"
-     }}
-   }}
+     }
+   }
 ]
 
-10. "opportunity_summary": {{
+10. "opportunity_summary": {
    "total_conservative": number,
    "total_realistic": number,
    "total_optimistic": number,
@@ -926,69 +741,63 @@ Return a JSON object with these keys:
    "meets_10k_guarantee": boolean,
    "guarantee_confidence": "high/medium/low",
    "roi_on_audit": "e.g., '37x return on $797 audit fee'"
-}}
+}
 
-11. "methodology": {{
-   "data_analyzed": {{
-     "invoices_count": number,
-     "date_range": "start - end",
-     "total_revenue": number,
-     "total_expenses": number
-   }},
+11. "methodology": {
    "benchmarking_sources": [
-     {{
+     {
        "name": "service.com.au",
        "data_points": "200+",
        "coverage": "National + 5 major cities",
        "confidence": "HIGH"
-     }},
-     {{
+     },
+     {
        "name": "Industry associations (NECA, Master Plumbers, etc.)",
        "type": "Trade surveys and reports",
        "confidence": "MEDIUM"
-     }}
+     }
    ],
-   "calculation_methodology": {{
+   "calculation_methodology": {
      "effective_rate": "Total revenue ÷ estimated billable hours",
      "billable_hours_estimate": "Based on job mix and industry time standards",
      "opportunity_projections": "Three scenarios: Conservative (15% loss), Realistic (10% loss), Optimistic (5% loss)",
      "impact_calculations": "All impacts shown with step-by-step math"
-   }},
-   "confidence_levels_used": {{
+   },
+   "confidence_levels_used": {
      "HIGH": "3+ sources, large sample, recent data",
      "MEDIUM": "1-2 sources, industry estimates",
      "LOW": "Single source or assumption-based"
-   }},
+   },
    "limitations": [
      "Hours estimated from job mix (no actual timesheets)",
      "Customer retention rates based on industry averages",
      "Market conditions may vary"
    ]
-}}
+}
 
 12. "backend_problems_identified": [
-   {{
+   {
      "category": "quoting/pricing/follow_up/lead_qualification/cash_flow/customer_concentration",
      "indicator": "what we observed",
      "severity": "low/medium/high",
      "metric_value": number or string,
      "estimated_annual_cost": number,
      "notes": "additional context"
-   }}
+   }
 ] (Identify operational pain points for agent development)
 
-11. "missing_data": {{
+11. "missing_data": {
    "critical_gaps": ["what we couldn't analyze"],
    "nice_to_have": ["what would improve analysis"],
    "data_collection_tips": ["how to get better data next time"]
-}}
+}
 
-12. "next_steps": {{
+12. "next_steps": {
    "this_week": ["1-3 immediate actions"],
    "this_month": ["2-4 actions"],
    "this_quarter": ["1-2 strategic moves"],
    "tracking_metrics": ["what to measure going forward"]
-}}
+}
 
 REMEMBER:
 - Total opportunity = sum of CONSERVATIVE estimates only
@@ -996,7 +805,206 @@ REMEMBER:
 - If you can't honestly find $10k, say so and explain why
 - A conservative $15k finding is better than an inflated $50k
 - Reference THEIR specific data - customer names, job types, amounts
-- Make them feel like you KNOW their business
+- Make them feel like you KNOW their business"""
+
+
+# Bump when get_analysis_prompt() or the analysis output format changes, so cached
+# analyses from the old prompt aren't reused (edits to ANALYSIS_SYSTEM_PROMPT are
+# picked up from its hash)
+ANALYSIS_PROMPT_VERSION = "2"
+
+
+# Independent parts of the analysis output, requested concurrently in sectioned mode.
+# Every key of the ANALYSIS_SYSTEM_PROMPT output format belongs to exactly one section.
+ANALYSIS_SECTIONS = {
+    "pricing and profitability": [
+        "data_quality", "business_health_score", "summary", "job_analysis", "worst_jobs"
+    ],
+    "customers, cash flow and expenses": [
+        "customer_analysis", "cash_flow_insights", "expense_insights"
+    ],
+    "leads, quoting and operations": [
+        "online_presence_analysis", "lead_conversion_analysis", "quoting_process_analysis",
+        "operations_efficiency", "growth_roadmap"
+    ],
+    "action plan": [
+        "action_plan", "opportunity_summary", "next_steps", "missing_data", "methodology",
+        "backend_problems_identified"
+    ]
+}
+
+ANALYSIS_SECTION_NOTE = """
+## THIS REQUEST: {section}
+
+Other parts of this audit are being written at the same time by separate requests.
+Perform only the analyses these keys need, and return a JSON object with ONLY these keys
+from the output format: {keys}
+"""
+
+
+def get_analysis_prompt(data_summary: str, trade_type: str, location: str, 
+                        years_in_business: int, current_rate: float, 
+                        hours_per_week: int, revenue_goal: float,
+                        market_benchmarks: dict = None,
+                        business_context: dict = None,
+                        precomputed_metrics: dict = None) -> str:
+    """
+    Generate the customer-specific part of the 2026 Growth Audit prompt.
+    
+    This is the user message; the instructions it refers to are in
+    ANALYSIS_SYSTEM_PROMPT, sent as a cached system prompt. precomputed_metrics
+    (src/utils/metrics_engine.py) are given as final figures, so the response
+    only needs the narrative around them.
+    """
+    
+    # Format benchmark data for inclusion in prompt
+    benchmark_section = ""
+    if market_benchmarks:
+        hourly = market_benchmarks.get("hourly_rate", {})
+        callout = market_benchmarks.get("call_out_fee", {})
+        benchmark_section = f"""
+VERIFIED MARKET BENCHMARKS FOR {trade_type.upper()} IN {location.upper()}:
+(Source: service.com.au + industry associations, 200+ data points, HIGH confidence)
+
+Hourly Rates:
+- Minimum (25th percentile): ${hourly.get('min', 90)}/hr
+- Average (50th percentile): ${hourly.get('average', 110)}/hr  
+- Maximum (75th percentile): ${hourly.get('max', 130)}/hr
+- Premium (90th percentile): ${hourly.get('premium', hourly.get('max', 130) * 1.15):.0f}/hr
+
+Call-Out Fees:
+- Standard: ${callout.get('min', 80)}-${callout.get('max', 130)} (average ${callout.get('average', 95)})
+
+Data Sources: {', '.join([s.get('name', 'Unknown') for s in hourly.get('data_sources', [{'name': 'service.com.au'}])])}
+Confidence Level: {hourly.get('confidence', 'MEDIUM')}
+
+USE THESE EXACT BENCHMARKS IN YOUR ANALYSIS. Cite them explicitly.
+"""
+    
+    # Build comprehensive context from onboarding data
+    context_section = ""
+    if business_context:
+        # Lead generation context
+        lead_sources = business_context.get('lead_sources', [])
+        leads_per_week = business_context.get('leads_per_week', 'Unknown')
+        close_rate = business_context.get('close_rate', 0)
+        google_rating = business_context.get('google_rating', 'Unknown')
+        google_reviews = business_context.get('google_reviews', '0')
+        
+        # Quoting context
+        quote_method = business_context.get('quote_method', 'Unknown')
+        quote_time = business_context.get('quote_time', 'Unknown')
+        quotes_per_month = business_context.get('quotes_per_month', 'Unknown')
+        quote_speed = business_context.get('quote_speed', 'Unknown')
+        
+        # Operations context
+        tools_used = business_context.get('tools_used', [])
+        job_tracking = business_context.get('job_tracking', 'Unknown')
+        follow_up_method = business_context.get('follow_up_method', 'Unknown')
+        biggest_time_waste = business_context.get('biggest_time_waste', 'Unknown')
+        
+        # Goals context
+        hiring_plans = business_context.get('hiring_plans', 'Unknown')
+        biggest_frustration = business_context.get('biggest_frustration', '')
+        magic_wand = business_context.get('magic_wand', '')
+        
+        context_section = f"""
+## DETAILED BUSINESS CONTEXT FROM INTAKE INTERVIEW
+
+### LEAD GENERATION & MARKETING
+- Lead sources: {', '.join(lead_sources) if lead_sources else 'Not specified'}
+- Leads per week: {leads_per_week}
+- Quote-to-job conversion rate: {close_rate}%
+- Google Business rating: {google_rating}
+- Number of Google reviews: {google_reviews}
+
+ANALYZE: 
+- If conversion rate < 35%, there's a quoting or pricing problem
+- If conversion rate > 50%, they may be underpricing
+- Google presence is critical in 2026 - less than 20 reviews = invisible online
+- Relying on word-of-mouth only = growth ceiling
+
+### QUOTING PROCESS
+- How they create quotes: {quote_method}
+- Time per quote: {quote_time}
+- Quotes sent per month: {quotes_per_month}
+- Speed to quote: {quote_speed}
+
+ANALYZE:
+- "Mental math + text" = inconsistent pricing, leaving money on table
+- Anything over 30 min per quote = major admin burden
+- Slower than "same day" response = losing jobs to faster competitors
+- Track: (Quotes × Time per quote × Hourly rate) = true cost of quoting
+
+### CURRENT TOOLS & SYSTEMS
+- Software used: {', '.join(tools_used) if tools_used else 'None / Paper'}
+- Job tracking method: {job_tracking}
+- Lead follow-up method: {follow_up_method}
+- Biggest time waste: {biggest_time_waste}
+
+ANALYZE:
+- "Paper / manual" + "In my head" = operational risk + admin burden
+- No job management software = missing data for optimization
+- "{follow_up_method}" follow-up approach = {"MAJOR LEAK - losing 30-40% of potential jobs" if "don't" in follow_up_method.lower() else "needs optimization"}
+- They said "{biggest_time_waste}" is their biggest time waste - address this DIRECTLY in recommendations
+
+### GOALS & PAIN POINTS
+- Team plans: {hiring_plans}
+- Their biggest frustration (in their words): "{biggest_frustration}"
+- If they had a magic wand: "{magic_wand}"
+
+CRITICAL: The client told us exactly what's bothering them. Your recommendations MUST address their stated frustration first. Then add what the data reveals.
+"""
+
+    from src.templates.case_studies import format_case_study_for_prompt, get_relevant_case_studies
+
+    # Get relevant case studies based on trade
+    relevant_cases = get_relevant_case_studies(trade=trade_type)
+    case_examples = "\n\n".join([
+        format_case_study_for_prompt(case.get("key", ""), sections=["situation", "results", "lessons"])
+        for case in relevant_cases[:2]  # Include 2 most relevant
+    ]) if relevant_cases else ""
+    case_section = f"""
+## RELEVANT CASE STUDIES
+
+{case_examples}
+""" if case_examples else ""
+
+    metrics_section = ""
+    if precomputed_metrics:
+        metrics_section = f"""
+## PRECOMPUTED FIGURES (FINAL)
+
+Every figure below was calculated from ALL of the client's transactions and the benchmarks above.
+Use them exactly as given and quote them in your calculations - do not recalculate them.
+They are filled into the report automatically and are not part of the output format, so don't
+repeat them in your JSON. Base every action plan impact on these figures.
+
+```json
+{json.dumps(precomputed_metrics, separators=(',', ':'))}
+```
+"""
+
+    return f"""{benchmark_section}
+
+{context_section}
+
+{case_section}
+
+{metrics_section}
+
+CLIENT DATA TO ANALYZE:
+{data_summary}
+
+BUSINESS PROFILE:
+- Trade: {trade_type}
+- Location: {location}
+- Years in business: {years_in_business}
+- Stated hourly rate: ${current_rate}/hr
+- Weekly hours worked: {hours_per_week}
+- Revenue goal: ${revenue_goal}
+
+Perform every analysis in your instructions for this business and respond in the specified JSON output format.
 """
 
 
@@ -1064,22 +1072,14 @@ Write the summary now:
 """
 
 
-def get_customer_categorization_prompt(customer_name: str, transactions: str) -> str:
-    """Generate the customer categorization prompt."""
-    return f"""Analyze this customer's transaction history and categorize them:
-
-Customer: {customer_name}
-Transactions:
-{transactions}
-
-Categorize as:
+# Shared by single and batched customer grading
+CUSTOMER_GRADING_RUBRIC = """Categorize as:
 - "A-grade": High revenue, pays on time, repeat business, good-sized jobs, easy to work with
 - "B-grade": Decent revenue, mostly reliable, average jobs, no major issues
 - "C-grade": Low margin, slow to pay, small jobs, high effort for low return
-- "Fire": Actively losing you money, nightmare to deal with, or dangerous to cash flow
+- "Fire": Actively losing you money, nightmare to deal with, or dangerous to cash flow"""
 
-Return a JSON object with:
-- customer: name
+CUSTOMER_GRADE_FIELDS = """- customer: name
 - grade: "A" or "B" or "C" or "Fire"
 - total_revenue: number
 - job_count: number
@@ -1089,10 +1089,55 @@ Return a JSON object with:
 - job_size_trend: "growing" or "stable" or "shrinking"
 - recommendation: "nurture" or "maintain" or "increase_prices" or "reduce_service" or "fire"
 - reasoning: "Why this grade - be specific and reference the data"
-- action: "Specific action to take with this customer"
+- action: "Specific action to take with this customer\""""
+
+
+def get_customer_categorization_prompt(customer_name: str, transactions: str) -> str:
+    """Generate the customer categorization prompt."""
+    return f"""Analyze this customer's transaction history and categorize them:
+
+Customer: {customer_name}
+Transactions:
+{transactions}
+
+{CUSTOMER_GRADING_RUBRIC}
+
+Return a JSON object with:
+{CUSTOMER_GRADE_FIELDS}
 """
 
 
+# Static instructions for batched grading, sent as a cached system prompt
+CUSTOMER_BATCH_GRADING_PROMPT = f"""You grade the customers of an Australian tradie business from their transaction histories.
+Grade each customer on their own history, against the same standard for every customer.
+
+{CUSTOMER_GRADING_RUBRIC}
+
+For every customer, give:
+- id: the customer's id from the input
+{CUSTOMER_GRADE_FIELDS}
+
+OUTPUT ONLY JSON:
+{{"customers": [{{"id": 1, "customer": "Smith Constructions", "grade": "A", ...}}]}}
+
+Grade every id exactly once.
+"""
+
+
+def get_customer_batch_prompt(customers: list[tuple[int, str, str]]) -> str:
+    """
+    Generate the user message for grading several customers in one call.
+
+    Args:
+        customers: (id, customer name, transaction lines) per customer
+    """
+    blocks = [
+        f"### Customer {customer_id}: {name}\n{transactions}"
+        for customer_id, name, transactions in customers
+    ]
+    return f"Grade these {len(customers)} customers:\n\n" + "\n\n".join(blocks)
+
+
 def get_cash_flow_prompt(transactions: str, business_context: str) -> str:
     """Generate cash flow analysis prompt."""
     return f"""Analyze the cash flow patterns in this tradie business:
@@ -10,6 +10,7 @@ from src.utils.market_data import (
     estimate_annual_impact
 )
 from src.utils.file_handler import FileHandler, OutputHandler
+from src.utils.cache import DiskCache
 
 __all__ = [
     "get_rate_benchmark",
@@ -18,6 +19,7 @@ __all__ = [
     "calculate_rate_gap",
     "estimate_annual_impact",
     "FileHandler",
-    "OutputHandler"
+    "OutputHandler",
+    "DiskCache"
 ]
 
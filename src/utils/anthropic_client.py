@@ -0,0 +1,369 @@
+"""
+Shared, rate-limited access to the Anthropic API.
+
+Every agent (extraction, analysis, customer grading, report summaries) gets its
+client from create_client(), and all of them draw from one process-wide
+RateLimiter. So several Streamlit sessions running audits at once queue for
+capacity instead of tripping 429s and failing whole audits.
+
+The limiter budgets both requests and tokens per minute using token buckets.
+Callers are served first-come-first-served. A request's token cost is
+estimated up front (prompt size + max_tokens) and corrected from the real
+usage once the response arrives. Rate-limit, overload and connection errors are
+retried with jittered exponential backoff. A 429's retry-after pauses every
+caller, not just the one that got it.
+"""
+
+import os
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Optional
+
+import anthropic
+
+from src.utils.table_serializer import estimate_tokens
+
+
+class TokenBucket:
+    """Classic token bucket: holds up to `capacity`, refills at capacity per minute."""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def seconds_until(self, amount: float) -> float:
+        """How long until `amount` is available (0 if it is now)."""
+        amount = min(amount, self.capacity)  # Oversized requests wait for a full bucket
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.rate
+
+
+class RateLimiter:
+    """
+    Process-wide limiter on requests/minute and tokens/minute.
+
+    Thread-safe. Waiters are served in arrival order, so one large request can't
+    be starved by a stream of small ones.
+    """
+
+    def __init__(self, requests_per_minute: float, tokens_per_minute: float):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+
+        self._condition = threading.Condition()
+        self._queue: deque = deque()
+        self._paused_until = 0.0
+
+        # Metrics
+        self.total_requests = 0
+        self.total_tokens = 0
+        self.throttled_requests = 0
+        self.total_wait_seconds = 0.0
+        self.max_queue_depth = 0
+        self.retries = 0
+        self.rate_limit_errors = 0
+
+    @property
+    def queue_depth(self) -> int:
+        """Callers currently waiting for capacity."""
+        with self._condition:
+            return len(self._queue)
+
+    def acquire(self, tokens: int) -> float:
+        """
+        Block until one request and `tokens` tokens are available, then take them.
+
+        Returns:
+            Seconds spent waiting
+        """
+        ticket = object()
+        started = time.monotonic()
+        with self._condition:
+            self._queue.append(ticket)
+            self.max_queue_depth = max(self.max_queue_depth, len(self._queue))
+
+            while True:
+                now = time.monotonic()
+                if self._queue[0] is ticket:
+                    self.requests.refill(now)
+                    self.tokens.refill(now)
+                    delay = max(
+                        self._paused_until - now,
+                        self.requests.seconds_until(1),
+                        self.tokens.seconds_until(tokens)
+                    )
+                    if delay <= 0:
+                        break
+                    self._condition.wait(timeout=delay)
+                else:
+                    self._condition.wait()
+
+            self._queue.popleft()
+            self.requests.level -= 1
+            self.tokens.level -= tokens
+            self.total_requests += 1
+            self.total_tokens += tokens
+
+            waited = time.monotonic() - started
+            if waited > 0.01:
+                self.throttled_requests += 1
+                self.total_wait_seconds += waited
+
+            # Next in line re-checks capacity
+            self._condition.notify_all()
+        return waited
+
+    def settle(self, estimated_tokens: int, actual_tokens: int) -> None:
+        """Correct the token bucket once a request's real usage is known."""
+        with self._condition:
+            self.tokens.level = min(self.tokens.capacity, self.tokens.level + estimated_tokens - actual_tokens)
+            self.total_tokens += actual_tokens - estimated_tokens
+            self._condition.notify_all()
+
+    def record_retry(self, estimated_tokens: int, pause_seconds: Optional[float] = None) -> None:
+        """
+        Account for a failed attempt that will be retried.
+
+        The attempt's tokens are returned to the bucket (they were mostly never
+        spent). After a 429, pause_seconds holds every caller, since everyone
+        sharing the key is over the limit - not just the one that got the error.
+        """
+        with self._condition:
+            self.retries += 1
+            self.tokens.level = min(self.tokens.capacity, self.tokens.level + estimated_tokens)
+            self.total_tokens -= estimated_tokens
+            if pause_seconds is not None:
+                self.rate_limit_errors += 1
+                self._paused_until = max(self._paused_until, time.monotonic() + pause_seconds)
+            self._condition.notify_all()
+
+    def stats(self) -> dict:
+        """Throughput and queueing metrics, for logging and the admin dashboard."""
+        with self._condition:
+            return {
+                "queue_depth": len(self._queue),
+                "max_queue_depth": self.max_queue_depth,
+                "requests": self.total_requests,
+                "tokens": self.total_tokens,
+                "throttled_requests": self.throttled_requests,
+                "total_wait_seconds": self.total_wait_seconds,
+                "retries": self.retries,
+                "rate_limit_errors": self.rate_limit_errors
+            }
+
+
+# Singleton instance
+_limiter: Optional[RateLimiter] = None
+_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter() -> RateLimiter:
+    """Get the process-wide rate limiter."""
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = RateLimiter(
+                requests_per_minute=float(os.getenv("ANTHROPIC_REQUESTS_PER_MINUTE", "50")),
+                tokens_per_minute=float(os.getenv("ANTHROPIC_TOKENS_PER_MINUTE", "80000"))
+            )
+        return _limiter
+
+
+def estimate_request_tokens(request: dict) -> int:
+    """Upper-bound token cost of a messages request: prompt estimate + max_tokens."""
+    text = []
+    system = request.get("system")
+    if system:
+        text.append(system if isinstance(system, str) else " ".join(b.get("text", "") for b in system))
+    for message in request.get("messages", []):
+        content = message.get("content", "")
+        if isinstance(content, str):
+            text.append(content)
+        else:
+            text.extend(block.get("text", "") for block in content if isinstance(block, dict))
+    return estimate_tokens("\n".join(text)) + int(request.get("max_tokens", 0))
+
+
+# Prompt caching prices, relative to the base input token price
+CACHE_WRITE_PRICE_MULTIPLIER = 1.25
+CACHE_READ_PRICE_MULTIPLIER = 0.10
+
+
+def cached_system(text: str) -> list[dict]:
+    """
+    System prompt block marked for prompt caching.
+
+    Everything up to the breakpoint is cached for a few minutes, so put only
+    static instructions here and keep per-call content in the user message.
+    """
+    return [cached_text(text)]
+
+
+def cached_text(text: str) -> dict:
+    """
+    A text content block with a cache breakpoint after it.
+
+    For user content shared by several calls (e.g. the analysis prompt sent
+    with each section's note): the shared prefix goes in this block and the
+    per-call part in a plain text block after it.
+    """
+    return {"type": "text", "text": text, "cache_control": {"type": "ephemeral"}}
+
+
+def usage_tokens(usage) -> dict:
+    """Token counts from a response's usage, including prompt cache reads and writes."""
+    return {
+        "input_tokens": getattr(usage, "input_tokens", 0) or 0,
+        "output_tokens": getattr(usage, "output_tokens", 0) or 0,
+        "cache_creation_input_tokens": getattr(usage, "cache_creation_input_tokens", 0) or 0,
+        "cache_read_input_tokens": getattr(usage, "cache_read_input_tokens", 0) or 0
+    }
+
+
+def usage_cost(usage, input_cost_per_1m: float, output_cost_per_1m: float) -> float:
+    """Dollar cost of a response, pricing cache writes and reads separately from plain input."""
+    tokens = usage_tokens(usage)
+    return (
+        tokens["input_tokens"] / 1_000_000 * input_cost_per_1m
+        + tokens["cache_creation_input_tokens"] / 1_000_000 * input_cost_per_1m * CACHE_WRITE_PRICE_MULTIPLIER
+        + tokens["cache_read_input_tokens"] / 1_000_000 * input_cost_per_1m * CACHE_READ_PRICE_MULTIPLIER
+        + tokens["output_tokens"] / 1_000_000 * output_cost_per_1m
+    )
+
+
+def _usage_total(usage) -> Optional[int]:
+    if usage is None:
+        return None
+    return sum(usage_tokens(usage).values())
+
+
+def _is_retryable(error: Exception) -> bool:
+    if isinstance(error, anthropic.APIConnectionError):  # Includes timeouts
+        return True
+    if isinstance(error, anthropic.APIStatusError):
+        return error.status_code == 429 or error.status_code >= 500  # 529 = overloaded
+    return False
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    try:
+        return float(response.headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class RateLimitedMessages:
+    """Drop-in for client.messages: create() and stream() go through the limiter with retries."""
+
+    def __init__(self, messages, limiter: RateLimiter, max_retries: int, base_delay: float, max_delay: float):
+        self._messages = messages
+        self._limiter = limiter
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def create(self, **kwargs) -> Any:
+        estimated = estimate_request_tokens(kwargs)
+        message = self._call(lambda: self._messages.create(**kwargs), estimated)
+        self._limiter.settle(estimated, _usage_total(getattr(message, "usage", None)) or estimated)
+        return message
+
+    def stream(self, **kwargs) -> "_RateLimitedStream":
+        return _RateLimitedStream(self, kwargs)
+
+    def _call(self, send: Callable[[], Any], estimated_tokens: int) -> Any:
+        """Acquire capacity and send, retrying transient failures with backoff."""
+        attempt = 0
+        while True:
+            self._limiter.acquire(estimated_tokens)
+            try:
+                return send()
+            except Exception as e:
+                if not _is_retryable(e) or attempt >= self.max_retries:
+                    # Nothing will settle this attempt (a stream that failed to open never exits)
+                    self._limiter.settle(estimated_tokens, 0)
+                    raise
+
+                # Full jitter on the exponential step; never sooner than retry-after
+                backoff = min(self.max_delay, self.base_delay * 2 ** attempt)
+                delay = random.uniform(backoff / 2, backoff)
+                retry_after = _retry_after(e)
+                if retry_after is not None:
+                    delay = max(delay, retry_after)
+
+                status = getattr(e, "status_code", None)
+                self._limiter.record_retry(estimated_tokens, pause_seconds=delay if status == 429 else None)
+                attempt += 1
+                print(f"  ⚠ Anthropic API {status or type(e).__name__}: "
+                      f"retrying in {delay:.1f}s (attempt {attempt}/{self.max_retries})")
+                time.sleep(delay)
+
+
+class _RateLimitedStream:
+    """Context manager wrapping messages.stream(); retries only apply to opening the stream."""
+
+    def __init__(self, messages: RateLimitedMessages, kwargs: dict):
+        self._messages = messages
+        self._kwargs = kwargs
+        self._estimated = estimate_request_tokens(kwargs)
+        self._manager = None
+        self._stream = None
+
+    def __enter__(self):
+        def open_stream():
+            manager = self._messages._messages.stream(**self._kwargs)
+            stream = manager.__enter__()
+            self._manager = manager
+            return stream
+
+        self._stream = self._messages._call(open_stream, self._estimated)
+        return self._stream
+
+    def __exit__(self, *exc_info):
+        actual = None
+        try:
+            actual = _usage_total(self._stream.current_message_snapshot.usage)
+        except Exception:
+            pass
+        self._messages._limiter.settle(self._estimated, actual or self._estimated)
+        return self._manager.__exit__(*exc_info)
+
+
+class RateLimitedClient:
+    """Anthropic client whose messages calls share the process-wide rate limiter."""
+
+    def __init__(self, client: anthropic.Anthropic, limiter: Optional[RateLimiter] = None):
+        self._client = client
+        self.limiter = limiter or get_rate_limiter()
+        self.messages = RateLimitedMessages(
+            client.messages,
+            self.limiter,
+            max_retries=int(os.getenv("API_MAX_RETRIES", "5")),
+            base_delay=float(os.getenv("API_RETRY_BASE_SECONDS", "2")),
+            max_delay=float(os.getenv("API_RETRY_MAX_SECONDS", "60"))
+        )
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+
+def create_client(api_key: str) -> RateLimitedClient:
+    """
+    Create an Anthropic client that goes through the shared rate limiter.
+
+    The SDK's own retries are disabled so every attempt is counted against the
+    limiter and backs off together with the other callers.
+    """
+    return RateLimitedClient(anthropic.Anthropic(api_key=api_key, max_retries=0))
@@ -0,0 +1,206 @@
+"""
+Deterministic parsers for Australian bank statement CSV exports.
+
+Extracting every line of a bank statement is the most expensive and most
+truncation-prone job we give Claude, yet each bank's CSV export has a fixed
+layout. Each layout here is recognised by its header signature (or, for the
+banks that export without a header row, by its column count and the shape of
+the first row) and converted to transaction rows with vectorised pandas
+operations.
+
+Sign conventions differ by bank: some export one signed amount column
+(negative = money out), others separate debit and credit columns. Either way
+money in becomes "revenue" and money out "expense", with positive amounts.
+Categories are left as "uncategorised" for the extractor to label from the
+unique descriptions.
+"""
+
+from typing import Optional
+
+import pandas as pd
+
+from src.utils.export_parsers import normalize_header, parse_amounts, parse_dates
+
+
+# "signed": one amount column, negative = money out
+# "debit_credit": separate columns, whichever is filled gives the direction
+BANK_PROFILES = {
+    "westpac": {
+        "bank": "Westpac",
+        "signature": {"bankaccount", "date", "narrative", "debitamount", "creditamount"},
+        "sign": "debit_credit",
+        "columns": {"date": "date", "description": "narrative", "debit": "debitamount", "credit": "creditamount"}
+    },
+    "nab": {
+        "bank": "NAB",
+        "signature": {"date", "amount", "transactiontype", "transactiondetails"},
+        "sign": "signed",
+        "columns": {"date": "date", "description": "transactiondetails", "amount": "amount",
+                    "counterparty": "merchantname"}
+    },
+    "up": {
+        "bank": "Up",
+        "signature": {"time", "payee", "description", "totalaud"},
+        "sign": "signed",
+        "columns": {"date": "time", "description": "description", "amount": "totalaud", "counterparty": "payee"},
+        "timestamps": True  # ISO times with DST-dependent offsets - the date part is enough
+    },
+    "macquarie": {
+        "bank": "Macquarie",
+        "signature": {"transactiondate", "details", "debit", "credit", "balance"},
+        "sign": "debit_credit",
+        "columns": {"date": "transactiondate", "description": "originaldescription", "debit": "debit",
+                    "credit": "credit", "counterparty": "details"}
+    },
+    # St.George, Bank of Melbourne, BankSA and ING share this layout
+    "debit_credit_balance": {
+        "bank": "St.George/ING",
+        "signature": {"date", "description", "debit", "credit", "balance"},
+        "sign": "debit_credit",
+        "columns": {"date": "date", "description": "description", "debit": "debit", "credit": "credit"}
+    },
+    # Headerless exports, identified by column count: (position -> field)
+    "cba": {
+        "bank": "CommBank",
+        "headerless": ["date", "amount", "description", "balance"],
+        "sign": "signed"
+    },
+    "anz": {
+        "bank": "ANZ",
+        "headerless": ["date", "amount", "description"],
+        "sign": "signed"
+    },
+    "nab_classic": {
+        "bank": "NAB",
+        "headerless": ["date", "amount", None, None, "transactiontype", "description", "balance"],
+        "sign": "signed"
+    }
+}
+
+# Statement lines that aren't transactions
+BALANCE_LINE = r'^(opening|closing) balance\b'
+
+
+def _looks_like_data_row(values: list) -> bool:
+    """True if a header row is really the first transaction (date, then amount)."""
+    if len(values) < 3:
+        return False
+    date = pd.to_datetime(pd.Series([str(values[0])]), dayfirst=True, format='mixed', errors='coerce')
+    amount = parse_amounts(pd.Series([str(values[1])]))
+    return bool(date.notna().iloc[0] and amount.notna().iloc[0])
+
+
+def _restore_header_row(df: pd.DataFrame) -> pd.DataFrame:
+    """Put the row pandas took as the header back as data, with positional columns."""
+    first = [None if str(c).startswith("Unnamed:") else str(c) for c in df.columns]
+    # pandas de-duplicates repeated header values as "value.1"; repeats are rare in
+    # one bank line and only ever in text fields, so they are left as read
+    body = df.set_axis(range(len(df.columns)), axis=1)
+    return pd.concat([pd.DataFrame([first], columns=body.columns), body], ignore_index=True)
+
+
+def detect_bank_profile(
+    df: pd.DataFrame,
+    restore_header: bool = True
+) -> Optional[tuple[str, pd.DataFrame, dict]]:
+    """
+    Identify a bank statement layout.
+
+    Args:
+        df: Statement rows, with the file's first row as the columns
+        restore_header: For headerless exports, put that first row back as
+            data. False for later batches of a streamed sheet, whose columns
+            repeat a row the first batch already returned.
+
+    Returns:
+        (profile_name, frame, {field: column}) or None. For headerless
+        exports the frame has positional columns.
+    """
+    normalized = {normalize_header(c): c for c in df.columns}
+
+    for name, profile in BANK_PROFILES.items():
+        if "signature" in profile and profile["signature"] <= normalized.keys():
+            mapping = {
+                field: normalized[column]
+                for field, column in profile["columns"].items()
+                if column in normalized
+            }
+            if "description" not in mapping and "counterparty" in mapping:
+                mapping["description"] = mapping["counterparty"]
+            return name, df, mapping
+
+    if not _looks_like_data_row(list(df.columns)):
+        return None
+    for name, profile in BANK_PROFILES.items():
+        layout = profile.get("headerless")
+        if layout and len(layout) == len(df.columns):
+            mapping = {field: i for i, field in enumerate(layout) if field}
+            frame = _restore_header_row(df) if restore_header else df.set_axis(range(len(df.columns)), axis=1)
+            return name, frame, mapping
+    return None
+
+
+def parse_bank_statement(df: pd.DataFrame, continuation: bool = False) -> Optional[dict]:
+    """
+    Map a recognised bank statement export straight to transaction rows.
+
+    Args:
+        df: Statement sheet, or one batch of a streamed sheet
+        continuation: df is a later batch of a streamed sheet (see detect_bank_profile)
+
+    Returns:
+        None if the layout isn't a known bank export. Otherwise a dict shaped
+        like parse_export()'s: profile, software (the bank), document_type
+        ("bank_statement") and rows (DataFrame of Transaction fields)
+    """
+    df = df.dropna(how='all')
+    if df.empty:
+        return None
+
+    detected = detect_bank_profile(df, restore_header=not continuation)
+    if detected is None:
+        return None
+    profile_name, df, mapping = detected
+    profile = BANK_PROFILES[profile_name]
+
+    if profile["sign"] == "signed":
+        signed = parse_amounts(df[mapping["amount"]])
+    else:
+        debit = parse_amounts(df[mapping["debit"]]).abs()
+        credit = parse_amounts(df[mapping["credit"]]).abs()
+        signed = credit.fillna(0) - debit.fillna(0)
+        signed = signed.where(debit.notna() | credit.notna())
+
+    description = df[mapping["description"]].fillna("").astype(str).str.strip()
+    counterparty = description
+    if "counterparty" in mapping:
+        named = df[mapping["counterparty"]].fillna("").astype(str).str.strip()
+        counterparty = named.where(named != "", description)
+
+    dates = df[mapping["date"]]
+    if profile.get("timestamps"):
+        dates = dates.astype(str).str[:10]
+
+    rows = pd.DataFrame({
+        "date": parse_dates(dates),
+        "customer_or_vendor": counterparty.replace("", "Unknown"),
+        "description": description,
+        "amount": signed.abs(),
+        "type": pd.Series("revenue", index=df.index).where(signed >= 0, "expense"),
+        "category": "uncategorised",
+        "status": "paid",
+        "confidence": "high"
+    })
+
+    # Zero/blank amounts are balance and memo lines, not money movements
+    is_balance_line = description.str.lower().str.match(BALANCE_LINE)
+    rows = rows[signed.notna() & signed.ne(0) & ~is_balance_line]
+    if rows.empty:
+        return None
+
+    return {
+        "profile": profile_name,
+        "software": profile["bank"],
+        "document_type": "bank_statement",
+        "rows": rows.reset_index(drop=True)
+    }
@@ -15,6 +15,7 @@ DATA SOURCES:
 - Internal audit database (after 10+ audits) - COMPARATIVE
 """
 
+import hashlib
 import json
 import os
 from pathlib import Path
@@ -38,6 +39,7 @@ class BenchmarkEngine:
         # Load the service.com.au benchmarks
         benchmarks_path = Path(__file__).parent / "benchmarks.json"
         self.benchmarks = self._load_benchmarks(benchmarks_path)
+        self.version = self._benchmarks_version(self.benchmarks)
         
         # Import the existing market data as fallback
         from src.utils.market_data import (
@@ -63,6 +65,13 @@ class BenchmarkEngine:
             print(f"Warning: Could not load benchmarks.json: {e}")
         return {}
     
+    @staticmethod
+    def _benchmarks_version(benchmarks: dict) -> str:
+        """The meta version plus a content hash, so edits without a version bump still count."""
+        meta = benchmarks.get("meta", {})
+        content = hashlib.sha256(json.dumps(benchmarks, sort_keys=True).encode("utf-8")).hexdigest()[:12]
+        return f"{meta.get('version', 'none')}/{meta.get('last_updated', 'unknown')}/{content}"
+    
     def get_hourly_rate(self, trade: str, location: str) -> Dict[str, Any]:
         """
         Get hourly rate benchmark with full provenance.
@@ -0,0 +1,158 @@
+"""
+Persistent on-disk cache for expensive results (Claude extractions, parsed pages, etc.).
+
+Entries are JSON files addressed by a content hash, so a cache hit means the
+inputs were byte-for-byte identical. The cache is bounded by total size on disk
+and evicts least-recently-used entries first (access time is tracked via mtime).
+"""
+
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any, Optional
+
+
+def make_cache_key(*parts: Any) -> str:
+    """Build a stable cache key from any number of string-able parts."""
+    hasher = hashlib.sha256()
+    for part in parts:
+        hasher.update(str(part).encode("utf-8"))
+        hasher.update(b"\x00")  # Separator so ("ab", "c") != ("a", "bc")
+    return hasher.hexdigest()
+
+
+def hash_text(text: str) -> str:
+    """Short content hash of a string (e.g. a prompt) for use in cache keys."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+
+class DiskCache:
+    """
+    Size-bounded LRU cache of JSON values stored under CACHE_DIR/<name>.
+
+    Safe to share between threads. Writes are atomic (temp file + rename) so a
+    crash mid-write never leaves a corrupt entry behind.
+    """
+
+    def __init__(self, name: str, max_size_mb: float = 200.0, base_dir: Optional[str] = None):
+        self.path = Path(base_dir or os.getenv("CACHE_DIR", "./cache")) / name
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.max_size_bytes = int(max_size_mb * 1024 * 1024)
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._lock = threading.Lock()
+        self._size_bytes: Optional[int] = None  # Computed lazily on first write
+
+    def _entry_path(self, key: str) -> Path:
+        # Two-level fan-out keeps directories small
+        return self.path / key[:2] / f"{key}.json"
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached value for key, or None on a miss."""
+        entry = self._entry_path(key)
+        try:
+            with open(entry, 'r') as f:
+                value = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            with self._lock:
+                self.misses += 1
+            return None
+
+        # Touch for LRU ordering
+        try:
+            os.utime(entry, None)
+        except OSError:
+            pass
+
+        with self._lock:
+            self.hits += 1
+        return value
+
+    def set(self, key: str, value: Any) -> None:
+        """Store a JSON-serialisable value, evicting old entries if over budget."""
+        entry = self._entry_path(key)
+        entry.parent.mkdir(exist_ok=True)
+
+        data = json.dumps(value, default=str).encode("utf-8")
+        tmp = entry.with_suffix(f".{threading.get_ident()}.tmp")
+        with open(tmp, 'wb') as f:
+            f.write(data)
+
+        with self._lock:
+            old_size = entry.stat().st_size if entry.exists() else 0
+            os.replace(tmp, entry)
+            if self._size_bytes is None:
+                self._size_bytes = self._scan_size()
+            else:
+                self._size_bytes += len(data) - old_size
+
+            if self._size_bytes > self.max_size_bytes:
+                self._evict()
+
+    def invalidate(self, key: str) -> bool:
+        """Remove a single entry. Returns True if it existed."""
+        entry = self._entry_path(key)
+        with self._lock:
+            try:
+                size = entry.stat().st_size
+                entry.unlink()
+            except FileNotFoundError:
+                return False
+            if self._size_bytes is not None:
+                self._size_bytes -= size
+        return True
+
+    def clear(self) -> int:
+        """Remove every entry. Returns the number removed."""
+        removed = 0
+        with self._lock:
+            for entry in self.path.glob("*/*.json"):
+                entry.unlink(missing_ok=True)
+                removed += 1
+            self._size_bytes = 0
+        return removed
+
+    def stats(self) -> dict:
+        """Hit/miss counters and current size, for logging and the admin dashboard."""
+        with self._lock:
+            if self._size_bytes is None:
+                self._size_bytes = self._scan_size()
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "evictions": self.evictions,
+                "size_mb": self._size_bytes / (1024 * 1024),
+                "max_size_mb": self.max_size_bytes / (1024 * 1024)
+            }
+
+    def _scan_size(self) -> int:
+        return sum(f.stat().st_size for f in self.path.glob("*/*.json"))
+
+    def _evict(self) -> None:
+        """Drop least-recently-used entries until under 90% of the size budget."""
+        target = int(self.max_size_bytes * 0.9)
+        entries = []
+        for entry in self.path.glob("*/*.json"):
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry))
+
+        entries.sort(key=lambda x: x[0])
+        size = sum(e[1] for e in entries)
+        for _, entry_size, entry in entries:
+            if size <= target:
+                break
+            entry.unlink(missing_ok=True)
+            size -= entry_size
+            self.evictions += 1
+
+        self._size_bytes = size
@@ -0,0 +1,182 @@
+"""
+Pre-flight token and cost forecasting for an audit.
+
+Before any API call is made, each document's serialised content is measured
+with the local token estimator. Each file gets a strategy (cached,
+deterministic parse, deterministic parse plus categorisation of its unique
+descriptions, single call, packed into a shared call with other small
+documents, chunked, or streamed from a large workbook) and a forecast of
+its tokens and cost. The per-audit total is checked against MAX_COST_PER_AUDIT so an
+oversized upload is stopped before it runs up a bill.
+
+Estimates are deliberately on the high side: input uses the rough
+chars-per-token estimate, and output assumes every content line with a number
+in it (a spreadsheet row, a statement line) becomes a transaction.
+"""
+
+import math
+import re
+from typing import Optional
+
+from pydantic import BaseModel
+
+from src.utils.anthropic_client import CACHE_WRITE_PRICE_MULTIPLIER
+from src.utils.table_serializer import estimate_tokens
+
+
+# Claude's JSON for one extracted transaction, and the wrapper around the array
+TOKENS_PER_TRANSACTION = 70
+RESPONSE_OVERHEAD_TOKENS = 150
+
+# Lines that can't be transactions: page/sheet markers and serializer notes
+NON_TRANSACTION_LINE = re.compile(r'^\s*(\[(PAGE \d+|SHEET: .*|/?TABLE)\]|#)')
+
+# Analysis call: data summary size and output cap in single mode (Analyzer.analyze max_tokens)
+ANALYSIS_SUMMARY_TOKENS = 3000
+ANALYSIS_MAX_OUTPUT_TOKENS = 16384
+
+# Customer grading calls (Analyzer._grade_batch): each customer sends up to 20
+# transaction lines and gets up to 300 output tokens, plus 200 per call. The
+# forecast runs before extraction, so it reserves for this many customers needing
+# a call - more than most trades have outside the locally graded A/C extremes.
+GRADING_TOKENS_PER_CUSTOMER = 450
+GRADING_OUTPUT_TOKENS_PER_CUSTOMER = 300
+GRADING_OUTPUT_TOKENS_PER_CALL = 200
+GRADING_RESERVE_CUSTOMERS = 60
+
+
+class BudgetExceededError(RuntimeError):
+    """An audit's API spend would exceed (or has reached) MAX_COST_PER_AUDIT."""
+
+
+class FileForecast(BaseModel):
+    """Planned extraction strategy and predicted usage for one document."""
+    file_path: str
+    strategy: str  # "cached", "deterministic", "categorise", "single", "packed", "chunked", "streamed", "skipped" or "error"
+    calls: int = 0
+    input_tokens: int = 0
+    output_tokens: int = 0
+    estimated_cost: float = 0.0
+
+
+class AuditForecast(BaseModel):
+    """Predicted API usage for a whole audit."""
+    files: list[FileForecast]
+    extraction_cost: float
+    analysis_cost: float  # The analysis calls plus the customer grading reserve
+    total_cost: float
+    budget: Optional[float] = None
+
+    @property
+    def within_budget(self) -> bool:
+        return self.budget is None or self.total_cost <= self.budget
+
+    def summary_line(self) -> str:
+        strategies = {}
+        for f in self.files:
+            strategies[f.strategy] = strategies.get(f.strategy, 0) + 1
+        breakdown = ", ".join(f"{count} {name}" for name, count in sorted(strategies.items()))
+        budget = f" of ${self.budget:.2f} budget" if self.budget is not None else ""
+        return (f"Forecast: ${self.total_cost:.2f}{budget} "
+                f"(extraction ${self.extraction_cost:.2f} + analysis and grading ${self.analysis_cost:.2f}; {breakdown})")
+
+
+def estimate_output_tokens(content: str, max_tokens: int) -> int:
+    """Expected response size for extracting `content`, capped at max_tokens."""
+    transactions = sum(
+        1 for line in content.splitlines()
+        if any(c.isdigit() for c in line) and not NON_TRANSACTION_LINE.match(line)
+    )
+    return min(max_tokens, RESPONSE_OVERHEAD_TOKENS + transactions * TOKENS_PER_TRANSACTION)
+
+
+def forecast_file(
+    file_path: str,
+    strategy: str,
+    chunks: list[str],
+    prompt_tokens: int,
+    max_tokens: int,
+    input_cost_per_1m: float,
+    output_cost_per_1m: float,
+    chunk_tokens: Optional[list[tuple[int, int]]] = None
+) -> FileForecast:
+    """
+    Forecast one document's extraction.
+
+    Args:
+        file_path: Document path
+        strategy: How it will be extracted
+        chunks: Content sent to Claude, one entry per call (empty if no calls)
+        prompt_tokens: Estimated size of the extraction instructions sent with every call
+        max_tokens: Per-call output cap
+        chunk_tokens: (content tokens, expected output tokens) per call, used
+            instead of chunks for content that isn't held in memory (streamed workbooks)
+    """
+    if chunk_tokens is None:
+        chunk_tokens = [(estimate_tokens(chunk), estimate_output_tokens(chunk, max_tokens)) for chunk in chunks]
+    input_tokens = sum(prompt_tokens + tokens for tokens, _ in chunk_tokens)
+    output_tokens = sum(output for _, output in chunk_tokens)
+    return FileForecast(
+        file_path=file_path,
+        strategy=strategy,
+        calls=len(chunk_tokens),
+        input_tokens=input_tokens,
+        output_tokens=output_tokens,
+        estimated_cost=(input_tokens / 1_000_000 * input_cost_per_1m
+                        + output_tokens / 1_000_000 * output_cost_per_1m)
+    )
+
+
+def estimate_analysis_cost(
+    system_prompt: str,
+    input_cost_per_1m: float,
+    output_cost_per_1m: float,
+    sections: int = 1,
+    max_output_tokens: int = ANALYSIS_MAX_OUTPUT_TOKENS
+) -> float:
+    """
+    Upper-bound cost of the analysis calls.
+
+    Args:
+        system_prompt: Analysis instructions sent with every call
+        sections: Calls made (one per section in sectioned mode, else 1); each
+            sends the whole prompt, priced as a cache write since they run concurrently
+        max_output_tokens: Per-call output cap
+    """
+    input_tokens = sections * (
+        estimate_tokens(system_prompt) * CACHE_WRITE_PRICE_MULTIPLIER + ANALYSIS_SUMMARY_TOKENS
+    )
+    output_tokens = sections * max_output_tokens
+    return input_tokens / 1_000_000 * input_cost_per_1m + output_tokens / 1_000_000 * output_cost_per_1m
+
+
+def estimate_grading_cost(
+    system_prompt: str,
+    batch_size: int,
+    input_cost_per_1m: float,
+    output_cost_per_1m: float,
+    customers: int = GRADING_RESERVE_CUSTOMERS
+) -> float:
+    """
+    Upper-bound cost of grading `customers` customers in batches of batch_size.
+
+    Every call is priced as a cache write on the grading prompt, since the calls
+    run concurrently and may all miss the cache.
+    """
+    calls = math.ceil(customers / max(1, batch_size))
+    input_tokens = (calls * estimate_tokens(system_prompt) * CACHE_WRITE_PRICE_MULTIPLIER
+                    + customers * GRADING_TOKENS_PER_CUSTOMER)
+    output_tokens = customers * GRADING_OUTPUT_TOKENS_PER_CUSTOMER + calls * GRADING_OUTPUT_TOKENS_PER_CALL
+    return input_tokens / 1_000_000 * input_cost_per_1m + output_tokens / 1_000_000 * output_cost_per_1m
+
+
+def forecast_audit(files: list[FileForecast], analysis_cost: float, budget: Optional[float]) -> AuditForecast:
+    """Roll per-file forecasts up into an audit forecast."""
+    extraction_cost = sum(f.estimated_cost for f in files)
+    return AuditForecast(
+        files=files,
+        extraction_cost=extraction_cost,
+        analysis_cost=analysis_cost,
+        total_cost=extraction_cost + analysis_cost,
+        budget=budget
+    )
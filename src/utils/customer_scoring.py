@@ -0,0 +1,144 @@
+"""
+RFM customer scoring - grades the clear-cut customers without Claude.
+
+Most of a tradie's customers are obviously A-grade (big, frequent, recent,
+paid up) or obviously C-grade (small, one-off, long ago). Each customer is
+scored 1-5 on recency, frequency and monetary value, ranked against the
+business's other customers, plus their payment record from invoice statuses.
+Confident grades are assigned locally; only borderline customers and anyone
+with unpaid or overdue work (a possible "Fire") go to Claude, which can weigh
+the detail.
+"""
+
+import numpy as np
+import pandas as pd
+
+from src.utils.metrics_engine import OUTSTANDING_STATUSES
+from src.utils.transaction_table import transaction_dates
+
+
+# Ranks among fewer customers than this say little - everyone goes to Claude
+MIN_CUSTOMERS_TO_RANK = 10
+
+# Mean of the R, F and M scores (1-5) that makes a grade clear-cut
+A_GRADE_SCORE = 4.0
+C_GRADE_SCORE = 2.0
+
+# Share of a customer's revenue unpaid that makes them a Fire candidate for Claude to judge
+FIRE_CANDIDATE_UNPAID_SHARE = 0.3
+
+# A later half of jobs this much bigger (or smaller) than the earlier half is a trend
+TREND_THRESHOLD = 0.15
+
+
+def _score(values: pd.Series, higher_is_better: bool = True) -> pd.Series:
+    """1-5 by quintile of rank among the customers; missing values score 3."""
+    pct = values.rank(pct=True, ascending=higher_is_better, method="average")
+    return np.ceil(pct * 5).clip(1, 5).fillna(3).astype(int)
+
+
+def score_customers(revenue: pd.DataFrame) -> pd.DataFrame:
+    """
+    Recency, frequency, monetary and payment scores per customer.
+
+    Args:
+        revenue: Revenue rows of the transaction table (type_view(table, "revenue"))
+
+    Returns:
+        DataFrame indexed by customer with job_count, total_revenue,
+        avg_job_size, recency_days, unpaid_share, overdue_jobs, job_size_trend,
+        r_score, f_score, m_score and rfm (their mean)
+    """
+    status = revenue["status"].astype(str).str.lower()
+    dates = transaction_dates(revenue)
+    rows = pd.DataFrame({
+        "customer": revenue["customer_or_vendor"].astype(str),
+        "amount": revenue["amount"],
+        "date": dates,
+        "unpaid": revenue["amount"].where(status.isin(OUTSTANDING_STATUSES), 0.0),
+        "overdue": status.eq("overdue")
+    }).sort_values("date", kind="stable")
+
+    # Earlier vs later half of each customer's jobs, for the job size trend
+    position = rows.groupby("customer").cumcount()
+    count = rows.groupby("customer")["amount"].transform("count")
+    later = position >= count / 2
+
+    grouped = rows.groupby("customer")
+    scores = pd.DataFrame({
+        "job_count": grouped["amount"].count(),
+        "total_revenue": grouped["amount"].sum(),
+        "last_date": grouped["date"].max(),
+        "unpaid": grouped["unpaid"].sum(),
+        "overdue_jobs": grouped["overdue"].sum().astype(int),
+        "earlier_avg": rows[~later].groupby("customer")["amount"].mean(),
+        "later_avg": rows[later].groupby("customer")["amount"].mean()
+    })
+    scores["avg_job_size"] = scores["total_revenue"] / scores["job_count"]
+    scores["recency_days"] = (dates.max() - scores["last_date"]).dt.days
+    scores["unpaid_share"] = (scores["unpaid"] / scores["total_revenue"]).where(scores["total_revenue"] > 0, 0.0)
+
+    change = scores["later_avg"] / scores["earlier_avg"] - 1
+    scores["job_size_trend"] = np.select(
+        [change > TREND_THRESHOLD, change < -TREND_THRESHOLD], ["growing", "shrinking"], "stable"
+    )
+
+    scores["r_score"] = _score(scores["recency_days"], higher_is_better=False)
+    scores["f_score"] = _score(scores["job_count"])
+    scores["m_score"] = _score(scores["total_revenue"])
+    scores["rfm"] = scores[["r_score", "f_score", "m_score"]].mean(axis=1)
+    return scores.drop(columns=["last_date", "unpaid", "earlier_avg", "later_avg"])
+
+
+def pregrade(scores: pd.DataFrame) -> pd.Series:
+    """
+    Clear-cut grades from the scores.
+
+    Returns:
+        Series indexed by customer: "A", "C", or None where Claude should
+        decide (borderline scores, unpaid or overdue work, or too few
+        customers to rank)
+    """
+    grades = pd.Series([None] * len(scores), index=scores.index, dtype=object)
+    if len(scores) < MIN_CUSTOMERS_TO_RANK:
+        return grades
+
+    fire_candidate = (scores["unpaid_share"] >= FIRE_CANDIDATE_UNPAID_SHARE) | (scores["overdue_jobs"] > 0)
+    paid_up = scores["unpaid_share"] == 0
+    grades[(scores["rfm"] >= A_GRADE_SCORE) & paid_up] = "A"
+    grades[(scores["rfm"] <= C_GRADE_SCORE) & ~fire_candidate] = "C"
+    return grades
+
+
+def local_grade(customer: str, grade: str, row) -> dict:
+    """Grade info for a pre-graded customer, in the shape Claude returns it."""
+    if row.overdue_jobs:
+        payment = "very_slow"
+    elif row.unpaid_share > 0:
+        payment = "slow"
+    else:
+        payment = "normal"
+    scores = f"R{row.r_score} F{row.f_score} M{row.m_score}"
+
+    if grade == "A":
+        recommendation, action = "nurture", "Priority scheduling and a quarterly check-in"
+        reasoning = (f"Top-ranked on recency, frequency and spend ({scores}): {row.job_count} jobs, "
+                     f"${row.total_revenue:,.0f} total, paid up")
+    else:
+        recommendation, action = "increase_prices", "Full rate plus call-out fee on the next quote, or decline"
+        reasoning = (f"Low-ranked on recency, frequency and spend ({scores}): {row.job_count} jobs, "
+                     f"${row.total_revenue:,.0f} total")
+
+    return {
+        "customer": customer,
+        "grade": grade,
+        "total_revenue": round(float(row.total_revenue), 2),
+        "job_count": int(row.job_count),
+        "avg_job_size": round(float(row.avg_job_size), 2),
+        "payment_behavior": payment,
+        "job_size_trend": row.job_size_trend,
+        "recommendation": recommendation,
+        "reasoning": reasoning,
+        "action": action,
+        "graded_by": "rfm_scores"
+    }
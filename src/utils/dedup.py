@@ -0,0 +1,179 @@
+"""
+Cross-document transaction de-duplication.
+
+The same job often arrives three times: as the PDF invoice, as a line in the
+accounting export and as the deposit on the bank statement. Counting all
+three triples its revenue. This stage links those records to one kept record
+instead of deleting them, so the table still shows every source a figure came
+from.
+
+Comparing every pair of transactions is quadratic, so candidates are blocked
+first: only records of the same type and exact amount, from different files,
+with dates within a window of each other are compared. Inside a block the
+counterparties are matched fuzzily, because a bank line reads
+"DIRECT CREDIT J SMITH INV 1042" where the invoice says "John Smith Plumbing".
+"""
+
+import os
+import re
+from difflib import SequenceMatcher
+
+import numpy as np
+import pandas as pd
+
+from src.utils.transaction_table import sort_blocks, transaction_dates
+from src.utils.vendor_memo import normalize_description
+
+
+DATE_WINDOW_DAYS = int(os.getenv("DEDUP_DATE_WINDOW_DAYS", "14"))
+MATCH_THRESHOLD = float(os.getenv("DEDUP_MATCH_THRESHOLD", "0.6"))
+
+# Character similarity this high counts on its own (typos, spacing); below it,
+# names that share a word ("Smith Plumbing", "Smith Electrical") still read
+# alike and only shared words count
+SPELLING_MATCH = 0.85
+
+# Words that say nothing about who the counterparty is
+FILLER_WORDS = {
+    "PTY", "LTD", "LIMITED", "THE", "AND", "CO", "INC", "GROUP", "SERVICES", "TRADING",
+    "DIRECT", "CREDIT", "DEBIT", "DEPOSIT", "TRANSFER", "PAYMENT", "FROM", "INV", "INVOICE"
+}
+
+# Placeholders extraction and the parsers use when no party is named - they say
+# nothing about whether two records are the same transaction
+PLACEHOLDER_NAMES = {"", "UNKNOWN", "N/A", "NA", "NONE", "NAN", "-"}
+
+# Keep the record with the most detail: line items, a real category, high confidence
+CONFIDENCE_RANK = {"high": 2, "medium": 1}
+
+
+def _name_tokens(normalized: str) -> frozenset[str]:
+    words = re.findall(r'[A-Z][A-Z&\']+', normalized)
+    return frozenset(w for w in words if len(w) >= 3 and w not in FILLER_WORDS)
+
+
+def _similarity(norm_a: str, tokens_a: frozenset, norm_b: str, tokens_b: frozenset) -> float:
+    if norm_a in PLACEHOLDER_NAMES or norm_b in PLACEHOLDER_NAMES:
+        return 0.0
+    if norm_a == norm_b:
+        return 1.0
+    if not (tokens_a and tokens_b):
+        return SequenceMatcher(None, norm_a, norm_b).ratio()
+    shared = len(tokens_a & tokens_b) / min(len(tokens_a), len(tokens_b))
+    if shared >= SPELLING_MATCH:
+        return shared
+    matcher = SequenceMatcher(None, norm_a, norm_b)
+    if matcher.quick_ratio() < SPELLING_MATCH:
+        return shared
+    ratio = matcher.ratio()
+    return max(shared, ratio if ratio >= SPELLING_MATCH else 0.0)
+
+
+def name_similarity(a: str, b: str) -> float:
+    """
+    How likely two counterparty strings name the same party, 0 to 1.
+
+    Mostly the share of the shorter name's words found in the longer one,
+    since bank lines abbreviate ("J SMITH") where invoices spell out the
+    business name; near-identical spellings also match. A placeholder
+    ("Unknown", blank) matches nothing, not even itself.
+    """
+    norm_a, norm_b = normalize_description(a), normalize_description(b)
+    return _similarity(norm_a, _name_tokens(norm_a), norm_b, _name_tokens(norm_b))
+
+
+def _detail_rank(table: pd.DataFrame, label) -> tuple:
+    return (
+        len(table.at[label, "line_items"] or []) > 0,
+        table.at[label, "category"] not in ("uncategorised", "unknown", "other"),
+        CONFIDENCE_RANK.get(table.at[label, "confidence"], 0),
+        -label  # then the earliest record
+    )
+
+
+def find_duplicates(table: pd.DataFrame) -> pd.Series:
+    """
+    Link records of the same transaction across documents.
+
+    Args:
+        table: Transaction table (see src/utils/transaction_table.py)
+
+    Returns:
+        Series aligned with the table: for each linked duplicate, the index
+        label of the record it duplicates; -1 for every other record
+    """
+    duplicate_of = pd.Series(-1, index=table.index, dtype="int64")
+    if len(table) < 2:
+        return duplicate_of
+
+    candidates = pd.DataFrame({
+        "type": table["type"].astype(str),
+        "cents": (table["amount"] * 100).round().astype("int64"),
+        "day": transaction_dates(table),
+        "source": table["source_file"].astype(str),
+        "name": table["customer_or_vendor"].astype(str)
+    })
+    # Undated and zero-amount records can't be placed in a block
+    candidates = candidates[candidates["day"].notna() & candidates["cents"].gt(0)]
+    block_sizes = candidates.groupby(["type", "cents"])["source"].transform("nunique")
+    candidates = candidates[block_sizes > 1].sort_values(["type", "cents", "day"])
+
+    # Normalise each distinct counterparty once
+    names = {}
+    for name in candidates["name"].unique():
+        normalized = normalize_description(name)
+        names[name] = (normalized, _name_tokens(normalized))
+
+    # Score pairs within each block whose dates fall inside the window
+    labels = candidates.index.tolist()
+    days = candidates["day"].to_numpy()
+    sources = candidates["source"].to_numpy()
+    row_names = candidates["name"].tolist()
+    blocks = candidates[["type", "cents"]]
+    starts = (blocks != blocks.shift()).any(axis=1).to_numpy()
+    window = np.timedelta64(DATE_WINDOW_DAYS, "D")
+
+    pairs = []
+    scores = {}
+    for i in range(len(labels)):
+        j = i + 1
+        while j < len(labels) and not starts[j] and days[j] - days[i] <= window:
+            if sources[i] != sources[j]:
+                key = (row_names[i], row_names[j])
+                if key not in scores:
+                    scores[key] = _similarity(*names[key[0]], *names[key[1]])
+                if scores[key] >= MATCH_THRESHOLD:
+                    pairs.append((scores[key], labels[i], labels[j]))
+            j += 1
+
+    # Merge the best matches first; a group never takes two records from one file,
+    # since identical lines within a document are separate transactions
+    group = {}
+    members = {}
+    for score, a, b in sorted(pairs, key=lambda p: -p[0]):
+        group_a, group_b = group.get(a, a), group.get(b, b)
+        if group_a == group_b:
+            continue
+        files_a = {candidates.at[m, "source"] for m in members.get(group_a, [group_a])}
+        files_b = {candidates.at[m, "source"] for m in members.get(group_b, [group_b])}
+        if files_a & files_b:
+            continue
+        merged = members.pop(group_a, [group_a]) + members.pop(group_b, [group_b])
+        members[group_a] = merged
+        for m in merged:
+            group[m] = group_a
+
+    for linked in members.values():
+        keep = max(linked, key=lambda label: _detail_rank(table, label))
+        for label in linked:
+            if label != keep:
+                duplicate_of.at[label] = keep
+    return duplicate_of
+
+
+def link_duplicates(table: pd.DataFrame) -> pd.DataFrame:
+    """
+    The table with duplicate_of filled in and linked records sorted to the end
+    of their type block, so type_view() leaves them out.
+    """
+    return sort_blocks(table.assign(duplicate_of=find_duplicates(table)))
@@ -0,0 +1,181 @@
+"""
+Memory-bounded streaming reader for large Excel workbooks.
+
+pd.read_excel(sheet_name=None) materialises every sheet as a DataFrame at once,
+and a 100k-row multi-sheet ledger can take gigabytes that way. This reader
+opens the workbook with openpyxl in read-only mode and walks each sheet with
+iter_rows, handing back fixed-size batches of rows as DataFrames. Callers
+serialise or map each batch and let it go, so peak memory depends on the batch
+size rather than the workbook size.
+
+The first non-empty row of a sheet is its header, named the way pandas would
+name it ("Unnamed: n" for blanks, ".1" suffixes for duplicates) so batches
+look the same to the serialiser and export parsers as a pd.read_excel sheet.
+"""
+
+import os
+from pathlib import Path
+from typing import Iterator, Optional
+
+import pandas as pd
+
+try:
+    import openpyxl
+except ImportError:
+    openpyxl = None
+
+
+# Rows per batch handed to the serialiser / export mapper
+EXCEL_BATCH_ROWS = int(os.getenv("EXCEL_BATCH_ROWS", "5000"))
+
+# Workbooks at least this big (on disk) are streamed instead of loaded whole
+EXCEL_STREAMING_MIN_MB = float(os.getenv("EXCEL_STREAMING_MIN_MB", "5"))
+
+# Formats openpyxl can open (legacy .xls still goes through pandas/xlrd)
+STREAMABLE_SUFFIXES = {'.xlsx', '.xlsm'}
+
+
+def should_stream(path: Path) -> bool:
+    """True if a workbook is large enough, and of a format, to read in batches."""
+    path = Path(path)
+    if openpyxl is None or path.suffix.lower() not in STREAMABLE_SUFFIXES:
+        return False
+    return path.stat().st_size >= EXCEL_STREAMING_MIN_MB * 1024 * 1024
+
+
+def _column_names(cells: tuple) -> list[str]:
+    """Header cells as pandas would name them."""
+    names = []
+    seen = {}
+    for i, cell in enumerate(cells):
+        name = f"Unnamed: {i}" if cell is None or str(cell).strip() == "" else str(cell)
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
+
+
+def _trim(row: tuple) -> tuple:
+    """Drop trailing empty cells (read-only sheets often pad rows to the used range)."""
+    end = len(row)
+    while end and row[end - 1] is None:
+        end -= 1
+    return row[:end]
+
+
+def _rows(sheet) -> Iterator[tuple]:
+    """Non-empty rows of a read-only worksheet, trailing blanks trimmed."""
+    # Some exporters write a wrong <dimension>, which would cut iter_rows short
+    sheet.reset_dimensions()
+    for row in sheet.iter_rows(values_only=True):
+        row = _trim(row)
+        if any(cell is not None and str(cell).strip() != "" for cell in row):
+            yield row
+
+
+def _batch_frame(rows: list[tuple], columns: list[str]) -> pd.DataFrame:
+    width = max(len(columns), max((len(r) for r in rows), default=0))
+    if width > len(columns):
+        columns = columns + [f"Unnamed: {i}" for i in range(len(columns), width)]
+    padded = [r + (None,) * (width - len(r)) for r in rows]
+    return pd.DataFrame(padded, columns=columns)
+
+
+def sheet_headers(path: Path) -> dict[str, list[str]]:
+    """
+    Column names of every non-empty sheet, reading only as far as each header row.
+
+    Returns:
+        {sheet_name: columns}; sheets with no data are left out
+    """
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        headers = {}
+        for sheet in workbook.worksheets:
+            for row in _rows(sheet):
+                headers[sheet.title] = _column_names(row)
+                break
+        return headers
+    finally:
+        workbook.close()
+
+
+def iter_sheet_batches(
+    path: Path,
+    batch_rows: Optional[int] = None
+) -> Iterator[tuple[str, pd.DataFrame]]:
+    """
+    Stream a workbook as DataFrames of at most batch_rows rows.
+
+    Every batch of a sheet carries the sheet's header as its columns. Fully
+    empty rows are skipped while reading.
+
+    Args:
+        path: .xlsx/.xlsm workbook
+        batch_rows: Rows per batch (default EXCEL_BATCH_ROWS)
+
+    Yields:
+        (sheet_name, batch) in sheet order, then row order
+    """
+    batch_rows = batch_rows or EXCEL_BATCH_ROWS
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        for sheet in workbook.worksheets:
+            columns = None
+            rows = []
+            for row in _rows(sheet):
+                if columns is None:
+                    columns = _column_names(row)
+                    continue
+                rows.append(row)
+                if len(rows) >= batch_rows:
+                    yield sheet.title, _batch_frame(rows, columns)
+                    rows = []
+            if rows:
+                yield sheet.title, _batch_frame(rows, columns)
+    finally:
+        workbook.close()
+
+
+def keep_groups_together(
+    batches: Iterator[tuple[str, pd.DataFrame]],
+    key_columns: dict[str, Optional[str]]
+) -> Iterator[tuple[str, pd.DataFrame]]:
+    """
+    Re-cut batches so rows sharing a key value are never split across two.
+
+    Exports list multi-line invoices as consecutive rows with the same invoice
+    number. The trailing run of a batch is held back and prepended to the next
+    batch of the same sheet, so each invoice is collapsed in one piece.
+
+    Args:
+        batches: Output of iter_sheet_batches()
+        key_columns: {sheet_name: column to group on}; sheets without one pass through
+    """
+    carry = None
+    carry_sheet = None
+    for sheet_name, batch in batches:
+        if carry is not None:
+            if sheet_name == carry_sheet:
+                batch = pd.concat([carry, batch], ignore_index=True)
+            else:
+                yield carry_sheet, carry
+            carry = None
+
+        key = key_columns.get(sheet_name)
+        if not key or key not in batch.columns or pd.isna(batch[key].iloc[-1]):
+            yield sheet_name, batch
+            continue
+
+        same = batch[key].eq(batch[key].iloc[-1]).to_numpy()
+        breaks = (~same).nonzero()[0]
+        start = int(breaks[-1]) + 1 if len(breaks) else 0
+        if start:
+            yield sheet_name, batch.iloc[:start]
+        carry, carry_sheet = batch.iloc[start:].reset_index(drop=True), sheet_name
+
+    if carry is not None:
+        yield carry_sheet, carry
@@ -0,0 +1,298 @@
+"""
+Deterministic parsers for accounting software exports.
+
+Most customers upload CSV/XLSX exports from Xero, MYOB, QuickBooks or ServiceM8.
+These already have date, contact, description and amount columns, so there is
+no need to pay Claude to read them back into structure. Each known layout is
+recognised by its header signature and mapped to transaction rows with
+vectorised pandas operations. Anything unrecognised returns None and the caller
+falls back to Claude.
+"""
+
+import re
+from typing import Optional
+
+import pandas as pd
+
+
+# Bump when parsed rows change, so cached extractions of exports aren't reused
+EXPORT_PARSER_VERSION = "2"
+
+# Column aliases are matched against normalised headers (lowercase, alphanumeric only),
+# so "*ContactName", "Contact Name" and "contact_name" all become "contactname".
+# Category comes only from name columns (account names, tracking options), never
+# account codes; rows without one are labelled from their descriptions.
+EXPORT_PROFILES = {
+    "xero": {
+        "software": "Xero",
+        "signature": [{"contactname", "invoicenumber"}, {"contactname", "invoicedate"}],
+        "columns": {
+            "date": ["invoicedate", "date"],
+            "contact": ["contactname"],
+            "description": ["description", "reference"],
+            "amount": ["total", "lineamount", "amount"],
+            "status": ["status"],
+            "reference": ["invoicenumber"],
+            "category": ["accountname", "trackingoption1"]
+        }
+    },
+    "myob": {
+        "software": "MYOB",
+        "signature": [{"colastname"}],
+        "columns": {
+            "date": ["date"],
+            "contact": ["colastname"],
+            "description": ["memo", "description", "journalmemo"],
+            "amount": ["amount", "totalamount", "total", "incltaxtotal"],
+            "status": ["status"],
+            "reference": ["invoice", "invoiceno", "purchaseno"],
+            "category": ["accountname"]
+        }
+    },
+    "quickbooks": {
+        "software": "QuickBooks",
+        "signature": [{"transactiontype", "name"}, {"transactiontype", "num"}],
+        "columns": {
+            "date": ["date", "transactiondate"],
+            "contact": ["name", "customer", "vendor", "supplier"],
+            "description": ["memodescription", "memo", "description"],
+            "amount": ["amount", "total"],
+            "status": ["status"],
+            "reference": ["num", "no"],
+            "category": ["account", "split", "category"],
+            "transaction_type": ["transactiontype"]
+        }
+    },
+    "servicem8": {
+        "software": "ServiceM8",
+        "signature": [{"jobnumber"}, {"jobno"}, {"jobdescription"}],
+        "columns": {
+            "date": ["date", "completiondate", "jobdate", "invoicedate"],
+            "contact": ["companyname", "client", "clientname", "customer"],
+            "description": ["jobdescription", "description"],
+            "amount": ["totalinvoiceamount", "invoiceamount", "total", "amount"],
+            "status": ["status", "paymentstatus"],
+            "reference": ["jobnumber", "jobno"],
+            "category": ["category", "jobcategory"]
+        }
+    },
+    # Plain spreadsheets with conventional column names (incl. our own sample data)
+    "generic": {
+        "software": "spreadsheet",
+        "signature": [],
+        "columns": {
+            "date": ["date", "invoicedate", "transactiondate", "quotedate"],
+            "contact": ["customer", "client", "vendor", "supplier", "payee", "contact", "name"],
+            "description": ["description", "details", "memo", "job", "item", "narrative"],
+            "amount": ["amount", "total", "amountinclgst", "totalinclgst", "value"],
+            "status": ["status"],
+            "reference": ["invoicenumber", "quotenumber", "reference", "number"],
+            "category": ["category"]
+        }
+    }
+}
+
+# Category values that are ledger account codes rather than names
+LEDGER_CODE = r'[\d\s.\-]+'
+
+# Amount columns that hold an invoice total repeated on every line-item row
+INVOICE_TOTAL_COLUMNS = {"total", "totalamount", "totalinvoiceamount", "incltaxtotal"}
+
+# Contact column names that imply which side of the ledger a file is on
+EXPENSE_CONTACT_COLUMNS = {"vendor", "supplier", "payee"}
+REVENUE_CONTACT_COLUMNS = {"customer", "client", "clientname", "companyname"}
+
+# QuickBooks transaction types
+REVENUE_TRANSACTION_TYPES = {"invoice", "salesreceipt", "payment", "deposit", "creditmemo"}
+EXPENSE_TRANSACTION_TYPES = {"bill", "expense", "purchase", "check", "cheque", "billpayment", "creditcardexpense"}
+
+# Export status values -> the statuses DATA_EXTRACTION_PROMPT asks Claude for
+# ("overdue" stays distinct from "unpaid" - customer scoring flags it)
+STATUS_MAP = {
+    "paid": "paid", "complete": "paid", "completed": "paid", "closed": "paid",
+    "unpaid": "unpaid", "awaiting payment": "unpaid", "open": "unpaid",
+    "authorised": "unpaid", "outstanding": "unpaid", "invoiced": "unpaid",
+    "overdue": "overdue", "past due": "overdue",
+    "won": "won", "accepted": "won", "approved": "won",
+    "lost": "lost", "declined": "lost", "rejected": "lost", "unsuccessful": "lost",
+    "pending": "pending", "sent": "pending", "draft": "pending", "quote": "pending",
+    "awaiting approval": "pending"
+}
+
+QUOTE_STATUSES = {"won", "lost", "pending"}
+
+# Folder/filename categories -> transaction type
+CATEGORY_TYPES = {"invoices": "revenue", "quotes": "revenue", "expenses": "expense"}
+
+
+def normalize_header(header) -> str:
+    """Normalise a column header for alias matching."""
+    return re.sub(r'[^a-z0-9]', '', str(header).lower())
+
+
+def detect_export_profile(columns) -> Optional[tuple[str, dict]]:
+    """
+    Identify which known export layout a set of columns belongs to.
+
+    Returns (profile_name, {field: original_column}) or None if unrecognised.
+    """
+    normalized = {normalize_header(c): c for c in columns}
+
+    for name, profile in EXPORT_PROFILES.items():
+        signatures = profile["signature"]
+        if signatures and not any(sig <= normalized.keys() for sig in signatures):
+            continue
+
+        mapping = {}
+        for field, aliases in profile["columns"].items():
+            for alias in aliases:
+                if alias in normalized:
+                    mapping[field] = normalized[alias]
+                    break
+
+        # Need enough to build a transaction
+        if "date" in mapping and "amount" in mapping and ("contact" in mapping or "description" in mapping):
+            return name, mapping
+
+    return None
+
+
+def parse_amounts(series: pd.Series) -> pd.Series:
+    """Parse currency strings like "$1,250.00" or "(450.00)" into floats."""
+    if pd.api.types.is_numeric_dtype(series):
+        return series.astype(float)
+    cleaned = (
+        series.astype(str)
+        .str.strip()
+        .str.replace(r'^\((.*)\)$', r'-\1', regex=True)
+        .str.replace(r'[$,\s]|AUD', '', regex=True)
+    )
+    return pd.to_numeric(cleaned, errors='coerce')
+
+
+def parse_dates(series: pd.Series) -> pd.Series:
+    """Parse dates to YYYY-MM-DD strings, assuming Australian day-first order when ambiguous."""
+    if pd.api.types.is_datetime64_any_dtype(series):
+        parsed = series
+    else:
+        text = series.astype(str).str.strip()
+        parsed = pd.to_datetime(text, format='ISO8601', errors='coerce')
+        if parsed.isna().mean() > 0.5:
+            parsed = pd.to_datetime(text, dayfirst=True, format='mixed', errors='coerce')
+    return parsed.dt.strftime('%Y-%m-%d').fillna("unknown")
+
+
+def _text(df: pd.DataFrame, column: Optional[str], default: str) -> pd.Series:
+    if column is None:
+        return pd.Series(default, index=df.index)
+    return df[column].fillna("").astype(str).str.strip().replace("", default)
+
+
+def _snake(series: pd.Series) -> pd.Series:
+    return series.str.lower().str.replace(r'[^a-z0-9]+', '_', regex=True).str.strip('_')
+
+
+def parse_export(
+    df: pd.DataFrame,
+    category_hint: Optional[str] = None
+) -> Optional[dict]:
+    """
+    Map a recognised accounting export straight to transaction rows.
+
+    Args:
+        df: The export as loaded by pandas
+        category_hint: "invoices", "expenses" or "quotes" if known from the upload
+            folder or filename. An explicit customer/vendor column wins over it.
+
+    Returns:
+        None if the layout isn't recognised or the side of the ledger can't be
+        determined. Otherwise a dict with:
+        - profile / software: which layout matched
+        - document_type: "invoice", "expense" or "quote"
+        - rows: DataFrame with the Transaction fields as columns
+    """
+    df = df.dropna(how='all')
+    if df.empty:
+        return None
+
+    detected = detect_export_profile(df.columns)
+    if detected is None:
+        return None
+    profile_name, mapping = detected
+    contact_key = normalize_header(mapping.get("contact", ""))
+
+    # Collapse multi-line invoices into one row per invoice
+    reference = mapping.get("reference")
+    amount_col = mapping["amount"]
+    if reference and df[reference].notna().any() and df[reference].duplicated().any():
+        agg = {col: "first" for col in mapping.values() if col != reference}
+        if "description" in mapping:
+            agg[mapping["description"]] = lambda s: "; ".join(dict.fromkeys(s.dropna().astype(str)))
+        if normalize_header(amount_col) not in INVOICE_TOTAL_COLUMNS:
+            df = df.assign(**{amount_col: parse_amounts(df[amount_col])})
+            agg[amount_col] = "sum"
+        df = df.groupby(reference, sort=False, dropna=False).agg(agg).reset_index()
+
+    amounts = parse_amounts(df[amount_col])
+    statuses = _text(df, mapping.get("status"), "unknown").str.lower()
+    statuses = statuses.map(STATUS_MAP).fillna("unknown")
+
+    # Work out which side of the ledger each row is on
+    document_type = None
+    if "transaction_type" in mapping:
+        txn_types = df[mapping["transaction_type"]].fillna("").astype(str).map(normalize_header)
+        types = pd.Series("unknown", index=df.index)
+        types[txn_types.isin(REVENUE_TRANSACTION_TYPES)] = "revenue"
+        types[txn_types.isin(EXPENSE_TRANSACTION_TYPES)] = "expense"
+    else:
+        if category_hint == "quotes" or (statuses.isin(QUOTE_STATUSES - {"pending"}).any()
+                                         and not statuses.eq("paid").any()):
+            side = "revenue"
+            document_type = "quote"
+        elif contact_key in EXPENSE_CONTACT_COLUMNS:
+            side = "expense"
+        elif contact_key in REVENUE_CONTACT_COLUMNS:
+            side = "revenue"
+        elif category_hint in CATEGORY_TYPES:
+            side = CATEGORY_TYPES[category_hint]
+        elif (amounts < 0).any():
+            side = None  # Signed ledger - decided per row below
+        else:
+            return None
+        types = pd.Series(side, index=df.index)
+        if side is None:
+            types = pd.Series("revenue", index=df.index).where(amounts >= 0, "expense")
+
+    if document_type is None:
+        counts = types.value_counts()
+        document_type = "expense" if counts.get("expense", 0) > counts.get("revenue", 0) else "invoice"
+
+    if document_type == "quote":
+        statuses = statuses.where(statuses.isin(QUOTE_STATUSES), "pending")
+
+    category = _text(df, mapping.get("category"), "uncategorised")
+    # A bare ledger code ("200", "4-1000") isn't a category - leave it for description labelling
+    category = category.where(~category.str.fullmatch(LEDGER_CODE), "uncategorised")
+    rows = pd.DataFrame({
+        "date": parse_dates(df[mapping["date"]]),
+        "customer_or_vendor": _text(df, mapping.get("contact"), "Unknown"),
+        "description": _text(df, mapping.get("description"), ""),
+        "amount": amounts.abs(),
+        "type": types,
+        "category": _snake(category).replace("", "uncategorised"),
+        "status": statuses,
+        "confidence": "high"
+    })
+
+    # Drop totals/subtotal rows and anything without a usable amount
+    is_total_row = rows["description"].str.lower().str.match(r'^(sub)?total\b') & rows["date"].eq("unknown")
+    rows = rows[amounts.notna() & ~is_total_row]
+    if rows.empty:
+        return None
+
+    return {
+        "profile": profile_name,
+        "software": EXPORT_PROFILES[profile_name]["software"],
+        "document_type": document_type,
+        "rows": rows.reset_index(drop=True)
+    }
@@ -7,10 +7,21 @@ import os
 import shutil
 from pathlib import Path
 from datetime import datetime
-from typing import Optional
+from typing import Iterator, Optional
 import hashlib
 
 
+# Document types the extractor can read
+SUPPORTED_EXTENSIONS = {'.pdf', '.xlsx', '.xls', '.csv'}
+
+# Upload subfolders that tell us what kind of document a file is
+CATEGORY_FOLDERS = {"invoices", "expenses", "quotes", "statements"}
+
+# Editor/OS lock and partial-download files that are never real documents
+TEMP_FILE_PREFIXES = ("~$", ".~lock")
+TEMP_FILE_SUFFIXES = {".tmp", ".part", ".crdownload", ".swp"}
+
+
 class FileHandler:
     """
     Handles file operations for customer data.
@@ -92,7 +103,8 @@ class FileHandler:
         
         return file_path
     
-    def _guess_category(self, filename: str) -> str:
+    @staticmethod
+    def _guess_category(filename: str) -> str:
         """Guess file category from filename."""
         filename_lower = filename.lower()
         
@@ -135,7 +147,8 @@ class FileHandler:
         
         return sorted(folders, key=lambda x: x["created"], reverse=True)
     
-    def get_file_hash(self, file_path: Path) -> str:
+    @staticmethod
+    def get_file_hash(file_path: Path) -> str:
         """Get MD5 hash of a file for deduplication."""
         hasher = hashlib.md5()
         with open(file_path, 'rb') as f:
@@ -143,6 +156,54 @@ class FileHandler:
                 hasher.update(chunk)
         return hasher.hexdigest()
     
+    @staticmethod
+    def iter_documents(
+        folder: Path, 
+        seen_hashes: Optional[set] = None
+    ) -> Iterator[tuple[Path, Optional[str], str]]:
+        """
+        Recursively walk a customer folder, yielding documents as they are found.
+        
+        Hidden folders/files, temp files and unsupported types are skipped, as is
+        any file whose content hash is already in seen_hashes (the set is updated
+        as files are yielded, so re-uploads of the same document are processed once).
+        
+        Args:
+            folder: Customer folder to walk
+            seen_hashes: Hashes already processed (updated in place)
+            
+        Yields:
+            (file_path, category_hint, file_hash) where category_hint is the
+            upload subfolder ("invoices", "expenses", ...) or None
+        """
+        folder = Path(folder)
+        if seen_hashes is None:
+            seen_hashes = set()
+        
+        for dirpath, dirnames, filenames in os.walk(folder):
+            # Prune hidden folders in place and walk in a stable order
+            dirnames[:] = sorted(d for d in dirnames if not d.startswith('.'))
+            
+            current = Path(dirpath)
+            relative = current.relative_to(folder).parts
+            category_hint = relative[0].lower() if relative and relative[0].lower() in CATEGORY_FOLDERS else None
+            
+            for filename in sorted(filenames):
+                if filename.startswith('.') or filename.startswith(TEMP_FILE_PREFIXES):
+                    continue
+                suffix = Path(filename).suffix.lower()
+                if suffix in TEMP_FILE_SUFFIXES or suffix not in SUPPORTED_EXTENSIONS:
+                    continue
+                
+                file_path = current / filename
+                file_hash = FileHandler.get_file_hash(file_path)
+                if file_hash in seen_hashes:
+                    print(f"  Skipping duplicate: {file_path.relative_to(folder)}")
+                    continue
+                seen_hashes.add(file_hash)
+                
+                yield file_path, category_hint, file_hash
+    
     def cleanup_old_folders(self, days_old: int = 90) -> list[str]:
         """
         Remove customer folders older than specified days.
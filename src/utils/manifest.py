@@ -0,0 +1,100 @@
+"""
+Per-folder extraction manifest.
+
+Records, for each document in a customer folder, its content hash, where it
+was and the extraction result it produced. When a customer adds or removes
+files after submitting, only the difference has to be extracted. Unchanged
+files keep their stored results and removed files simply drop out.
+
+Manifests live under CACHE_DIR/manifests, not in the customer folder, so
+they are never mistaken for an uploaded document.
+"""
+
+import json
+import os
+from pathlib import Path
+from typing import Optional
+
+from src.utils.cache import make_cache_key
+
+
+def manifest_path(folder: Path) -> Path:
+    """Where the manifest for a customer folder is stored (keyed by its absolute path)."""
+    base = Path(os.getenv("CACHE_DIR", "./cache")) / "manifests"
+    base.mkdir(parents=True, exist_ok=True)
+    return base / f"{make_cache_key(Path(folder).resolve())}.json"
+
+
+class ExtractionManifest:
+    """
+    JSON manifest of extraction results keyed by file content hash.
+
+    The fingerprint identifies what produced the results (prompt + model). A
+    manifest written under a different fingerprint is discarded on load, so a
+    prompt or model change re-extracts everything.
+    """
+
+    VERSION = 1
+
+    def __init__(self, path: Path, fingerprint: str):
+        self.path = Path(path)
+        self.fingerprint = fingerprint
+        self.entries: dict[str, dict] = {}
+        self._load()
+
+    def _load(self) -> None:
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except json.JSONDecodeError:
+            print(f"  ⚠ Ignoring unreadable manifest: {self.path}")
+            return
+
+        if data.get("version") != self.VERSION or data.get("fingerprint") != self.fingerprint:
+            print("  Extraction prompt or model changed since the last run - re-extracting all files")
+            return
+        self.entries = data.get("files", {})
+
+    def get(self, file_hash: str) -> Optional[dict]:
+        """Entry for a file hash: {file_path, category_hint, content_key, result}, or None."""
+        return self.entries.get(file_hash)
+
+    def put(
+        self,
+        file_hash: str,
+        file_path: str,
+        category_hint: Optional[str],
+        result: dict,
+        content_key: Optional[str] = None
+    ) -> None:
+        """
+        Record a file's extraction result.
+
+        content_key is the hash of the text that was sent for extraction, so a
+        later upload of the same document saved differently can be recognised.
+        """
+        self.entries[file_hash] = {
+            "file_path": file_path,
+            "category_hint": category_hint,
+            "content_key": content_key,
+            "result": result
+        }
+
+    def remove(self, file_hash: str) -> Optional[dict]:
+        return self.entries.pop(file_hash, None)
+
+    def hashes(self) -> set:
+        return set(self.entries)
+
+    def save(self) -> None:
+        """Write the manifest atomically (temp file + rename)."""
+        tmp = self.path.with_suffix(".tmp")
+        with open(tmp, 'w') as f:
+            json.dump({
+                "version": self.VERSION,
+                "fingerprint": self.fingerprint,
+                "files": self.entries
+            }, f, indent=2, default=str)
+        os.replace(tmp, self.path)
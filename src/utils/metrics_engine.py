@@ -0,0 +1,396 @@
+"""
+Metrics Engine - every numeric section of the audit, computed locally.
+
+Claude used to receive a short text summary and work out the effective rate,
+margins, job-type and customer breakdowns and seasonality itself. Those are
+arithmetic, so they are computed here with vectorised pandas over the whole
+transaction table plus the BenchmarkEngine. Claude gets the figures as final
+and writes only the narrative and recommendations around them. The figures
+are also the same on every rerun of the same data.
+
+compute_metrics() returns dicts shaped like the matching AnalysisResult
+sections; overlay_metrics() lays them over Claude's JSON so the computed
+numbers always win.
+"""
+
+import re
+from typing import Any, Dict, Optional
+
+import pandas as pd
+
+from src.utils.transaction_table import transaction_dates, type_view
+
+
+# Share of working hours that are billable, when there are no timesheets ("55-60%")
+BILLABLE_RATIO = 0.6
+WORKING_WEEKS = 48
+WEEKS_PER_MONTH = 52 / 12
+
+# Fewer days of data than this can't be annualised - it's treated as a year
+MIN_DAYS_TO_ANNUALISE = 28
+
+# Intake form answers (src/audit_form.py) as numbers
+LEADS_PER_WEEK = {"1-3": 2, "4-7": 5.5, "8-15": 11.5, "15+": 18}
+QUOTES_PER_MONTH = {"Under 10": 6, "10-20": 15, "20-40": 30, "40+": 45}
+QUOTE_MINUTES = {"5-10 minutes": 7.5, "15-30 minutes": 22.5, "30-60 minutes": 45, "Over an hour": 75}
+CALLOUT_FEES = {"No call-out fee": 0, "Yes - under $80": 60, "Yes - $80 to $120": 100, "Yes - over $120": 140}
+
+# Price increase acceptance for a call-out fee, and the lift used for the conversion scenario
+CALLOUT_ACCEPTANCE = 0.85
+CONVERSION_LIFT_POINTS = 10
+
+# Revenue statuses that mean the money hasn't arrived
+OUTSTANDING_STATUSES = {"unpaid", "overdue", "outstanding", "sent", "pending", "due"}
+
+TOP_CUSTOMERS = 10
+
+
+def _answer(value: Any, table: dict) -> Optional[float]:
+    """An intake answer as a number: the table's value, else the midpoint of any numbers in it."""
+    if value in table:
+        return table[value]
+    numbers = [float(n) for n in re.findall(r'\d+(?:\.\d+)?', str(value or ""))]
+    return sum(numbers[:2]) / len(numbers[:2]) if numbers else None
+
+
+def _money(value: float) -> float:
+    return round(float(value), 2)
+
+
+def _period(table: pd.DataFrame) -> dict:
+    """Date range of the data and the factor that scales it to a year."""
+    dates = transaction_dates(table).dropna()
+    if dates.empty:
+        return {"start": None, "end": None, "days": 0, "annual_factor": 1.0,
+                "method": "No dates found - figures treated as one year"}
+    start, end = dates.min(), dates.max()
+    days = (end - start).days + 1
+    if days < MIN_DAYS_TO_ANNUALISE:
+        factor, method = 1.0, f"Only {days} days of data - figures treated as one year"
+    else:
+        factor, method = 365 / days, f"{days} days of data scaled to 365 days"
+    return {"start": start.strftime("%Y-%m-%d"), "end": end.strftime("%Y-%m-%d"), "days": days,
+            "annual_factor": factor, "method": method}
+
+
+def _job_analysis(revenue: pd.DataFrame, total_revenue: float) -> list[dict]:
+    by_category = (
+        revenue.groupby("category", observed=True)["amount"]
+        .agg(job_count="count", total_revenue="sum", avg_revenue="mean",
+             smallest_job="min", largest_job="max")
+        .sort_values("total_revenue", ascending=False)
+    )
+    return [
+        {
+            "category": str(row.Index),
+            "job_count": int(row.job_count),
+            "total_revenue": _money(row.total_revenue),
+            "avg_revenue": _money(row.avg_revenue),
+            "smallest_job": _money(row.smallest_job),
+            "largest_job": _money(row.largest_job),
+            "revenue_share": round(row.total_revenue / total_revenue * 100, 1) if total_revenue else 0.0
+        }
+        for row in by_category.itertuples()
+    ]
+
+
+def _customer_analysis(revenue: pd.DataFrame, total_revenue: float) -> dict:
+    named = revenue[revenue["customer_or_vendor"] != "Unknown"]
+    by_customer = (
+        named.groupby("customer_or_vendor", observed=True)["amount"]
+        .agg(job_count="count", total_revenue="sum")
+        .sort_values("total_revenue", ascending=False)
+    )
+    shares = by_customer["total_revenue"] / total_revenue * 100 if total_revenue else by_customer["total_revenue"] * 0
+
+    top_customers = [
+        {
+            "name": str(row.Index),
+            "total_revenue": _money(row.total_revenue),
+            "job_count": int(row.job_count),
+            "avg_job_size": _money(row.total_revenue / row.job_count),
+            "revenue_share": round(float(shares.iloc[i]), 1)
+        }
+        for i, row in enumerate(by_customer.head(TOP_CUSTOMERS).itertuples())
+    ]
+    return {
+        "top_customers": top_customers,
+        "concentration": {
+            "customer_count": int(len(by_customer)),
+            "repeat_customers": int((by_customer["job_count"] >= 2).sum()),
+            "top_customer_share": round(float(shares.iloc[0]), 1) if len(shares) else 0.0,
+            "top_2_share": round(float(shares.head(2).sum()), 1),
+            "top_5_share": round(float(shares.head(5).sum()), 1),
+            "over_30pct_from_one_customer": bool(len(shares) and shares.iloc[0] > 30)
+        }
+    }
+
+
+def _cash_flow(table: pd.DataFrame, revenue: pd.DataFrame, expenses: pd.DataFrame) -> dict:
+    dates = transaction_dates(table)
+    months = dates.dt.to_period("M")
+
+    monthly = pd.DataFrame({
+        "revenue": revenue["amount"].groupby(months.loc[revenue.index]).sum(),
+        "expenses": expenses["amount"].groupby(months.loc[expenses.index]).sum()
+    }).fillna(0.0).sort_index()
+    monthly["net"] = monthly["revenue"] - monthly["expenses"]
+
+    outstanding = revenue[revenue["status"].astype(str).str.lower().isin(OUTSTANDING_STATUSES)]
+    by_revenue = monthly.sort_values("revenue", ascending=False)
+    label = lambda period: period.strftime("%b %Y")
+
+    return {
+        "monthly": [
+            {"month": label(period), "revenue": _money(row.revenue), "expenses": _money(row.expenses),
+             "net": _money(row.net)}
+            for period, row in zip(monthly.index, monthly.itertuples())
+        ],
+        "peak_months": [label(p) for p in by_revenue.index[:3]] if len(monthly) >= 3 else [],
+        "slow_months": [label(p) for p in by_revenue.index[::-1][:3]] if len(monthly) >= 3 else [],
+        "months_expenses_exceeded_revenue": [label(p) for p in monthly.index[monthly["net"] < 0]],
+        "outstanding_invoices": {
+            "count": int(len(outstanding)),
+            "amount": _money(outstanding["amount"].sum())
+        }
+    }
+
+
+def _expense_figures(expenses: pd.DataFrame, total_revenue: float) -> dict:
+    total = float(expenses["amount"].sum())
+    by_category = (
+        expenses.groupby("category", observed=True)["amount"]
+        .agg(count="count", total="sum")
+        .sort_values("total", ascending=False)
+    )
+    materials = float(by_category.loc[by_category.index.astype(str).str.contains("material"), "total"].sum())
+    return {
+        "by_category": [
+            {"category": str(category), "count": int(count), "total": _money(cat_total),
+             "share_of_expenses": round(cat_total / total * 100, 1) if total else 0.0}
+            for category, count, cat_total in zip(by_category.index, by_category["count"], by_category["total"])
+        ],
+        "materials_total": _money(materials),
+        "materials_to_revenue_pct": round(materials / total_revenue * 100, 1) if total_revenue else None
+    }
+
+
+def compute_metrics(table: pd.DataFrame, context, engine) -> Dict[str, Any]:
+    """
+    Compute every numeric audit figure from the transactions and benchmarks.
+
+    Args:
+        table: Transaction table (see src/utils/transaction_table.py)
+        context: BusinessContext from the intake form
+        engine: BenchmarkEngine
+
+    Returns:
+        Dict of AnalysisResult sections (summary, pricing_audit, job_analysis,
+        customer_analysis, cash_flow_insights, expense_insights,
+        time_analysis, lead_conversion_analysis, quoting_process_analysis,
+        growth_roadmap, methodology) holding only computed fields
+    """
+    revenue = type_view(table, "revenue")
+    expenses = type_view(table, "expense")
+    total_revenue = float(revenue["amount"].sum())
+    total_expenses = float(expenses["amount"].sum())
+    gross_profit = total_revenue - total_expenses
+
+    period = _period(table)
+    factor = period["annual_factor"]
+    annual_revenue = total_revenue * factor
+    annual_jobs = max(round(len(revenue) * factor), 1)
+    avg_job_value = total_revenue / len(revenue) if len(revenue) else 0.0
+
+    # Effective rate: revenue over the billable hours worked in the same period
+    billable_hours = context.hours_per_week * WORKING_WEEKS * BILLABLE_RATIO
+    effective_rate = annual_revenue / billable_hours if billable_hours else 0.0
+    rate_calculation = (
+        f"Annual revenue (${annual_revenue:,.0f}) ÷ estimated billable hours ({billable_hours:,.0f}: "
+        f"{context.hours_per_week} hrs/week × {WORKING_WEEKS} weeks × {BILLABLE_RATIO:.0%} billable) "
+        f"= ${effective_rate:,.2f}/hr"
+    )
+
+    # Market position and the rate increase, via the benchmark engine
+    hourly = engine.get_hourly_rate(context.trade_type, context.location)
+    market_min = hourly.get("min") or 0
+    market_max = hourly.get("max") or 0
+    market_mid = hourly.get("average") or (market_min + market_max) / 2
+    market_premium = hourly.get("premium") or market_max * 1.15
+    percentile = engine.calculate_rate_percentile(context.current_rate, context.trade_type, context.location)
+    rate_gap = market_mid - effective_rate
+
+    recommended_rate = max(context.current_rate, round(market_mid))
+    scenarios = {}
+    if recommended_rate > context.current_rate > 0:
+        opportunity = engine.calculate_opportunity(
+            current_rate=context.current_rate,
+            target_rate=recommended_rate,
+            annual_jobs=annual_jobs,
+            avg_hours_per_job=round(billable_hours / annual_jobs, 2),
+            trade=context.trade_type,
+            location=context.location
+        )
+        scenarios = {
+            name: {
+                "customer_retention": scenario["customer_retention"],
+                "annual_impact": _money(scenario["impact"]),
+                "calculation": (f"(${recommended_rate} - ${context.current_rate}) × {billable_hours:,.0f} hrs "
+                                f"× {scenario['customer_retention']:.0%} retention = ${scenario['impact']:,.0f}")
+            }
+            for name, scenario in opportunity["scenarios"].items()
+        }
+    rate_increase_impact = scenarios.get("conservative", {}).get("annual_impact", 0.0)
+
+    # Call-out fee
+    callout = engine.get_call_out_fee(context.trade_type)
+    current_fee = _answer(context.callout_fee, CALLOUT_FEES) or 0
+    recommended_fee = max(current_fee, callout.get("average") or 0)
+    callout_impact = annual_jobs * (recommended_fee - current_fee) * CALLOUT_ACCEPTANCE
+
+    # Intake answers costed at the data's figures
+    leads = _answer(context.leads_per_week, LEADS_PER_WEEK)
+    lead_conversion = {"stated_conversion_rate": context.close_rate}
+    if leads is not None:
+        extra_jobs_monthly = leads * CONVERSION_LIFT_POINTS / 100 * WEEKS_PER_MONTH
+        lead_conversion.update({
+            "leads_per_week": leads,
+            "current_jobs_per_week": round(leads * context.close_rate / 100, 1),
+            "if_improved_by_10pct": {
+                "additional_jobs_monthly": round(extra_jobs_monthly, 1),
+                "additional_revenue_monthly": _money(extra_jobs_monthly * avg_job_value),
+                "annual_impact": _money(extra_jobs_monthly * avg_job_value * 12)
+            }
+        })
+
+    quoting = {}
+    quotes = _answer(context.quotes_per_month, QUOTES_PER_MONTH)
+    minutes = _answer(context.quote_time, QUOTE_MINUTES)
+    if quotes is not None and minutes is not None:
+        hours_per_month = quotes * minutes / 60
+        annual_cost = hours_per_month * 12 * context.current_rate
+        quoting = {
+            "quotes_per_month": quotes,
+            "admin_cost_calculation": {
+                "hours_per_month": round(hours_per_month, 1),
+                "at_billable_rate": context.current_rate,
+                "annual_cost": _money(annual_cost),
+                "percentage_of_revenue": round(annual_cost / annual_revenue * 100, 1) if annual_revenue else None
+            }
+        }
+
+    market_range = f"${market_min:,.0f}-${market_max:,.0f}/hr"
+
+    return {
+        "summary": {
+            "total_revenue_analyzed": _money(total_revenue),
+            "total_expenses_analyzed": _money(total_expenses),
+            "gross_profit": _money(gross_profit),
+            "gross_margin": round(gross_profit / total_revenue * 100, 1) if total_revenue else 0.0,
+            "profit_margin": round(gross_profit / total_revenue, 4) if total_revenue else 0.0,
+            "annualised_revenue": _money(annual_revenue),
+            "total_jobs": int(len(revenue)),
+            "calculated_effective_rate": _money(effective_rate),
+            "effective_hourly_rate": _money(effective_rate),
+            "effective_rate_calculation": rate_calculation,
+            "market_rate_range": market_range,
+            "rate_gap": _money(rate_gap),
+            "rate_gap_percentage": round(rate_gap / market_mid * 100, 1) if market_mid else 0.0
+        },
+        "pricing_audit": {
+            "current_stated_rate": context.current_rate,
+            "current_effective_rate": _money(effective_rate),
+            "effective_rate_calculation": {
+                "total_revenue": _money(annual_revenue),
+                "estimated_hours": round(billable_hours),
+                "hours_estimation_method": (f"assumed {BILLABLE_RATIO:.0%} of {context.hours_per_week} "
+                                            f"hrs/week billable over {WORKING_WEEKS} weeks"),
+                "calculation": rate_calculation,
+                "confidence": "MEDIUM" if period["days"] >= MIN_DAYS_TO_ANNUALISE else "LOW",
+                "confidence_reason": f"Hours assumed (no timesheets); {period['method']}"
+            },
+            "market_benchmark": {
+                "min": market_min,
+                "average": market_mid,
+                "max": market_max,
+                "premium": round(market_premium),
+                "source": hourly.get("source", "service.com.au + industry associations"),
+                "confidence": hourly.get("confidence", "MEDIUM")
+            },
+            "rate_percentile": percentile["percentile"],
+            "rate_percentile_description": f"at the {percentile['percentile']}th percentile - {percentile['description']}",
+            "recommended_rate": recommended_rate,
+            "rate_increase_scenarios": scenarios,
+            "call_out_fee_analysis": {
+                "current_fee": current_fee,
+                "market_benchmark": callout.get("average"),
+                "recommended_fee": recommended_fee,
+                "annual_jobs_estimated": annual_jobs,
+                "annual_impact_conservative": _money(callout_impact),
+                "calculation": (f"Jobs ({annual_jobs}) × fee increase (${recommended_fee - current_fee:,.0f}) "
+                                f"× acceptance ({CALLOUT_ACCEPTANCE:.0%}) = ${callout_impact:,.0f}")
+            },
+            # Flat fields the report template reads
+            "market_low": market_min,
+            "market_mid": market_mid,
+            "market_high": market_max,
+            "rate_increase_impact": rate_increase_impact,
+            "call_out_fee_current": current_fee,
+            "call_out_fee_recommended": recommended_fee,
+            "call_out_impact": _money(callout_impact)
+        },
+        "job_analysis": _job_analysis(revenue, total_revenue),
+        "customer_analysis": _customer_analysis(revenue, total_revenue),
+        "cash_flow_insights": _cash_flow(table, revenue, expenses),
+        "expense_insights": _expense_figures(expenses, total_revenue),
+        "time_analysis": {
+            "billable_percentage": BILLABLE_RATIO * 100,
+            "estimated_billable_hours": round(billable_hours),
+            "hours_implied_by_revenue_at_stated_rate": (
+                round(annual_revenue / context.current_rate) if context.current_rate else None
+            )
+        },
+        "lead_conversion_analysis": lead_conversion,
+        "quoting_process_analysis": quoting,
+        "growth_roadmap": {
+            "current_revenue_estimate": _money(annual_revenue),
+            "gap_to_goal": _money(max(context.revenue_goal - annual_revenue, 0))
+        },
+        "methodology": {
+            "data_analyzed": {
+                "invoices_count": int(len(revenue)),
+                "date_range": f"{period['start']} - {period['end']}" if period["start"] else "unknown",
+                "days_covered": period["days"],
+                "annualisation": period["method"],
+                "total_revenue": _money(total_revenue),
+                "total_expenses": _money(total_expenses)
+            }
+        }
+    }
+
+
+def _overlay_list(generated: list, computed: list, key: str) -> list:
+    """Computed entries (matched to Claude's on key) first, then any extra entries Claude added."""
+    by_key = {str(item.get(key)): item for item in generated if isinstance(item, dict)}
+    merged = [overlay_metrics(by_key.pop(str(item[key]), {}), item) for item in computed]
+    return merged + [item for item in generated if isinstance(item, dict) and str(item.get(key)) in by_key]
+
+
+def overlay_metrics(analysis: dict, metrics: dict) -> dict:
+    """
+    Claude's analysis JSON with every computed figure laid over it.
+
+    Dicts merge recursively; lists of job types or customers match on
+    category/name, so Claude's verdicts and recommendations stay attached.
+    """
+    merged = dict(analysis)
+    for key, value in metrics.items():
+        current = merged.get(key)
+        if isinstance(value, dict) and isinstance(current, dict):
+            merged[key] = overlay_metrics(current, value)
+        elif isinstance(value, list) and isinstance(current, list) and value and isinstance(value[0], dict):
+            match_on = "category" if "category" in value[0] else "name" if "name" in value[0] else None
+            merged[key] = _overlay_list(current, value, match_on) if match_on else value
+        else:
+            merged[key] = value
+    return merged
@@ -0,0 +1,73 @@
+"""
+Packing small documents into shared extraction calls.
+
+A one-page invoice is a few hundred tokens, but extracting it alone still
+costs a full round trip plus the fixed prompt overhead. Small documents are
+grouped into one request, each wrapped in numbered delimiters, and the
+response (one entry per document id) is split back into per-file results.
+
+A pack is bounded on both sides: its combined content must fit the input
+budget, and its predicted transactions must fit comfortably in one response,
+since a response cut off at max_tokens would lose the documents at the end.
+"""
+
+from typing import Hashable
+
+
+def document_id(index: int) -> str:
+    """Delimiter id for the index-th document of a pack (D1, D2, ...)."""
+    return f"D{index + 1}"
+
+
+def pack_content(documents: list[tuple[str, str, str]]) -> str:
+    """
+    Wrap each document in start/end delimiters.
+
+    Args:
+        documents: (file name, content, note lines about the document) per
+            document, in pack order
+    """
+    blocks = []
+    for i, (name, content, note) in enumerate(documents):
+        doc_id = document_id(i)
+        blocks.append(
+            f"=== DOCUMENT {doc_id}: {name} ===\n{note}{content}\n=== END DOCUMENT {doc_id} ==="
+        )
+    return "\n\n".join(blocks)
+
+
+def plan_packs(
+    items: list[tuple[Hashable, int, int]],
+    max_input_tokens: int,
+    max_output_tokens: int,
+    max_documents: int
+) -> list[list[Hashable]]:
+    """
+    Group documents into as few packs as fit the budgets (first-fit decreasing).
+
+    Args:
+        items: (key, input tokens, predicted output tokens) per document
+        max_input_tokens: Content budget per pack
+        max_output_tokens: Predicted response budget per pack
+        max_documents: Most documents in one pack
+
+    Returns:
+        Lists of keys, each in the order the items were given. Documents that
+        fit nowhere else end up in a pack of their own.
+    """
+    order = {key: i for i, (key, _, _) in enumerate(items)}
+    packs = []  # [input used, output used, keys]
+    for key, input_tokens, output_tokens in sorted(items, key=lambda item: -item[1]):
+        for pack in packs:
+            if (len(pack[2]) < max_documents
+                    and pack[0] + input_tokens <= max_input_tokens
+                    and pack[1] + output_tokens <= max_output_tokens):
+                pack[0] += input_tokens
+                pack[1] += output_tokens
+                pack[2].append(key)
+                break
+        else:
+            packs.append([input_tokens, output_tokens, [key]])
+
+    grouped = [sorted(keys, key=order.get) for _, _, keys in packs]
+    return sorted(grouped, key=lambda keys: order[keys[0]])
@@ -0,0 +1,275 @@
+"""
+Page-parallel PDF parsing with per-page result caching.
+
+Page text comes from pypdf, which is much faster than pdfplumber. pdfplumber's
+table extraction (the expensive part) only runs on pages that draw ruling lines
+or cell rectangles, since its default table finder needs those to find a grid
+anyway. Where a table is found, the text lines it already covers are dropped so
+the same numbers aren't sent to Claude twice.
+
+Pages are parsed across a process pool and each page's output is cached under
+a fingerprint of the page itself (its content stream plus the images/forms and
+font maps it uses), so re-uploads and reruns skip parsing entirely - even when
+the page turns up inside a different file.
+"""
+
+import hashlib
+import os
+import re
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Optional
+
+try:
+    import pdfplumber
+except ImportError:
+    pdfplumber = None
+
+try:
+    from pypdf import PdfReader
+except ImportError:
+    PdfReader = None
+
+from src.utils.cache import DiskCache, make_cache_key
+
+
+# Bump when page parsing output changes, so stale cached pages aren't reused
+PDF_PARSER_VERSION = "2"
+
+# Below this many pages to parse, pool overhead outweighs the parallelism
+MIN_PAGES_FOR_POOL = 4
+
+# Path operators that draw table rulings: rectangles ("re") and line segments ("l")
+RULING_OPERATOR = re.compile(rb'(?<![A-Za-z])(?:re|l)(?![A-Za-z])')
+
+# A grid needs a few rulings; one or two are usually a border or an underline
+MIN_RULING_OPERATORS = 4
+
+# Singleton pool, shared by every extraction thread and sized once per process
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def pool_workers() -> int:
+    """Process pool size: PDF_PARSE_WORKERS, or one worker per CPU if unset or 0."""
+    return int(os.getenv("PDF_PARSE_WORKERS", "0")) or os.cpu_count() or 1
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    """Get the process-wide parsing pool, created on first use and never shut down mid-run."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=pool_workers())
+        return _pool
+
+
+def _stream_bytes(obj) -> bytes:
+    try:
+        return obj.get_object().get_data()
+    except Exception:
+        return b""
+
+
+def _page_fingerprint(page) -> str:
+    """Hash everything that determines a page's extracted text and tables."""
+    hasher = hashlib.sha256()
+
+    contents = page.get_contents()
+    if contents is not None:
+        hasher.update(contents.get_data())
+    hasher.update(str(page.mediabox).encode())
+
+    resources = page.get("/Resources")
+    resources = resources.get_object() if resources is not None else {}
+
+    # Form XObjects can hold the page's real text; images make scans differ
+    xobjects = resources.get("/XObject")
+    if xobjects is not None:
+        for name, ref in sorted(xobjects.get_object().items()):
+            hasher.update(name.encode())
+            hasher.update(_stream_bytes(ref))
+
+    # Font encodings decide how glyph codes map back to characters
+    fonts = resources.get("/Font")
+    if fonts is not None:
+        for name, ref in sorted(fonts.get_object().items()):
+            font = ref.get_object()
+            hasher.update(f"{name}:{font.get('/BaseFont')}".encode())
+            if "/ToUnicode" in font:
+                hasher.update(_stream_bytes(font["/ToUnicode"]))
+
+    return hasher.hexdigest()
+
+
+def page_fingerprints(path: Path, file_hash: str) -> list[str]:
+    """
+    Fingerprint every page of a PDF.
+
+    Falls back to file hash + page number if pypdf is unavailable or can't read
+    the file (still correct, just no cross-file reuse).
+    """
+    if PdfReader is not None:
+        try:
+            reader = PdfReader(str(path))
+            return [_page_fingerprint(page) for page in reader.pages]
+        except Exception:
+            pass
+
+    with pdfplumber.open(path) as pdf:
+        page_count = len(pdf.pages)
+    return [make_cache_key(file_hash, i) for i in range(page_count)]
+
+
+def has_ruling_lines(page) -> bool:
+    """Cheap check (no layout analysis) for whether a pypdf page draws a grid."""
+    try:
+        contents = page.get_contents()
+    except Exception:
+        return True  # Can't tell - let pdfplumber decide
+    if contents is None:
+        return False
+    return len(RULING_OPERATOR.findall(contents.get_data())) >= MIN_RULING_OPERATORS
+
+
+def _table_text(table: list[list]) -> str:
+    return "\n".join(["\t".join([str(cell) if cell else "" for cell in row]) for row in table])
+
+
+def remove_table_lines(text: str, tables: list[list[list]]) -> str:
+    """
+    Drop text lines that repeat a table row.
+
+    A line is a repeat if every word in it appears in the same table row, which
+    tolerates the different spacing and cell order pypdf and pdfplumber produce.
+    """
+    row_tokens = []
+    for table in tables:
+        for row in table:
+            tokens = set(" ".join(str(cell) for cell in row if cell).split())
+            if tokens:
+                row_tokens.append(tokens)
+    if not row_tokens:
+        return text
+
+    kept = []
+    for line in text.splitlines():
+        tokens = line.split()
+        if tokens and any(set(tokens) <= row for row in row_tokens):
+            continue
+        kept.append(line)
+    return "\n".join(kept)
+
+
+def _parse_pages(path: str, page_indexes: list[int]) -> list[dict]:
+    """Parse a batch of pages. Runs in a worker process, so it opens the PDF itself."""
+    reader = None
+    if PdfReader is not None:
+        try:
+            reader = PdfReader(path)
+        except Exception:
+            pass  # pdfplumber reads everything instead
+    plumber_pdf = None
+
+    results = []
+    try:
+        for index in page_indexes:
+            started = time.perf_counter()
+            text = ""
+            table_page = True
+            if reader is not None:
+                page = reader.pages[index]
+                try:
+                    text = page.extract_text() or ""
+                except Exception:
+                    text = ""
+                table_page = has_ruling_lines(page)
+
+            needs_plumber = pdfplumber is not None and (table_page or not text.strip())
+            tables = []
+            if needs_plumber:
+                if plumber_pdf is None:
+                    plumber_pdf = pdfplumber.open(path)
+                plumber_page = plumber_pdf.pages[index]
+                # pypdf couldn't read the text (odd encodings) - use pdfplumber's
+                if not text.strip():
+                    text = plumber_page.extract_text() or ""
+                if table_page:
+                    tables = [table for table in plumber_page.extract_tables() if table]
+                    text = remove_table_lines(text, tables)
+
+            results.append({
+                "index": index,
+                "text": text,
+                "tables": [_table_text(table) for table in tables],
+                "table_page": table_page,
+                "seconds": time.perf_counter() - started
+            })
+    finally:
+        if plumber_pdf is not None:
+            plumber_pdf.close()
+    return results
+
+
+def read_pdf_pages(
+    path: Path,
+    file_hash: str,
+    cache: Optional[DiskCache] = None
+) -> list[dict]:
+    """
+    Parse every page of a PDF, using cached pages where possible.
+
+    Args:
+        path: PDF to parse
+        file_hash: Content hash of the file (fallback fingerprint)
+        cache: Page cache, or None to always parse
+
+    Returns:
+        One dict per page, in order, with:
+        - page: 1-based page number
+        - text / tables: extracted content (text excludes lines repeated in tables)
+        - table_page: whether the page was checked for tables
+        - seconds: parse time (0 for cache hits)
+        - cached: whether the page came from the cache
+    """
+    if pdfplumber is None and PdfReader is None:
+        raise ImportError("pypdf or pdfplumber required for PDF processing. Run: pip install pypdf pdfplumber")
+
+    fingerprints = page_fingerprints(path, file_hash)
+    keys = [make_cache_key(fp, PDF_PARSER_VERSION) for fp in fingerprints]
+
+    pages: list[Optional[dict]] = [None] * len(keys)
+    if cache:
+        for i, key in enumerate(keys):
+            cached = cache.get(key)
+            if cached is not None:
+                pages[i] = {**cached, "seconds": 0.0, "cached": True}
+
+    todo = [i for i, page in enumerate(pages) if page is None]
+    if todo:
+        workers = pool_workers()
+        if len(todo) < MIN_PAGES_FOR_POOL or workers == 1:
+            parsed = _parse_pages(str(path), todo)
+        else:
+            # Several small contiguous batches per worker keeps the load even
+            # without reopening the PDF for every page
+            batch_size = max(1, -(-len(todo) // (workers * 2)))
+            batches = [todo[i:i + batch_size] for i in range(0, len(todo), batch_size)]
+            pool = _get_pool()
+            parsed = []
+            for batch_result in pool.map(_parse_pages, [str(path)] * len(batches), batches):
+                parsed.extend(batch_result)
+
+        for result in parsed:
+            index = result.pop("index")
+            pages[index] = {**result, "cached": False}
+            if cache:
+                cache.set(keys[index], {
+                    "text": result["text"],
+                    "tables": result["tables"],
+                    "table_page": result["table_page"]
+                })
+
+    return [{"page": i + 1, **page} for i, page in enumerate(pages)]
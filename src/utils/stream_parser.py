@@ -0,0 +1,94 @@
+"""
+Incremental parsing of streamed extraction responses.
+
+Claude's extraction output is one JSON object with a "transactions" array.
+When the response is streamed, each transaction object can be parsed as soon
+as its closing brace arrives, instead of waiting for the whole response. That
+lets the UI show transactions live, and means a response cut off at max_tokens
+still yields every transaction that was completed before the cut.
+"""
+
+import json
+import re
+from typing import Optional
+
+
+ARRAY_START = re.compile(r'"transactions"\s*:\s*\[')
+DOCUMENT_TYPE = re.compile(r'"document_type"\s*:\s*"([^"]*)"')
+
+
+class TransactionStreamParser:
+    """
+    Pulls complete transaction objects out of a JSON response as text arrives.
+
+    Feed it text deltas in order; each call returns the transaction dicts that
+    were completed by that delta. Markdown fences and any prose around the JSON
+    are ignored, since scanning only starts at the "transactions" array.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self.transactions: list[dict] = []
+        self.finished = False  # Closing bracket of the array seen
+
+        self._pos = 0
+        self._started = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._object_start: Optional[int] = None
+
+    @property
+    def document_type(self) -> Optional[str]:
+        """document_type from the response, once it has streamed in."""
+        match = DOCUMENT_TYPE.search(self.text)
+        return match.group(1) if match else None
+
+    def feed(self, delta: str) -> list[dict]:
+        """Add a text delta and return any transactions it completed."""
+        self.text += delta
+        if self.finished:
+            return []
+
+        if not self._started:
+            match = ARRAY_START.search(self.text)
+            if not match:
+                return []
+            self._started = True
+            self._pos = match.end()
+
+        completed = []
+        text = self.text
+        for i in range(self._pos, len(text)):
+            char = text[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char in "{[":
+                if self._depth == 0:
+                    self._object_start = i
+                self._depth += 1
+            elif char in "}]":
+                if self._depth == 0:
+                    # End of the transactions array itself
+                    self.finished = True
+                    break
+                self._depth -= 1
+                if self._depth == 0 and self._object_start is not None:
+                    try:
+                        item = json.loads(text[self._object_start:i + 1])
+                    except json.JSONDecodeError:
+                        item = None
+                    if isinstance(item, dict):
+                        self.transactions.append(item)
+                        completed.append(item)
+                    self._object_start = None
+
+        self._pos = len(text)
+        return completed
@@ -0,0 +1,148 @@
+"""
+Compact, token-minimal serialisation of spreadsheets for the LLM.
+
+DataFrame.to_string() pads every cell to its column width and prints the
+index, which can double the input tokens on wide exports. This serialiser
+emits plain CSV rows instead and strips what carries no information:
+
+- all-empty rows and columns
+- repeated header rows (exports that reprint headers per page)
+- constant columns, stated once in a note line
+- long values repeated many times, replaced by short @codes with a legend
+
+Note and legend lines start with "#" and sit between the sheet marker and the
+column header, so the extractor repeats them on every chunk of a long sheet.
+"""
+
+import csv
+import io
+from typing import Optional
+
+import pandas as pd
+
+
+# Rough chars-per-token for English/number mixes - good enough for budgeting
+CHARS_PER_TOKEN = 4
+
+# Abbreviate a value only if it's long enough and common enough to be worth it
+MIN_ABBREVIATION_LENGTH = 12
+MIN_ABBREVIATION_COUNT = 3
+MAX_ABBREVIATIONS = 30
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap local estimate of how many tokens a string will use."""
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def _format_column(series: pd.Series) -> pd.Series:
+    """Render a column as trimmed strings, with blanks for missing values."""
+    if pd.api.types.is_datetime64_any_dtype(series):
+        has_time = (series.dropna().dt.normalize() != series.dropna()).any()
+        return series.dt.strftime('%Y-%m-%d %H:%M' if has_time else '%Y-%m-%d').fillna("")
+    if pd.api.types.is_float_dtype(series):
+        # 1250.0 -> "1250"
+        return series.astype(str).str.replace(r'\.0$', '', regex=True).replace("nan", "").fillna("")
+    return series.fillna("").astype(str).str.strip()
+
+
+def _to_string_chars(df: pd.DataFrame) -> int:
+    """Estimate len(df.to_string()) without building the string."""
+    if df.empty:
+        return len(str(list(df.columns)))
+    widths = [
+        max(len(str(col)), int(df[col].astype(str).str.len().fillna(3).max()))
+        for col in df.columns
+    ]
+    index_width = len(str(len(df)))
+    return (sum(widths) + 2 * len(widths) + index_width + 1) * (len(df) + 1)
+
+
+def serialize_table(df: pd.DataFrame, sheet_name: Optional[str] = None) -> tuple[str, dict]:
+    """
+    Serialise a DataFrame as compact CSV text.
+
+    Args:
+        df: Table to serialise
+        sheet_name: If given, output starts with a [SHEET: name] marker
+
+    Returns:
+        (text, stats) where stats reports what was removed and the estimated
+        token saving versus df.to_string()
+    """
+    baseline_tokens = _to_string_chars(df) // CHARS_PER_TOKEN + 1
+
+    text = df.dropna(how='all').apply(_format_column)
+    if text.empty:
+        text = pd.DataFrame(columns=df.columns)
+
+    # All-empty columns
+    non_empty = [i for i, col in enumerate(text.columns) if not text.iloc[:, i].eq("").all()]
+    empty_columns = len(text.columns) - len(non_empty)
+    text = text.iloc[:, non_empty]
+
+    header = ["" if str(c).startswith("Unnamed:") else str(c).strip() for c in text.columns]
+
+    # Header rows reprinted inside the data
+    is_header_row = (text.values == header).all(axis=1) if len(text) else []
+    header_rows = int(sum(is_header_row))
+    if header_rows:
+        text = text[~is_header_row]
+
+    # Constant columns - stated once instead of on every row
+    constants = {}
+    if len(text) > 1:
+        keep = []
+        for i, name in enumerate(header):
+            column = text.iloc[:, i]
+            if column.nunique() == 1:
+                constants[name or f"column {i + 1}"] = column.iloc[0]
+            else:
+                keep.append(i)
+        text = text.iloc[:, keep]
+        header = [header[i] for i in keep]
+
+    # Dictionary-encode long, frequently repeated values
+    abbreviations = {}
+    if not text.empty:
+        counts = pd.Series(text.values.ravel()).value_counts()
+        candidates = counts[
+            (counts.index.str.len() >= MIN_ABBREVIATION_LENGTH) & (counts >= MIN_ABBREVIATION_COUNT)
+        ]
+        # Rank by characters saved
+        saved = (candidates.index.str.len() - 3) * candidates
+        for value in saved.sort_values(ascending=False).index[:MAX_ABBREVIATIONS]:
+            abbreviations[value] = f"@{len(abbreviations) + 1}"
+        if abbreviations:
+            text = text.replace(abbreviations)
+
+    lines = []
+    if sheet_name is not None:
+        lines.append(f"[SHEET: {sheet_name}]")
+    if constants:
+        lines.append("# Same on every row: " + "; ".join(f"{k}={v}" for k, v in constants.items()))
+    if abbreviations:
+        lines.append(
+            "# Abbreviations (write the full value in your output): "
+            + "; ".join(f"{code}={value}" for value, code in abbreviations.items())
+        )
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow(header)
+    writer.writerows(text.values.tolist())
+    lines.append(buffer.getvalue().rstrip("\n"))
+
+    output = "\n".join(lines)
+    compact_tokens = estimate_tokens(output)
+
+    return output, {
+        "rows": len(text),
+        "empty_columns_dropped": empty_columns,
+        "constant_columns_dropped": len(constants),
+        "header_rows_collapsed": header_rows,
+        "values_abbreviated": len(abbreviations),
+        "baseline_tokens": baseline_tokens,
+        "compact_tokens": compact_tokens,
+        "tokens_saved": max(0, baseline_tokens - compact_tokens)
+    }
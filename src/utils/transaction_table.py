@@ -0,0 +1,159 @@
+"""
+Columnar transaction table - the canonical combined dataset for an audit.
+
+combine_results() used to model_dump() every Transaction into a dict and keep
+three lists of them (all, revenue, expense), and every consumer regrouped those
+lists in Python loops. The table holds one column per field instead, with
+categorical dtypes for the low-cardinality text columns (type, category,
+status, counterparty, source file), so a large ledger costs a few bytes per
+repeated value and every aggregation is a vectorised groupby.
+
+Rows are sorted by type, so revenue and expense are contiguous blocks and
+their views are plain slices of the table rather than filtered copies. Within
+each block, records linked as duplicates of another (duplicate_of >= 0, see
+src/utils/dedup.py) sort last, so the views can leave them out by slicing too.
+"""
+
+import hashlib
+import json
+from typing import Iterable
+
+import numpy as np
+import pandas as pd
+
+
+TABLE_COLUMNS = [
+    "date", "customer_or_vendor", "description", "amount", "type",
+    "category", "status", "confidence", "source_file", "line_items", "duplicate_of"
+]
+CATEGORICAL_COLUMNS = ["customer_or_vendor", "type", "category", "status", "confidence", "source_file"]
+
+# Row order of the type blocks; any other type sorts after these
+TYPE_ORDER = ["revenue", "expense"]
+
+
+def _finish(columns: dict[str, list]) -> pd.DataFrame:
+    """Apply dtypes and sort into type blocks."""
+    table = pd.DataFrame(columns, columns=TABLE_COLUMNS)
+    table["amount"] = pd.to_numeric(table["amount"], errors="coerce").fillna(0.0).astype("float64")
+    table["description"] = table["description"].fillna("").astype(str)
+    table["date"] = table["date"].fillna("unknown").astype(str)
+
+    for column in CATEGORICAL_COLUMNS:
+        values = table[column].fillna("unknown").astype(str)
+        if column == "type":
+            extra = sorted(set(values) - set(TYPE_ORDER))
+            table[column] = pd.Categorical(values, categories=TYPE_ORDER + extra)
+        else:
+            table[column] = values.astype("category")
+
+    table["duplicate_of"] = table["duplicate_of"].fillna(-1).astype("int64")
+
+    return sort_blocks(table.reset_index(drop=True))
+
+
+def sort_blocks(table: pd.DataFrame) -> pd.DataFrame:
+    """
+    Order rows by type, then kept records before linked duplicates.
+
+    Index labels are kept, since duplicate_of refers to them.
+    """
+    key = _block_key(table)
+    return table.iloc[np.argsort(key, kind="stable")]
+
+
+def _block_key(table: pd.DataFrame) -> np.ndarray:
+    """Per-row sort key: type code * 2, plus 1 for a linked duplicate."""
+    codes = table["type"].cat.codes.to_numpy().astype("int64")
+    return codes * 2 + (table["duplicate_of"].to_numpy() >= 0)
+
+
+def build_transaction_table(results: Iterable) -> pd.DataFrame:
+    """
+    Build the table straight from ExtractionResults, one column at a time.
+
+    Args:
+        results: ExtractionResult objects; each row's source_file is its result's file_path
+    """
+    columns = {name: [] for name in TABLE_COLUMNS}
+    for result in results:
+        for t in result.transactions:
+            columns["date"].append(t.date)
+            columns["customer_or_vendor"].append(t.customer_or_vendor)
+            columns["description"].append(t.description)
+            columns["amount"].append(t.amount)
+            columns["type"].append(t.type)
+            columns["category"].append(t.category)
+            columns["status"].append(t.status)
+            columns["confidence"].append(t.confidence)
+            columns["source_file"].append(result.file_path)
+            columns["line_items"].append(t.line_items)
+            columns["duplicate_of"].append(-1)
+    return _finish(columns)
+
+
+def table_from_records(records: list[dict]) -> pd.DataFrame:
+    """Build the table from transaction dicts (hand-written or older saved data)."""
+    return _finish({
+        name: [r.get(name, [] if name == "line_items" else -1 if name == "duplicate_of" else None) for r in records]
+        for name in TABLE_COLUMNS
+    })
+
+
+def type_view(table: pd.DataFrame, kind: str, include_duplicates: bool = False) -> pd.DataFrame:
+    """
+    Rows of one type as a slice of the table (no copy - the table is sorted by type).
+
+    Args:
+        table: Transaction table
+        kind: "revenue" or "expense"
+        include_duplicates: Also return records linked as duplicates of another
+    """
+    categories = table["type"].cat.categories
+    if kind not in categories:
+        return table.iloc[0:0]
+    code = 2 * categories.get_loc(kind)
+    start, end = np.searchsorted(_block_key(table), [code, code + (2 if include_duplicates else 1)])
+    return table.iloc[start:end]
+
+
+def transaction_dates(table: pd.DataFrame) -> pd.Series:
+    """The date column as datetimes: ISO first (what extraction produces), then day-first."""
+    dates = table["date"].astype(str)
+    parsed = pd.to_datetime(dates, format="ISO8601", errors="coerce")
+    rest = parsed.isna() & dates.ne("unknown")
+    if rest.any():
+        parsed[rest] = pd.to_datetime(dates[rest], format="mixed", dayfirst=True, errors="coerce")
+    return parsed
+
+
+def table_fingerprint(table: pd.DataFrame) -> str:
+    """
+    Content hash of the transactions, independent of row order and file paths.
+
+    The same documents extracted again (from another upload folder, or in a
+    different order) give the same fingerprint. Linked duplicates count only
+    as being linked, since their duplicate_of labels depend on row order.
+    """
+    content = table.drop(columns=["source_file", "duplicate_of"]).assign(
+        line_items=table["line_items"].map(lambda items: json.dumps(items or [], sort_keys=True, default=str)),
+        linked=table["duplicate_of"].to_numpy() >= 0
+    )
+    rows = pd.util.hash_pandas_object(content, index=False).to_numpy()
+    return hashlib.sha256(np.sort(rows).tobytes()).hexdigest()
+
+
+def as_transaction_table(data: dict) -> pd.DataFrame:
+    """
+    The transaction table from combine_results() output.
+
+    Also accepts the older shape, with plain lists of transaction dicts under
+    all_transactions or revenue_transactions/expense_transactions.
+    """
+    table = data.get("all_transactions")
+    if isinstance(table, pd.DataFrame):
+        if "duplicate_of" not in table:
+            table = sort_blocks(table.assign(duplicate_of=-1))
+        return table
+    records = table or (list(data.get("revenue_transactions", [])) + list(data.get("expense_transactions", [])))
+    return table_from_records(records)
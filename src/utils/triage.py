@@ -0,0 +1,133 @@
+"""
+Local document triage before any API spend.
+
+FileHandler._guess_category only sees the filename. Triage reads the content
+the extractor is about to send and classifies it as an invoice, quote, bank
+statement or expense receipt. It uses keyword evidence ("tax invoice",
+"opening balance", "valid for 30 days") and the layout: statements are mostly
+lines that start with a date and end in an amount. It also catches files not
+worth sending at all, such as empty sheets and scanned PDFs with no text layer.
+
+The classification steers extraction. Skipped kinds never reach Claude, bank
+statements are chunked smaller (every line is a transaction), and the kind is
+passed to Claude as a hint.
+"""
+
+import re
+from typing import Optional
+
+from pydantic import BaseModel
+
+
+# Evidence for each kind: (pattern, weight). Each pattern counts once per document.
+KIND_PATTERNS = {
+    "invoice": [
+        (r'\btax invoice\b', 3), (r'\binvoice\s*(no|number|#|date)\b', 2), (r'\bamount due\b', 2),
+        (r'\bbill(ed)? to\b', 1), (r'\bdue date\b', 1), (r'\bpayment terms\b', 1), (r'\binvoice\b', 1)
+    ],
+    "quote": [
+        (r'\bquotation\b', 3), (r'\bquote\s*(no|number|#|date)\b', 2), (r'\bvalid (for|until)\b', 2),
+        (r'\b(acceptance|accept this quote)\b', 2), (r'\bestimate\b', 1), (r'\bproposal\b', 1), (r'\bquote\b', 1)
+    ],
+    "bank_statement": [
+        (r'\bopening balance\b', 3), (r'\bclosing balance\b', 3), (r'\bstatement (period|begins|ends|from)\b', 2),
+        (r'\bbsb\b', 2), (r'\baccount (number|no)\b', 1), (r'\bdebits?\b.*\bcredits?\b', 1), (r'\bbalance\b', 1)
+    ],
+    "receipt": [
+        (r'\breceipt\b', 2), (r'\beftpos\b', 2), (r'\bthank you for (your )?(purchase|shopping)\b', 3),
+        (r'\b(amount|total) paid\b', 2), (r'\bchange\b', 1), (r'\bapproved\b', 1), (r'\bcash\b', 1)
+    ]
+}
+
+# A statement line: starts with a date, ends with an amount (optionally a balance after it)
+STATEMENT_LINE = re.compile(
+    r'^\s*\d{1,2}[/\-. ](\d{1,2}|[A-Za-z]{3})([/\-. ]\d{2,4})?\b.*\d[\d,]*\.\d{2}\s*(cr|dr)?\s*$',
+    re.IGNORECASE
+)
+
+# Reader markers and serialiser notes, which aren't document content
+MARKER_LINE = re.compile(r'^\s*(\[(PAGE \d+|SHEET: .*|/?TABLE)\]|#)')
+
+# Less real text than this in a PDF and there's nothing for Claude to read
+MIN_TEXT_CHARS = 20
+MIN_CHARS_PER_PDF_PAGE = 25
+
+# Kinds that are never sent for extraction
+SKIP_KINDS = {"empty", "unreadable_scan"}
+
+
+class Triage(BaseModel):
+    """What a document looks like, before extraction."""
+    kind: str  # "invoice", "quote", "bank_statement", "receipt", "empty", "unreadable_scan" or "unknown"
+    confidence: str = "low"  # "high", "medium" or "low"
+    reason: str = ""
+    scores: dict[str, int] = {}
+
+
+def _content_lines(content: str) -> list[str]:
+    return [line for line in content.splitlines() if line.strip() and not MARKER_LINE.match(line)]
+
+
+def triage_content(content: str, suffix: str) -> Triage:
+    """
+    Classify a document from the text the extractor would send.
+
+    Args:
+        content: Reader output ([PAGE n]/[SHEET: ...] sections)
+        suffix: File extension, e.g. ".pdf"
+    """
+    lines = _content_lines(content)
+    text_chars = sum(len(line.strip()) for line in lines)
+
+    if suffix.lower() == '.pdf':
+        pages = len(re.findall(r'^\[PAGE \d+\]', content, re.MULTILINE))
+        if pages and text_chars < MIN_CHARS_PER_PDF_PAGE * pages:
+            return Triage(
+                kind="unreadable_scan",
+                confidence="high",
+                reason=f"No text layer on {pages} page(s) - looks like a scan or photo, needs OCR or manual entry"
+            )
+        if text_chars < MIN_TEXT_CHARS:
+            return Triage(kind="empty", confidence="high", reason="No text found")
+    elif len(lines) <= 1:
+        # A sheet with at most a header row
+        return Triage(kind="empty", confidence="high", reason="No rows found")
+
+    text = "\n".join(lines).lower()
+    scores = {
+        kind: sum(weight for pattern, weight in patterns if re.search(pattern, text))
+        for kind, patterns in KIND_PATTERNS.items()
+    }
+
+    # Layout: a page of date ... amount lines is a statement (or a ledger export)
+    statement_lines = sum(1 for line in lines if STATEMENT_LINE.match(line))
+    if statement_lines >= 10 and statement_lines >= len(lines) * 0.4:
+        scores["bank_statement"] += 3
+    # Receipts are short
+    if scores["receipt"] and len(lines) <= 40:
+        scores["receipt"] += 1
+
+    ranked = sorted(scores.items(), key=lambda item: -item[1])
+    (best, best_score), (_, runner_up) = ranked[0], ranked[1]
+    if best_score < 2:
+        return Triage(kind="unknown", reason="No clear invoice, quote, statement or receipt markers", scores=scores)
+
+    confidence = "high" if best_score >= 2 * max(runner_up, 1) else "medium" if best_score > runner_up else "low"
+    return Triage(
+        kind=best,
+        confidence=confidence,
+        reason=f"{best.replace('_', ' ')} markers (score {best_score} vs {runner_up})",
+        scores=scores
+    )
+
+
+def document_note(category_hint: Optional[str], document_kind: Optional[str]) -> str:
+    """Prompt lines telling Claude what the customer and triage say a document is."""
+    note = ""
+    if category_hint and category_hint != "other":
+        note += f"NOTE: The customer uploaded this document as '{category_hint}'.\n"
+    if document_kind:
+        label = document_kind.replace("_", " ")
+        article = "an" if label[0] in "aeiou" else "a"
+        note += f"NOTE: A local pre-check classified this document as {article} {label}.\n"
+    return note
@@ -0,0 +1,77 @@
+"""
+Description normalisation and the shared vendor -> category memo.
+
+Bank lines for the same vendor differ only in noise: store numbers, card
+numbers, dates and references ("BUNNINGS 1234 ALEXANDRIA",
+"EFTPOS PURCHASE BUNNINGS 5521 ALEXANDRIA 02/03"). Normalising them first
+means each vendor is labelled once per audit, and the memo carries those
+labels over to every later audit, so repeat vendors cost nothing.
+"""
+
+import os
+import re
+from typing import Optional
+
+from src.utils.cache import DiskCache, make_cache_key
+
+
+# Bank-inserted prefixes that say how a payment was made, not who it was to
+PAYMENT_PREFIXES = re.compile(
+    r'^(eftpos( purchase)?|visa (debit )?purchase|debit card purchase|card purchase|'
+    r'purchase|pos( authority)?|direct debit|dd|osko payment|bpay|internet (banking )?transfer|'
+    r'online payment|payment to|sq \*|sp \*|pp\*)\s*',
+    re.IGNORECASE
+)
+
+# Card numbers, store/terminal numbers, dates, times and receipt references
+NOISE_PHRASES = re.compile(r'\b(card\s+[x*]*\d+|value date:?\s*\S+|ref(erence)?:?\s*\S*\d\S*|receipt\s+\S*\d\S*)',
+                           re.IGNORECASE)
+NOISE_TOKEN = re.compile(r'^([x*#]*\d[\d/\-.:]*)$', re.IGNORECASE)
+
+# Country/state codes banks append after the suburb
+LOCATION_CODES = {"AU", "AUS", "NSW", "VIC", "QLD", "WA", "SA", "TAS", "ACT", "NT"}
+
+
+def normalize_description(description: str) -> str:
+    """
+    Reduce a bank/ledger description to the part that identifies the vendor.
+
+    >>> normalize_description("EFTPOS PURCHASE BUNNINGS 1234 ALEXANDRIA AU 02/03")
+    'BUNNINGS ALEXANDRIA'
+    """
+    text = re.sub(r'[,;|]', ' ', str(description)).strip()
+    text = NOISE_PHRASES.sub(' ', PAYMENT_PREFIXES.sub('', text))
+    tokens = [t.upper() for t in text.split() if not NOISE_TOKEN.match(t)]
+    while tokens and tokens[-1] in LOCATION_CODES:
+        tokens.pop()
+    return " ".join(tokens) or str(description).strip().upper()
+
+
+class VendorMemo:
+    """
+    Persistent labels for normalised descriptions, shared by every audit.
+
+    Keyed on (normalised description, money in/out, prompt version), so a
+    changed categorisation prompt starts a fresh memo rather than reusing
+    labels it might now give differently.
+    """
+
+    def __init__(self, prompt_hash: str, cache: Optional[DiskCache] = None):
+        self.prompt_hash = prompt_hash
+        self.cache = cache or DiskCache(
+            "vendor_categories",
+            max_size_mb=float(os.getenv("VENDOR_MEMO_MAX_MB", "20"))
+        )
+
+    def _key(self, normalized: str, kind: str) -> str:
+        return make_cache_key(normalized, kind, self.prompt_hash)
+
+    def get(self, normalized: str, kind: str) -> Optional[dict]:
+        """{"counterparty", "category"} for a normalised description, or None."""
+        return self.cache.get(self._key(normalized, kind))
+
+    def put(self, normalized: str, kind: str, label: dict) -> None:
+        self.cache.set(self._key(normalized, kind), {
+            "counterparty": label.get("counterparty"),
+            "category": label["category"]
+        })
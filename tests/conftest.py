@@ -0,0 +1,67 @@
+"""
+Shared fixtures for the unit tests.
+
+No test here calls the API: agents get a fake client whose responses come
+from a function of the request, and every cache lives in a temp directory.
+"""
+
+import sys
+import threading
+import types
+from pathlib import Path
+
+import pytest
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+
+class FakeUsage:
+    """Token usage of a fake response."""
+    def __init__(self, input_tokens: int = 1000, output_tokens: int = 200):
+        self.input_tokens = input_tokens
+        self.output_tokens = output_tokens
+        self.cache_read_input_tokens = 0
+        self.cache_creation_input_tokens = 0
+
+
+class FakeMessages:
+    """Stands in for client.messages: create() answers with respond(request kwargs)."""
+    def __init__(self, respond):
+        self.respond = respond
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def create(self, **kwargs):
+        with self._lock:
+            self.calls.append(kwargs)
+        return types.SimpleNamespace(
+            content=[types.SimpleNamespace(text=self.respond(kwargs))],
+            usage=FakeUsage(),
+            stop_reason="end_turn"
+        )
+
+
+def request_text(request: dict) -> str:
+    """The user message of a request, whether sent as a string or as content blocks."""
+    content = request["messages"][0]["content"]
+    if isinstance(content, list):
+        return "".join(block["text"] for block in content)
+    return content
+
+
+@pytest.fixture(autouse=True)
+def isolated_env(tmp_path, monkeypatch):
+    """A dummy API key, and caches under the test's temp directory."""
+    monkeypatch.setenv("ANTHROPIC_API_KEY", "test-key")
+    monkeypatch.setenv("CACHE_DIR", str(tmp_path / "cache"))
+
+
+@pytest.fixture
+def fake_client():
+    """Replace an agent's client; returns its FakeMessages so tests can count calls."""
+    def install(agent, respond):
+        agent.client = types.SimpleNamespace(messages=FakeMessages(respond))
+        return agent.client.messages
+    return install
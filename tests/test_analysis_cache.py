@@ -0,0 +1,65 @@
+"""Analysis cache: reruns over the same documents reuse the cached analysis."""
+
+import json
+import re
+
+from src.agents.analyzer import Analyzer, BusinessContext
+from src.agents.data_extractor import DataExtractor
+from tests.conftest import request_text
+
+
+# Xero sales export without an account code column, so extraction pays for a categorisation call
+SALES_CSV = """*ContactName,*InvoiceNumber,*InvoiceDate,Description,*Quantity,LineAmount
+Smith,INV-1,2024-01-02,Switchboard upgrade,1,1200
+Jones,INV-2,2024-01-05,LED downlights x8,1,800
+Smith,INV-3,2024-02-09,Switchboard upgrade,1,1300
+"""
+
+# Analysis output keys whose value is a list
+LIST_KEYS = {"job_analysis", "worst_jobs", "action_plan", "backend_problems_identified"}
+
+
+def respond(request: dict) -> str:
+    """Categorisation labels for categorisation calls, each requested key for analysis sections."""
+    content = request_text(request)
+    lines = re.findall(r"^(\d+)\. \[\w+\] (.*)$", content, re.MULTILINE)
+    if lines:
+        return json.dumps({"labels": [
+            {"id": int(i), "counterparty": None, "category": "switchboard" if "Switch" in text else "lighting"}
+            for i, text in lines
+        ]})
+    keys = re.search(r"from the output format: (.*)", content)
+    section = {key: [] if key in LIST_KEYS else {} for key in keys.group(1).split(", ")} if keys else {}
+    return json.dumps({**section, "summary": {"biggest_insight": "Switchboards carry the business"}})
+
+
+def extract(folder, fake_client) -> dict:
+    extractor = DataExtractor(streaming=False)
+    fake_client(extractor, respond)
+    return extractor.combine_results(extractor.extract_from_folder(str(folder)))
+
+
+def test_second_analysis_of_reextracted_data_is_a_cache_hit(tmp_path, fake_client):
+    folder = tmp_path / "upload"
+    (folder / "invoices").mkdir(parents=True)
+    (folder / "invoices" / "sales.csv").write_text(SALES_CSV)
+    context = BusinessContext()
+
+    first = extract(folder, fake_client)
+    second = extract(folder, fake_client)
+    # The rerun is served from the extraction cache, so its cost fields differ
+    assert first["summary"]["total_extraction_cost"] > 0
+    assert second["summary"]["total_extraction_cost"] == 0
+
+    analyzer = Analyzer()
+    calls = fake_client(analyzer, respond)
+    result = analyzer.analyze(first, context)
+    assert calls.calls
+    assert result.api_cost > 0
+
+    analyzer = Analyzer()
+    calls = fake_client(analyzer, respond)
+    cached = analyzer.analyze(second, context)
+    assert calls.calls == []
+    assert cached.api_cost == 0
+    assert cached.summary == result.summary
@@ -0,0 +1,100 @@
+"""Sectioned analysis: shared prompt caching, keys a section leaves out, and its cost reserve."""
+
+import json
+import re
+
+from src.agents.analyzer import Analyzer, BusinessContext
+from src.agents.data_extractor import DataExtractor
+from src.templates.prompts import ANALYSIS_SECTIONS
+from src.utils.transaction_table import table_from_records
+from tests.conftest import request_text
+
+
+LIST_KEYS = {"job_analysis", "worst_jobs", "action_plan", "backend_problems_identified"}
+
+EXTRACTED = {
+    "all_transactions": table_from_records([
+        {"date": f"2024-0{month}-10", "customer_or_vendor": customer, "description": "Switchboard upgrade",
+         "amount": amount, "type": "revenue", "category": "switchboard", "status": "paid", "source_file": "a.csv"}
+        for month, customer, amount in [(1, "Smith", 1200), (2, "Jones", 800), (3, "Smith", 1500)]
+    ] + [
+        {"date": "2024-02-01", "customer_or_vendor": "Bunnings", "description": "Cable", "amount": 300,
+         "type": "expense", "category": "materials", "status": "paid", "source_file": "b.csv"}
+    ]),
+    "summary": {
+        "total_files_processed": 2, "total_transactions": 4, "duplicates_linked": 0, "revenue_count": 3,
+        "expense_count": 1, "total_revenue": 3500.0, "total_expenses": 300.0, "gross_profit": 3200.0
+    }
+}
+
+
+def section_response(omit: set = frozenset()):
+    """Answers each section with all of its keys except `omit`."""
+    def respond(request: dict) -> str:
+        keys = re.search(r"from the output format: (.*)", request_text(request))
+        if not keys:
+            return "{}"
+        return json.dumps({
+            key: [] if key in LIST_KEYS else {"note": "from Claude"}
+            for key in keys.group(1).split(", ") if key not in omit
+        })
+    return respond
+
+
+def test_sections_share_one_cached_prompt_block(fake_client):
+    analyzer = Analyzer(use_cache=False)
+    calls = fake_client(analyzer, section_response())
+    analyzer.analyze(EXTRACTED, BusinessContext())
+
+    # A one-token call writes the cache before the sections run
+    warm, sections = calls.calls[0], calls.calls[1:]
+    assert warm["max_tokens"] == 1
+    assert len(sections) == len(ANALYSIS_SECTIONS)
+
+    shared = warm["messages"][0]["content"][0]
+    assert shared["cache_control"] == {"type": "ephemeral"}
+    for call in sections:
+        content = call["messages"][0]["content"]
+        assert content[0] == shared
+        assert "cache_control" not in content[1]
+        assert "THIS REQUEST" in content[1]["text"]
+
+
+def test_single_worker_skips_the_warm_up(fake_client, monkeypatch):
+    monkeypatch.setenv("ANALYSIS_MAX_WORKERS", "1")
+    analyzer = Analyzer(use_cache=False)
+    calls = fake_client(analyzer, section_response())
+    analyzer.analyze(EXTRACTED, BusinessContext())
+    assert len(calls.calls) == len(ANALYSIS_SECTIONS)
+
+
+def test_keys_a_section_leaves_out_come_from_the_fallback_and_are_not_cached(fake_client):
+    analyzer = Analyzer()
+    calls = fake_client(analyzer, section_response(omit={"action_plan", "cash_flow_insights"}))
+    result = analyzer.analyze(EXTRACTED, BusinessContext())
+
+    assert result.action_plan
+    assert result.cash_flow_insights.get("note") != "from Claude"
+    assert result.data_quality == {"note": "from Claude"}
+
+    # An incomplete analysis is redone next time rather than served from the cache
+    analyzer = Analyzer()
+    calls = fake_client(analyzer, section_response())
+    analyzer.analyze(EXTRACTED, BusinessContext())
+    assert calls.calls
+
+
+def test_cost_reserve_follows_the_analysis_mode_and_grading(monkeypatch):
+    sectioned = Analyzer.cost_reserve()
+    assert Analyzer.cost_reserve(grade_customers=True) > sectioned
+
+    monkeypatch.setenv("ANALYSIS_SECTION_MAX_TOKENS", "4096")
+    assert Analyzer.cost_reserve() < sectioned
+
+    monkeypatch.setenv("ANALYSIS_MODE", "single")
+    assert Analyzer.cost_reserve() != sectioned
+
+    # The extractor holds back what the analyzer reserves, and nothing on its own
+    extractor = DataExtractor(analysis_cost_reserve=Analyzer.cost_reserve())
+    assert extractor.forecast_documents([]).analysis_cost == Analyzer.cost_reserve()
+    assert DataExtractor().forecast_documents([]).analysis_cost == 0.0
@@ -0,0 +1,73 @@
+"""Deterministic parsing of Australian bank statement CSVs."""
+
+import io
+
+import pandas as pd
+
+from src.utils.bank_parsers import detect_bank_profile, parse_bank_statement
+
+
+def read_csv(text: str) -> pd.DataFrame:
+    """Load a CSV the way the extractor does (first row as the header)."""
+    return pd.read_csv(io.StringIO(text))
+
+
+def test_westpac_debit_and_credit_columns():
+    parsed = parse_bank_statement(read_csv(
+        "Bank Account,Date,Narrative,Debit Amount,Credit Amount,Balance,Categories,Serial\n"
+        "032000123456,15/03/2024,DEPOSIT SMITH INV-1,,1200.00,5200.00,INT,\n"
+        "032000123456,16/03/2024,BUNNINGS 123 ALEXANDRIA,89.50,,5110.50,OTHER,\n"
+        "032000123456,17/03/2024,OPENING BALANCE,,,5110.50,,\n"
+    ))
+
+    assert parsed["software"] == "Westpac"
+    assert parsed["document_type"] == "bank_statement"
+    rows = parsed["rows"]
+    assert rows["type"].tolist() == ["revenue", "expense"]
+    assert rows["amount"].tolist() == [1200.0, 89.5]
+    assert rows["date"].tolist() == ["2024-03-15", "2024-03-16"]
+    assert set(rows["category"]) == {"uncategorised"}
+
+
+def test_commbank_headerless_keeps_the_first_line():
+    parsed = parse_bank_statement(read_csv(
+        "01/02/2024,-45.00,\"BP CONNECT PENRITH\",+1955.00\n"
+        "02/02/2024,+800.00,\"TRANSFER FROM JONES\",+2755.00\n"
+    ))
+
+    assert parsed["profile"] == "cba"
+    assert parsed["rows"]["description"].tolist() == ["BP CONNECT PENRITH", "TRANSFER FROM JONES"]
+    assert parsed["rows"]["type"].tolist() == ["expense", "revenue"]
+
+
+def test_headerless_continuation_batch_does_not_repeat_a_row():
+    # A later batch of a streamed sheet: its columns are the first sheet row,
+    # which the first batch already returned
+    batch = pd.DataFrame(
+        [["04/02/2024", "-12.00", "COFFEE", "+2743.00"]],
+        columns=["01/02/2024", "-45.00", "BP CONNECT PENRITH", "+1955.00"]
+    )
+    parsed = parse_bank_statement(batch, continuation=True)
+    assert parsed["rows"]["description"].tolist() == ["COFFEE"]
+
+
+def test_up_timestamps_use_the_local_date_and_payee():
+    rows = parse_bank_statement(read_csv(
+        "Time,BSB / Account Number,Transaction Type,Payee,Description,Category,Tags,"
+        "Subtotal (AUD),Currency,Subtotal (Transaction Currency),Round Up (AUD),Total (AUD)\n"
+        "2024-04-01T23:30:00+11:00,,Purchase,Reece Plumbing,REECE 123,,,-310.00,AUD,-310.00,,-310.00\n"
+    ))["rows"]
+
+    assert rows["date"].tolist() == ["2024-04-01"]
+    assert rows["customer_or_vendor"].tolist() == ["Reece Plumbing"]
+
+
+def test_missing_columns_fall_back_to_claude():
+    # Westpac without its credit column matches no signature
+    df = read_csv("Bank Account,Date,Narrative,Debit Amount\n0320001,15/03/2024,BUNNINGS,89.50\n")
+    assert detect_bank_profile(df) is None
+    assert parse_bank_statement(df) is None
+    # Headerless with an unknown column count
+    assert parse_bank_statement(read_csv("01/02/2024,-45.00,A,B,C\n")) is None
+    # A header row that isn't a bank layout or a data row
+    assert parse_bank_statement(read_csv("Date,Customer,Amount\n2024-01-01,Smith,100\n")) is None
@@ -0,0 +1,54 @@
+"""Disk cache: JSON persistence and least-recently-used eviction."""
+
+import os
+
+from src.utils.cache import DiskCache, make_cache_key
+
+# Each entry is a JSON string of about 1KB
+VALUE = "x" * 1000
+ENTRY_BYTES = len(VALUE) + 2
+
+
+def test_values_persist_across_instances_as_json(tmp_path):
+    key = make_cache_key("invoice.pdf", "prompt-v1")
+    value = {"transactions": [{"amount": 120.5, "customer_or_vendor": "Smith"}], "needs_review": False}
+    DiskCache("extractions", base_dir=str(tmp_path)).set(key, value)
+
+    # A fresh instance (e.g. after a restart) reads the same entry back
+    cache = DiskCache("extractions", base_dir=str(tmp_path))
+    assert cache.get(key) == value
+    assert cache.get(make_cache_key("invoice.pdf", "prompt-v2")) is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+    assert cache.invalidate(key)
+    assert cache.get(key) is None
+    assert not cache.invalidate(key)
+
+
+def test_least_recently_used_entry_is_evicted_first(tmp_path):
+    cache = DiskCache("lru", max_size_mb=2.5 * ENTRY_BYTES / (1024 * 1024), base_dir=str(tmp_path))
+    cache.set("aa-old", VALUE)
+    cache.set("bb-newer", VALUE)
+    os.utime(cache._entry_path("aa-old"), (1, 1))
+    os.utime(cache._entry_path("bb-newer"), (2, 2))
+
+    # Reading the oldest entry makes it the most recently used
+    assert cache.get("aa-old") == VALUE
+    cache.set("cc-new", VALUE)
+
+    assert cache.get("bb-newer") is None
+    assert cache.get("aa-old") == VALUE
+    assert cache.get("cc-new") == VALUE
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["size_mb"] * 1024 * 1024 == 2 * ENTRY_BYTES
+
+
+def test_clear_removes_every_entry(tmp_path):
+    cache = DiskCache("clear", base_dir=str(tmp_path))
+    for key in ("aa", "bb", "cc"):
+        cache.set(key, VALUE)
+
+    assert cache.clear() == 3
+    assert cache.get("aa") is None
+    assert DiskCache("clear", base_dir=str(tmp_path)).stats()["size_mb"] == 0
@@ -0,0 +1,80 @@
+"""RFM customer scoring and local pre-grading."""
+
+import pandas as pd
+
+from src.utils.customer_scoring import (
+    A_GRADE_SCORE, C_GRADE_SCORE, FIRE_CANDIDATE_UNPAID_SHARE, MIN_CUSTOMERS_TO_RANK,
+    _score, local_grade, pregrade, score_customers
+)
+from src.utils.transaction_table import table_from_records, type_view
+
+
+def scores(rows: dict) -> pd.DataFrame:
+    """Score rows for pregrade(), padded with middling customers so there are enough to rank."""
+    data = {name: {"rfm": 3.0, "unpaid_share": 0.0, "overdue_jobs": 0} for name in
+            (f"Filler {i}" for i in range(MIN_CUSTOMERS_TO_RANK))}
+    for name, values in rows.items():
+        data[name] = {"rfm": 3.0, "unpaid_share": 0.0, "overdue_jobs": 0, **values}
+    return pd.DataFrame.from_dict(data, orient="index")
+
+
+def test_grades_on_the_score_boundaries():
+    grades = pregrade(scores({
+        "On A": {"rfm": A_GRADE_SCORE},
+        "Below A": {"rfm": A_GRADE_SCORE - 1 / 3},
+        "On C": {"rfm": C_GRADE_SCORE},
+        "Above C": {"rfm": C_GRADE_SCORE + 1 / 3}
+    }))
+    assert grades["On A"] == "A"
+    assert grades["Below A"] is None
+    assert grades["On C"] == "C"
+    assert grades["Above C"] is None
+
+
+def test_payment_record_sends_customers_to_claude():
+    grades = pregrade(scores({
+        "Top but owes": {"rfm": 5.0, "unpaid_share": 0.1},
+        "Low, owes a lot": {"rfm": 1.0, "unpaid_share": FIRE_CANDIDATE_UNPAID_SHARE},
+        "Low, owes a little": {"rfm": 1.0, "unpaid_share": FIRE_CANDIDATE_UNPAID_SHARE - 0.01},
+        "Low, overdue": {"rfm": 1.0, "overdue_jobs": 1}
+    }))
+    assert grades["Top but owes"] is None
+    assert grades["Low, owes a lot"] is None
+    assert grades["Low, owes a little"] == "C"
+    assert grades["Low, overdue"] is None
+
+
+def test_too_few_customers_are_all_left_to_claude():
+    few = pd.DataFrame({"rfm": [5.0, 1.0], "unpaid_share": [0.0, 0.0], "overdue_jobs": [0, 0]}, index=["A", "B"])
+    assert pregrade(few).isna().all()
+
+
+def test_quintile_scores_on_rank_boundaries():
+    values = pd.Series([10, 20, 30, 40, 50, 60, 70, 80, 90, 100])
+    # Ranks 2 and 4 of 10 sit exactly on the 20% and 40% boundaries
+    assert _score(values).tolist() == [1, 1, 2, 2, 3, 3, 4, 4, 5, 5]
+    assert _score(values, higher_is_better=False).tolist() == [5, 5, 4, 4, 3, 3, 2, 2, 1, 1]
+    assert _score(pd.Series([None, 10.0])).tolist() == [3, 5]
+
+
+def test_scores_from_the_revenue_view():
+    table = table_from_records([
+        {"date": "2024-01-10", "customer_or_vendor": "Smith", "amount": 100, "type": "revenue", "status": "paid"},
+        {"date": "2024-03-10", "customer_or_vendor": "Smith", "amount": 300, "type": "revenue", "status": "overdue"},
+        {"date": "2024-02-01", "customer_or_vendor": "Jones", "amount": 500, "type": "revenue", "status": "paid"},
+        {"date": "2024-02-02", "customer_or_vendor": "Bunnings", "amount": 90, "type": "expense", "status": "paid"}
+    ])
+    result = score_customers(type_view(table, "revenue"))
+
+    smith = result.loc["Smith"]
+    assert smith["job_count"] == 2
+    assert smith["overdue_jobs"] == 1
+    assert smith["unpaid_share"] == 0.75
+    assert smith["job_size_trend"] == "growing"
+    assert smith["recency_days"] == 0
+    assert result.loc["Jones", "recency_days"] == 38
+    assert "Bunnings" not in result.index
+
+    grade = local_grade("Smith", "C", smith)
+    assert grade["payment_behavior"] == "very_slow"
+    assert grade["graded_by"] == "rfm_scores"
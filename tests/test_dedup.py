@@ -0,0 +1,78 @@
+"""Cross-document de-duplication of transactions."""
+
+from src.utils.dedup import link_duplicates, name_similarity
+from src.utils.transaction_table import table_from_records, type_view
+
+
+def record(source: str, name: str, amount: float, date: str = "2024-03-01", **fields) -> dict:
+    return {"date": date, "customer_or_vendor": name, "amount": amount, "type": "revenue",
+            "category": "uncategorised", "confidence": "medium", "source_file": source, **fields}
+
+
+def test_same_job_across_invoice_export_and_bank_is_counted_once():
+    table = link_duplicates(table_from_records([
+        record("invoices/INV-1042.pdf", "John Smith Plumbing", 1200, "2024-03-01",
+               category="residential", line_items=[{"description": "Hot water", "amount": 1200}]),
+        record("exports/xero.csv", "Smith Plumbing", 1200, "2024-03-02"),
+        record("statements/march.csv", "DIRECT CREDIT J SMITH PLUMBING INV 1042", 1200, "2024-03-08"),
+        record("exports/xero.csv", "Jones", 800, "2024-03-05")
+    ]))
+
+    kept = type_view(table, "revenue")
+    assert sorted(kept["customer_or_vendor"].astype(str)) == ["John Smith Plumbing", "Jones"]
+    assert kept["amount"].sum() == 2000
+    # Linked records stay in the table, pointing at the record with line items
+    linked = table[table["duplicate_of"] >= 0]
+    assert len(linked) == 2
+    keep = table.loc[linked["duplicate_of"].unique()[0]]
+    assert keep["source_file"] == "invoices/INV-1042.pdf"
+    assert len(type_view(table, "revenue", include_duplicates=True)) == 4
+
+
+def test_identical_lines_in_one_file_are_separate_transactions():
+    table = link_duplicates(table_from_records([
+        record("exports/xero.csv", "Smith", 150),
+        record("exports/xero.csv", "Smith", 150)
+    ]))
+    assert (table["duplicate_of"] < 0).all()
+
+
+def test_a_group_never_takes_two_records_from_one_file():
+    # Two identical invoices in the export and one matching bank line:
+    # only one of them is the bank line's duplicate
+    table = link_duplicates(table_from_records([
+        record("exports/xero.csv", "Smith", 150, "2024-03-01"),
+        record("exports/xero.csv", "Smith", 150, "2024-03-02"),
+        record("statements/march.csv", "SMITH", 150, "2024-03-03")
+    ]))
+    assert (table["duplicate_of"] >= 0).sum() == 1
+    assert len(type_view(table, "revenue")) == 2
+
+
+def test_records_outside_the_date_window_or_for_other_parties_are_kept():
+    table = link_duplicates(table_from_records([
+        record("a.csv", "Smith", 500, "2024-03-01"),
+        record("b.csv", "Smith", 500, "2024-06-01"),
+        record("c.csv", "Brown Electrical", 500, "2024-03-02"),
+        record("d.csv", "Smith", 500.01, "2024-03-01")
+    ]))
+    assert (table["duplicate_of"] < 0).all()
+
+
+def test_unnamed_records_from_different_files_stay_separate():
+    table = link_duplicates(table_from_records([
+        record("a.csv", "Unknown", 50, "2024-03-01", type="expense"),
+        record("b.pdf", "Unknown", 50, "2024-03-01", type="expense"),
+        record("c.csv", "", 50, "2024-03-02", type="expense")
+    ]))
+    assert (table["duplicate_of"] < 0).all()
+    assert type_view(table, "expense")["amount"].sum() == 150
+
+
+def test_name_similarity():
+    assert name_similarity("John Smith Plumbing", "DIRECT CREDIT J SMITH PLUMBING") >= 0.6
+    assert name_similarity("Bunnings", "BUNNINGS 1234 ALEXANDRIA") >= 0.6
+    assert name_similarity("Smith Plumbing", "Smiht Plumbing") >= 0.6
+    assert name_similarity("Smith Plumbing", "Brown Electrical") < 0.6
+    assert name_similarity("Unknown", "Unknown") == 0.0
+    assert name_similarity("", "") == 0.0
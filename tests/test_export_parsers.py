@@ -0,0 +1,82 @@
+"""Deterministic parsing of accounting software exports."""
+
+import pandas as pd
+
+from src.utils.export_parsers import detect_export_profile, parse_export
+
+
+def test_xero_invoice_lines_collapse_to_one_row_per_invoice():
+    df = pd.DataFrame({
+        "*ContactName": ["Smith", "Smith", "Jones"],
+        "*InvoiceNumber": ["INV-1", "INV-1", "INV-2"],
+        "*InvoiceDate": ["15/01/2024", "15/01/2024", "02/02/2024"],
+        "Description": ["Switchboard", "Labour", "Downlights"],
+        "LineAmount": ["$1,000.00", "200", "800"],
+        "Status": ["Paid", "Paid", "Overdue"]
+    })
+    parsed = parse_export(df, "invoices")
+
+    assert parsed["software"] == "Xero"
+    assert parsed["document_type"] == "invoice"
+    rows = parsed["rows"]
+    assert rows["amount"].tolist() == [1200.0, 800.0]
+    assert rows["description"].iloc[0] == "Switchboard; Labour"
+    assert rows["date"].tolist() == ["2024-01-15", "2024-02-02"]
+    assert rows["status"].tolist() == ["paid", "overdue"]
+
+
+def test_xero_account_codes_are_not_categories():
+    df = pd.DataFrame({
+        "*ContactName": ["Smith", "Jones"],
+        "*InvoiceNumber": ["INV-1", "INV-2"],
+        "*InvoiceDate": ["2024-01-15", "2024-02-02"],
+        "Description": ["Switchboard", "Downlights"],
+        "LineAmount": [1200, 800],
+        "*AccountCode": [200, 200],
+        "TrackingOption1": ["Residential", ""]
+    })
+    rows = parse_export(df, "invoices")["rows"]
+    assert rows["category"].tolist() == ["residential", "uncategorised"]
+
+    rows = parse_export(df.drop(columns=["TrackingOption1"]), "invoices")["rows"]
+    assert rows["category"].tolist() == ["uncategorised", "uncategorised"]
+
+
+def test_missing_optional_columns_get_defaults():
+    # No status, reference or category columns
+    df = pd.DataFrame({
+        "Date": ["2024-03-01", "2024-03-04"],
+        "Supplier": ["Bunnings", "Reece"],
+        "Amount": [120.5, 89.0]
+    })
+    rows = parse_export(df)["rows"]
+
+    assert rows["type"].tolist() == ["expense", "expense"]
+    assert rows["status"].tolist() == ["unknown", "unknown"]
+    assert rows["category"].tolist() == ["uncategorised", "uncategorised"]
+    assert rows["description"].tolist() == ["", ""]
+
+
+def test_missing_required_columns_fall_back_to_claude():
+    # No amount column
+    assert detect_export_profile(["Date", "Customer", "Description"]) is None
+    assert parse_export(pd.DataFrame({"Date": ["2024-01-01"], "Customer": ["Smith"]})) is None
+    # No date column
+    assert parse_export(pd.DataFrame({"Customer": ["Smith"], "Amount": [100]})) is None
+
+
+def test_unknown_side_of_ledger_falls_back_to_claude():
+    df = pd.DataFrame({"Date": ["2024-01-01"], "Description": ["Job"], "Amount": [100]})
+    assert parse_export(df) is None
+    assert parse_export(df, "expenses")["rows"]["type"].tolist() == ["expense"]
+
+
+def test_total_rows_and_blank_amounts_are_dropped():
+    df = pd.DataFrame({
+        "Date": ["2024-01-01", "2024-01-02", None],
+        "Customer": ["Smith", "Jones", None],
+        "Description": ["Rewire", "Fan", "Total"],
+        "Amount": ["500", "", "500"]
+    })
+    rows = parse_export(df)["rows"]
+    assert rows["customer_or_vendor"].tolist() == ["Smith"]
@@ -0,0 +1,47 @@
+"""Recursive discovery of customer documents."""
+
+from src.utils.file_handler import FileHandler
+
+
+def discover(folder, seen_hashes=None) -> list[tuple[str, str]]:
+    return [
+        (path.relative_to(folder).as_posix(), hint)
+        for path, hint, _ in FileHandler.iter_documents(folder, seen_hashes)
+    ]
+
+
+def test_walks_subfolders_with_category_hints(tmp_path):
+    (tmp_path / "invoices" / "2024").mkdir(parents=True)
+    (tmp_path / "Expenses").mkdir()
+    (tmp_path / "invoices" / "2024" / "jan.csv").write_text("a")
+    (tmp_path / "Expenses" / "bills.xlsx").write_bytes(b"b")
+    (tmp_path / "misc.pdf").write_bytes(b"c")
+
+    assert discover(tmp_path) == [
+        ("misc.pdf", None),
+        ("Expenses/bills.xlsx", "expenses"),
+        ("invoices/2024/jan.csv", "invoices")
+    ]
+
+
+def test_skips_hidden_temp_and_unsupported_files(tmp_path):
+    (tmp_path / ".git").mkdir()
+    (tmp_path / ".git" / "data.csv").write_text("a")
+    for name in [".hidden.csv", "~$book.xlsx", "download.csv.part", "notes.txt", "real.csv"]:
+        (tmp_path / name).write_text(name)
+
+    assert discover(tmp_path) == [("real.csv", None)]
+
+
+def test_duplicate_across_files_is_yielded_once(tmp_path):
+    (tmp_path / "invoices").mkdir()
+    (tmp_path / "invoices" / "march.csv").write_text("same")
+    (tmp_path / "march copy.csv").write_text("same")
+    (tmp_path / "april.csv").write_text("different")
+
+    seen = set()
+    # Files in a folder come before its subfolders, so the top-level copy wins
+    assert discover(tmp_path, seen) == [("april.csv", None), ("march copy.csv", None)]
+    assert len(seen) == 2
+    # Hashes already seen (e.g. an earlier upload) are skipped too
+    assert discover(tmp_path, seen) == []
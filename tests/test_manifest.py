@@ -0,0 +1,62 @@
+"""Incremental extraction: only new or changed files are extracted again."""
+
+import json
+
+from src.agents.data_extractor import DataExtractor
+from src.utils.manifest import manifest_path
+
+
+def xero_invoices(*rows: tuple) -> str:
+    """A Xero sales export with account names, so it parses without any API call."""
+    lines = ["*ContactName,*InvoiceNumber,*InvoiceDate,Description,*Quantity,LineAmount,AccountName"]
+    lines += [f"{customer},INV-{i},2024-01-0{i},Switchboard upgrade,1,{amount},Sales"
+              for i, (customer, amount) in enumerate(rows, start=1)]
+    return "\n".join(lines) + "\n"
+
+
+def extract(folder, fake_client) -> tuple[list, list]:
+    """Incremental extraction of folder; returns the results and the files actually extracted."""
+    extractor = DataExtractor(streaming=False)
+    fake_client(extractor, lambda request: "{}")
+    extracted = []
+    extract_documents = extractor._extract_documents
+
+    def spy(documents, *args, **kwargs):
+        extracted.extend(file_path.name for file_path, _, _ in documents)
+        return extract_documents(documents, *args, **kwargs)
+
+    extractor._extract_documents = spy
+    return extractor.extract_incremental(str(folder)), extracted
+
+
+def customers(results) -> dict:
+    return {result.file_path.rsplit("/", 1)[-1]: sorted(t.customer_or_vendor for t in result.transactions)
+            for result in results}
+
+
+def test_only_changed_files_are_extracted_and_removed_files_drop_out(tmp_path, fake_client):
+    folder = tmp_path / "upload" / "invoices"
+    folder.mkdir(parents=True)
+    (folder / "january.csv").write_text(xero_invoices(("Smith", 1200)))
+    (folder / "february.csv").write_text(xero_invoices(("Jones", 800)))
+    (folder / "march.csv").write_text(xero_invoices(("Brown", 950)))
+
+    results, extracted = extract(tmp_path / "upload", fake_client)
+    assert sorted(extracted) == ["february.csv", "january.csv", "march.csv"]
+
+    # The customer corrects February and withdraws March
+    (folder / "february.csv").write_text(xero_invoices(("Jones", 800), ("Lee", 400)))
+    (folder / "march.csv").unlink()
+
+    results, extracted = extract(tmp_path / "upload", fake_client)
+    assert extracted == ["february.csv"]
+    assert customers(results) == {"january.csv": ["Smith"], "february.csv": ["Jones", "Lee"]}
+    # The unchanged file was paid for on the first run
+    assert next(r for r in results if r.file_path.endswith("january.csv")).api_cost == 0
+
+    # A run with nothing changed extracts nothing, and the manifest only holds current files
+    results, extracted = extract(tmp_path / "upload", fake_client)
+    assert extracted == []
+    assert len(results) == 2
+    stored = json.loads(manifest_path(tmp_path / "upload").read_text())["files"]
+    assert sorted(entry["file_path"] for entry in stored.values()) == ["invoices/february.csv", "invoices/january.csv"]
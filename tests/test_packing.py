@@ -0,0 +1,84 @@
+"""Packing small documents into shared extraction calls."""
+
+import json
+import re
+
+from src.agents.data_extractor import DataExtractor, PreparedDocument
+from src.utils.packing import pack_content, plan_packs
+
+
+def transaction(customer: str, amount: float) -> dict:
+    return {"date": "2024-01-02", "customer_or_vendor": customer, "description": "Job",
+            "amount": amount, "type": "revenue", "category": "residential", "status": "paid"}
+
+
+def test_plan_packs_respects_both_budgets_and_keeps_order():
+    items = [("a", 400, 100), ("b", 700, 100), ("c", 300, 100), ("d", 200, 900), ("e", 100, 100)]
+    packs = plan_packs(items, max_input_tokens=1000, max_output_tokens=1000, max_documents=3)
+
+    assert sorted(key for pack in packs for key in pack) == ["a", "b", "c", "d", "e"]
+    sizes = {key: (i, o) for key, i, o in items}
+    for pack in packs:
+        assert sum(sizes[key][0] for key in pack) <= 1000
+        assert sum(sizes[key][1] for key in pack) <= 1000
+        assert len(pack) <= 3
+        assert pack == sorted(pack)
+    assert packs == sorted(packs, key=lambda pack: pack[0])
+
+
+def test_oversized_document_gets_a_pack_of_its_own():
+    packs = plan_packs([("big", 5000, 100), ("small", 100, 100)], 1000, 1000, 10)
+    assert packs == [["big"], ["small"]]
+
+
+def test_pack_content_delimits_each_document():
+    content = pack_content([("a.pdf", "INV 1", ""), ("b.pdf", "INV 2", "NOTE\n")])
+    assert "=== DOCUMENT D1: a.pdf ===\nINV 1\n=== END DOCUMENT D1 ===" in content
+    assert "=== DOCUMENT D2: b.pdf ===\nNOTE\nINV 2\n=== END DOCUMENT D2 ===" in content
+
+
+def test_packed_response_out_of_order_or_missing_a_document(fake_client):
+    docs = [
+        PreparedDocument(file_path=f"/upload/{name}.pdf", strategy="packed", chunks=[f"INVOICE {name}"])
+        for name in ("alpha", "bravo", "charlie")
+    ]
+
+    def respond(request: dict) -> str:
+        content = request["messages"][0]["content"]
+        if "DOCUMENTS:" in content:
+            # D2 before D1, and no entry for D3
+            return json.dumps({"documents": [
+                {"document_id": "D2", "document_type": "invoice", "transactions": [transaction("Bravo", 200)]},
+                {"document_id": "D1", "document_type": "invoice", "transactions": [transaction("Alpha", 100)]}
+            ]})
+        name = re.search(r"INVOICE (\w+)", content).group(1)
+        return json.dumps({"document_type": "invoice", "transactions": [transaction(name.title(), 300)]})
+
+    extractor = DataExtractor(streaming=False, use_cache=False)
+    calls = fake_client(extractor, respond)
+    results = extractor._extract_pack_safely(docs)
+
+    assert [r.file_path for r in results] == [doc.file_path for doc in docs]
+    assert [r.transactions[0].customer_or_vendor for r in results] == ["Alpha", "Bravo", "Charlie"]
+    # One pack call, then the missing document on its own
+    assert len(calls.calls) == 2
+    assert "INVOICE charlie" in calls.calls[1]["messages"][0]["content"]
+
+
+def test_unreadable_packed_response_extracts_each_document_alone(fake_client):
+    docs = [
+        PreparedDocument(file_path=f"/upload/{name}.pdf", strategy="packed", chunks=[f"INVOICE {name}"])
+        for name in ("alpha", "bravo")
+    ]
+
+    def respond(request: dict) -> str:
+        if "DOCUMENTS:" in request["messages"][0]["content"]:
+            return '{"documents": [{"document_id": "D1", "transac'
+        return json.dumps({"document_type": "invoice", "transactions": [transaction("Solo", 50)]})
+
+    extractor = DataExtractor(streaming=False, use_cache=False)
+    calls = fake_client(extractor, respond)
+    results = extractor._extract_pack_safely(docs)
+
+    assert [len(r.transactions) for r in results] == [1, 1]
+    assert len(calls.calls) == 3
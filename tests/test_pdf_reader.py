@@ -0,0 +1,74 @@
+"""PDF page parsing: pypdf text, pdfplumber only on ruled pages, page cache."""
+
+import types
+
+from src.utils.cache import DiskCache
+from src.utils.pdf_reader import has_ruling_lines, read_pdf_pages, remove_table_lines
+
+
+# Four rectangles - enough rulings for a table grid
+GRID = "50 600 100 20 re 150 600 100 20 re 50 580 100 20 re 150 580 100 20 re S"
+
+
+def write_pdf(path, pages: list[tuple[list[str], str]]):
+    """Minimal PDF: one Helvetica page per (text lines, extra drawing operators)."""
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>"]
+    kids = " ".join(f"{4 + 2 * i} 0 R" for i in range(len(pages)))
+    objects.append(f"<< /Type /Pages /Kids [{kids}] /Count {len(pages)} >>".encode())
+    objects.append(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    for i, (lines, drawing) in enumerate(pages):
+        stream = drawing + " BT /F1 11 Tf 50 750 Td 14 TL " + " ".join(f"({line}) Tj T*" for line in lines) + " ET"
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents {5 + 2 * i} 0 R "
+            f"/Resources << /Font << /F1 3 0 R >> >> >>".encode()
+        )
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream".encode())
+
+    out = b"%PDF-1.4\n"
+    offsets = []
+    for i, obj in enumerate(objects):
+        offsets.append(len(out))
+        out += f"{i + 1} 0 obj\n".encode() + obj + b"\nendobj\n"
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    out += b"".join(f"{offset:010d} 00000 n \n".encode() for offset in offsets)
+    out += f"trailer << /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    path.write_bytes(out)
+
+
+def fake_page(contents: bytes):
+    return types.SimpleNamespace(get_contents=lambda: types.SimpleNamespace(get_data=lambda: contents))
+
+
+def test_ruling_lines_need_a_grid():
+    assert has_ruling_lines(fake_page(GRID.encode()))
+    # One underline is not a table
+    assert not has_ruling_lines(fake_page(b"50 700 m 200 700 l S BT (Total) Tj ET"))
+    # Operator names inside words don't count
+    assert not has_ruling_lines(fake_page(b"BT (rel rel rel rel) Tj ET"))
+
+
+def test_text_lines_repeated_in_a_table_are_removed():
+    text = "Invoice 42\nSwitchboard  1200.00\nThanks for your business"
+    tables = [[["Item", "Amount"], ["Switchboard", "1200.00"]]]
+    assert remove_table_lines(text, tables) == "Invoice 42\nThanks for your business"
+    assert remove_table_lines(text, []) == text
+
+
+def test_pages_are_parsed_in_order_and_cached(tmp_path):
+    pdf = tmp_path / "invoice.pdf"
+    write_pdf(pdf, [(["Invoice INV-1", "Smith 1200.00"], ""), (["Page two"], GRID)])
+    cache = DiskCache("pdf_pages")
+
+    pages = read_pdf_pages(pdf, "hash-1", cache)
+    assert [p["page"] for p in pages] == [1, 2]
+    assert "Smith 1200.00" in pages[0]["text"]
+    assert [p["table_page"] for p in pages] == [False, True]
+    assert not any(p["cached"] for p in pages)
+
+    # The same pages in a renamed copy come from the cache
+    copy = tmp_path / "copy.pdf"
+    copy.write_bytes(pdf.read_bytes())
+    again = read_pdf_pages(copy, "hash-2", cache)
+    assert all(p["cached"] for p in again)
+    assert [p["text"] for p in again] == [p["text"] for p in pages]
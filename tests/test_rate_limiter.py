@@ -0,0 +1,110 @@
+"""Shared rate limiter: arrival order, retry-after pauses, and token accounting."""
+
+import threading
+import time
+import types
+
+import anthropic
+import pytest
+
+from src.utils.anthropic_client import RateLimitedMessages, RateLimiter
+
+
+def api_error(error_class, status: int, retry_after: str = None):
+    """An SDK status error without a real HTTP response."""
+    headers = {"retry-after": retry_after} if retry_after else {}
+    response = types.SimpleNamespace(request=None, status_code=status, headers=headers)
+    return error_class("error", response=response, body=None)
+
+
+class FlakyMessages:
+    """client.messages whose create() and stream() raise each queued error before succeeding."""
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def _attempt(self):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+
+    def create(self, **kwargs):
+        self._attempt()
+        return types.SimpleNamespace(usage=None)
+
+    def stream(self, **kwargs):
+        self._attempt()
+
+
+def rate_limited(messages, limiter: RateLimiter, max_retries: int = 3) -> RateLimitedMessages:
+    return RateLimitedMessages(messages, limiter, max_retries=max_retries, base_delay=0.0, max_delay=0.0)
+
+
+REQUEST = {"messages": [{"role": "user", "content": "hello"}], "max_tokens": 100}
+
+
+def test_waiters_are_served_in_arrival_order():
+    limiter = RateLimiter(requests_per_minute=6000, tokens_per_minute=60_000)
+    limiter.tokens.level = 0
+    served = []
+
+    def take(name: str, tokens: int):
+        limiter.acquire(tokens)
+        served.append(name)
+
+    # The large request needs 0.3s of refill; the small one behind it must not overtake it
+    large = threading.Thread(target=take, args=("large", 300))
+    small = threading.Thread(target=take, args=("small", 1))
+    large.start()
+    while limiter.queue_depth < 1:
+        time.sleep(0.001)
+    small.start()
+    large.join()
+    small.join()
+
+    assert served == ["large", "small"]
+    assert limiter.stats()["max_queue_depth"] == 2
+
+
+def test_retry_after_pauses_every_caller():
+    limiter = RateLimiter(requests_per_minute=6000, tokens_per_minute=60_000)
+    messages = FlakyMessages(api_error(anthropic.RateLimitError, 429, retry_after="0.2"))
+
+    started = time.monotonic()
+    rate_limited(messages, limiter).create(**REQUEST)
+    assert time.monotonic() - started >= 0.2
+    assert messages.calls == 2
+    assert limiter.stats()["rate_limit_errors"] == 1
+
+    # A 429 on one caller holds the others too
+    limiter.record_retry(0, pause_seconds=0.2)
+    assert limiter.acquire(1) >= 0.15
+
+
+def test_settle_corrects_the_estimate():
+    limiter = RateLimiter(requests_per_minute=60, tokens_per_minute=1000)
+    limiter.acquire(500)
+    limiter.settle(500, 200)
+
+    assert limiter.tokens.level == pytest.approx(800, abs=1)
+    assert limiter.stats()["tokens"] == 200
+
+
+@pytest.mark.parametrize("errors", [
+    [api_error(anthropic.BadRequestError, 400)],
+    [api_error(anthropic.InternalServerError, 529)] * 2
+], ids=["not retryable", "retries run out"])
+@pytest.mark.parametrize("call", ["create", "stream"])
+def test_failed_requests_return_their_tokens(errors, call):
+    limiter = RateLimiter(requests_per_minute=60, tokens_per_minute=1000)
+    messages = rate_limited(FlakyMessages(*errors), limiter, max_retries=1)
+
+    with pytest.raises(anthropic.APIStatusError):
+        if call == "create":
+            messages.create(**REQUEST)
+        else:
+            with messages.stream(**REQUEST):
+                pass
+
+    assert limiter.tokens.level == pytest.approx(limiter.tokens.capacity)
+    assert limiter.stats()["tokens"] == 0
@@ -0,0 +1,55 @@
+"""Incremental parsing of streamed extraction responses."""
+
+import json
+
+from src.utils.stream_parser import TransactionStreamParser
+
+
+TRANSACTIONS = [
+    {"date": "2024-01-02", "customer_or_vendor": "Smith {Electrical}", "amount": 1200, "type": "revenue"},
+    {"date": "2024-01-05", "customer_or_vendor": "Jones \"JJ\"", "amount": 80.5, "type": "expense",
+     "line_items": [{"description": "cable ]", "amount": 80.5}]},
+    {"date": "2024-01-09", "customer_or_vendor": "Brown", "amount": 300, "type": "revenue"}
+]
+RESPONSE = "```json\n" + json.dumps({
+    "document_type": "invoice",
+    "transactions": TRANSACTIONS,
+    "extraction_notes": "[not a transaction]"
+}, indent=2) + "\n```"
+
+
+def feed_in_pieces(text: str, size: int) -> tuple[TransactionStreamParser, list[list[dict]]]:
+    parser = TransactionStreamParser()
+    batches = [parser.feed(text[i:i + size]) for i in range(0, len(text), size)]
+    return parser, batches
+
+
+def test_transactions_are_yielded_as_they_complete():
+    for size in (1, 7, 64, len(RESPONSE)):
+        parser, batches = feed_in_pieces(RESPONSE, size)
+        assert [t for batch in batches for t in batch] == TRANSACTIONS
+        assert parser.transactions == TRANSACTIONS
+        assert parser.finished
+        assert parser.document_type == "invoice"
+
+
+def test_first_transaction_arrives_before_the_response_ends():
+    parser, batches = feed_in_pieces(RESPONSE, 16)
+    first = next(i for i, batch in enumerate(batches) if batch)
+    assert first < len(batches) // 2
+
+
+def test_truncated_stream_keeps_completed_transactions():
+    # Cut off at max_tokens in the middle of the third transaction
+    cut = RESPONSE.index('"Brown"')
+    parser, _ = feed_in_pieces(RESPONSE[:cut], 5)
+    assert parser.transactions == TRANSACTIONS[:2]
+    assert not parser.finished
+
+
+def test_nothing_is_parsed_before_the_transactions_array():
+    parser = TransactionStreamParser()
+    assert parser.feed('Here is the data: {"document_type": "expense", "summary": {"x": 1}') == []
+    assert parser.document_type == "expense"
+    assert parser.feed(', "transactions": []}') == []
+    assert parser.finished
@@ -0,0 +1,71 @@
+"""The columnar transaction table."""
+
+import pandas as pd
+
+from src.utils.transaction_table import (
+    as_transaction_table, sort_blocks, table_fingerprint, table_from_records, transaction_dates, type_view
+)
+
+
+RECORDS = [
+    {"date": "2024-01-05", "customer_or_vendor": "Bunnings", "amount": 80, "type": "expense",
+     "category": "materials", "source_file": "a.pdf"},
+    {"date": "2024-01-02", "customer_or_vendor": "Smith", "amount": "1200", "type": "revenue",
+     "source_file": "b.pdf", "line_items": [{"description": "Rewire", "amount": 1200}]},
+    {"date": None, "customer_or_vendor": None, "amount": None, "type": "transfer", "source_file": "c.pdf"},
+    {"date": "2024-01-09", "customer_or_vendor": "Jones", "amount": 300, "type": "revenue",
+     "source_file": "c.pdf"}
+]
+
+
+def test_rows_are_sorted_into_type_blocks_with_defaults_filled():
+    table = table_from_records(RECORDS)
+
+    assert table["type"].astype(str).tolist() == ["revenue", "revenue", "expense", "transfer"]
+    assert table["amount"].dtype == "float64"
+    assert isinstance(table["category"].dtype, pd.CategoricalDtype)
+    blank = table[table["type"] == "transfer"].iloc[0]
+    assert (blank["amount"], blank["date"], blank["customer_or_vendor"]) == (0.0, "unknown", "unknown")
+
+
+def test_type_views_are_slices_without_linked_duplicates():
+    table = table_from_records(RECORDS)
+    # Jones linked as a duplicate of Smith sorts to the end of the revenue block
+    smith = table.index[table["customer_or_vendor"] == "Smith"][0]
+    table.loc[table["customer_or_vendor"] == "Jones", "duplicate_of"] = smith
+    table = sort_blocks(table)
+
+    assert type_view(table, "revenue")["customer_or_vendor"].astype(str).tolist() == ["Smith"]
+    assert len(type_view(table, "revenue", include_duplicates=True)) == 2
+    assert type_view(table, "expense")["amount"].tolist() == [80.0]
+    assert type_view(table, "refund").empty
+
+
+def test_dates_parse_iso_then_day_first():
+    table = table_from_records([
+        {"date": "2024-03-04", "type": "revenue"},
+        {"date": "05/03/2024", "type": "revenue"},
+        {"date": "unknown", "type": "revenue"}
+    ])
+    dates = transaction_dates(table)
+    assert dates.dt.strftime("%Y-%m-%d").tolist()[:2] == ["2024-03-04", "2024-03-05"]
+    assert dates.isna().tolist() == [False, False, True]
+
+
+def test_fingerprint_ignores_order_and_paths_but_not_content():
+    table = table_from_records(RECORDS)
+    moved = table_from_records([{**r, "source_file": "other/" + r["source_file"]} for r in reversed(RECORDS)])
+    changed = table_from_records([{**RECORDS[0], "amount": 81}] + RECORDS[1:])
+
+    assert table_fingerprint(table) == table_fingerprint(moved)
+    assert table_fingerprint(table) != table_fingerprint(changed)
+
+
+def test_older_list_shapes_are_accepted():
+    revenue = [r for r in RECORDS if r["type"] == "revenue"]
+    expenses = [r for r in RECORDS if r["type"] == "expense"]
+    table = as_transaction_table({"revenue_transactions": revenue, "expense_transactions": expenses})
+
+    assert len(table) == 3
+    assert (table["duplicate_of"] == -1).all()
+    assert as_transaction_table({"all_transactions": table}) is table